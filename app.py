@@ -1,5 +1,6 @@
 import os
-from flask import Flask
+import click
+from flask import Flask, jsonify
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,14 +9,118 @@ app = Flask(__name__)
 # ต้องมี Secret Key สำหรับใช้งาน flash messages
 app.secret_key = os.environ.get("SECRET_KEY", "super-secret-key-psru")
 
+# DB session ต่อ request (คืน connection อัตโนมัติเมื่อจบ request)
+import db
+db.init_app(app)
+
+# metrics สำหรับ Prometheus ที่ /metrics (เวลาตอบกลับ / query ต่อ request / pool)
+import metrics
+metrics.init_app(app)
+
 from routes.dashboard import dashboard_bp
 from routes.inventory import inventory_bp
 from routes.manage import manage_bp
+from routes.reports import reports_bp
 
 # Register routes
 app.register_blueprint(dashboard_bp)
 app.register_blueprint(inventory_bp)
 app.register_blueprint(manage_bp)
+app.register_blueprint(reports_bp)
+
+# นิยามของใกล้หมดชุดเดียวกับฝั่ง Python (ใช้ระบายสีในตาราง / ค่าเริ่มต้นในฟอร์ม)
+from stock_summary import is_low, DEFAULT_REORDER_LEVEL
+from loans import BORROW_DEFAULT_DAYS
+app.jinja_env.globals.update(is_low=is_low, default_reorder_level=DEFAULT_REORDER_LEVEL,
+                             borrow_default_days=BORROW_DEFAULT_DAYS)
+
+# ไฟล์ CSS/JS/ฟอนต์ในเครื่อง (ชื่อมี hash + cache 1 ปี) ถ้ายังไม่ build จะใช้ CDN เดิม
+import assets
+assets.init_app(app)
+
+# แคช HTML บางส่วนของ template ({% cache %} ดู fragment_cache.py)
+import fragment_cache
+fragment_cache.init_app(app)
+
+# สถิติ connection pool ของ worker นี้ (ไว้ดูว่าควรตั้ง DB_POOL_SIZE เท่าไร)
+@app.route('/db_pool_stats')
+def db_pool_stats():
+    from db import get_pool_stats
+    return jsonify(get_pool_stats())
+
+# คำสั่งอัปเดตโครงสร้างฐานข้อมูล: flask --app app migrate
+@app.cli.command('migrate')
+def migrate_command():
+    from migrate import run_migrations
+    applied = run_migrations()
+    print(f"Applied: {', '.join(applied)}" if applied else "Database is up to date")
+
+# ตรวจ/ซ่อมตารางสรุปสต็อกรายห้อง: flask --app app verify-summary [--fix]
+@app.cli.command('verify-summary')
+@click.option('--fix', is_flag=True, help='คำนวณแถวที่ไม่ตรงใหม่จากตารางจริง')
+def verify_summary_command(fix):
+    from stock_summary import verify_summary
+    drift = verify_summary(fix=fix)
+    for location, expected, actual in drift:
+        print(f"{location}: expected={expected} actual={actual}")
+    if not drift:
+        print("Summary is consistent")
+    elif fix:
+        print(f"Fixed {len(drift)} location(s)")
+
+@app.cli.command('rebuild-summary')
+def rebuild_summary_command():
+    from stock_summary import rebuild_summary
+    print(f"Rebuilt {rebuild_summary()} location(s)")
+
+# ลบห้องที่ค้างอยู่ต่อให้จบ (เช่น process ตายกลางทาง): flask --app app room-deletions [--include-failed]
+@app.cli.command('room-deletions')
+@click.option('--include-failed', is_flag=True, help='ลองงานที่ล้มเหลวไปแล้วใหม่ด้วย')
+def room_deletions_command(include_failed):
+    from room_deletion import run_pending_jobs
+    finished = run_pending_jobs(include_failed=include_failed)
+    print(f"Finished job(s): {', '.join(map(str, finished))}" if finished else "No pending room deletions")
+
+# สร้างรายงาน Excel ที่สั่งไว้ เป็น process แยกจากเว็บ (บรรทัด worker ใน Procfile): flask --app app report-worker
+# worker ของเว็บจึงว่างรับ request เสมอ (ตั้ง REPORT_WORKER=1 ถ้าจะให้เว็บสร้างรายงานเองใน thread แทน ดู routes/reports.py)
+@app.cli.command('report-worker')
+def report_worker_command():
+    from reports import run_report_worker
+    run_report_worker()
+
+# ไฟล์ static: flask --app app vendor-assets (ดาวน์โหลด library) แล้ว flask --app app build-assets (ตอน deploy)
+@app.cli.command('vendor-assets')
+def vendor_assets_command():
+    fetched = assets.vendor_assets()
+    print(f"Vendored: {', '.join(fetched)}")
+
+@app.cli.command('build-assets')
+@click.option('--skip-tailwind', is_flag=True, help='ไม่คอมไพล์ Tailwind ใหม่ (ใช้ static/build/tailwind.css เดิม)')
+def build_assets_command(skip_tailwind):
+    manifest = assets.build_assets(tailwind=not skip_tailwind)
+    for name, filename in sorted(manifest.items()):
+        print(f"{name} -> dist/{filename}")
+
+# ตัวส่งแจ้งเตือน LINE: process แยกตัวเดียว (บรรทัด notify ใน Procfile) ให้ rate limit เป็นของทั้งระบบ
+# NOTIFY_WORKER=1 = ให้ทุก process ของเว็บส่งเองใน thread (rate limit จะเป็นต่อ process ดู notifier.py)
+from notifier import start_notification_worker, run_worker
+
+@app.cli.command('notify-worker')
+def notify_worker_command():
+    run_worker()
+
+if os.environ.get("LINE_ACCESS_TOKEN") and os.environ.get("NOTIFY_WORKER", "0") == "1":
+    start_notification_worker()
+
+# เตือนรายการยืมที่เกินกำหนดคืนทาง LINE (ปิดได้ด้วย OVERDUE_SCAN_WORKER=0 แล้วตั้ง cron: flask --app app overdue-scan)
+from loans import start_overdue_scanner, scan_overdue
+
+@app.cli.command('overdue-scan')
+def overdue_scan_command():
+    print(f"Reminded {scan_overdue()} overdue loan(s)")
+
+if os.environ.get("LINE_ACCESS_TOKEN") and os.environ.get("OVERDUE_SCAN_WORKER", "1") != "0":
+    start_overdue_scanner()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
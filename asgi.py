@@ -0,0 +1,103 @@
+import io
+import os
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from flask import request, request_started
+from werkzeug.exceptions import HTTPException
+from app import app as flask_app
+from db import DB_POOL_SIZE
+from db_async import close_async_db, close_async_pool
+from routes.dashboard_async import ASYNC_VIEWS
+
+# ======================
+# โหมด ASGI (ทางเลือก): หน้าอ่านอย่างเดียวเสิร์ฟแบบ async ที่เหลือใช้แอป Flask เดิม
+# ======================
+# แบบเดิม (Procfile: gunicorn app:app) worker แบบ sync หนึ่งตัวตอบได้ทีละ request
+# query ช้าๆ หรือ export หนึ่งครั้งจึงกิน worker ไปทั้งตัว จอที่รีเฟรชเองหลายสิบจอทำให้ worker หมดทั้งที่ CPU ยังว่าง
+# โหมดนี้:
+# - GET หน้า index / room_view / tracking / history / borrow_history (ASYNC_VIEWS ใน routes/dashboard_async.py)
+#   รันเป็น coroutine บน event loop อ่าน DB ผ่าน aiomysql (db_async.py) ระหว่างรอ DB ไปตอบ request อื่นต่อได้
+#   ใช้ request context ของ Flask ตัวจริง: template / url_for / flash / session / ETag / metrics / header เหมือนเดิม
+# - request อื่นทั้งหมด (ฟอร์มบันทึกข้อมูล, API, export, /metrics) ส่งต่อให้แอป WSGI เดิมรันใน thread pool
+#   (ASGI_WSGI_THREADS ค่าเริ่มต้นเท่ากับ DB_POOL_SIZE)
+# - ASGI_ASYNC_VIEWS=0 ส่งทุกอย่างให้แอป WSGI (ไว้เทียบผล / ปิดโหมด async โดยไม่ต้องเปลี่ยนคำสั่งรัน)
+# รัน (ต้องติดตั้ง aiomysql, a2wsgi, uvicorn เพิ่ม):
+#   gunicorn asgi:app -k uvicorn.workers.UvicornWorker   (ใช้ gunicorn.conf.py เดิม รวม metrics หลาย worker)
+#   uvicorn asgi:app --workers 4
+# เทียบกับแบบ sync: python bench/bench_concurrency.py (ดูหัวไฟล์)
+ASGI_ASYNC_VIEWS = os.environ.get("ASGI_ASYNC_VIEWS", "1") != "0"
+ASGI_WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", DB_POOL_SIZE))
+
+_wsgi = WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS)
+
+def _async_view(environ):
+    # view แบบ async ของ endpoint ที่ match ได้ (None = ให้แอป WSGI จัดการเอง รวมถึง 404/405/redirect)
+    try:
+        rule, _ = flask_app.url_map.bind_to_environ(environ).match(return_rule=True)
+    except HTTPException:
+        return None
+    return ASYNC_VIEWS.get(rule.endpoint)
+
+async def _dispatch(view):
+    # เหมือน Flask.full_dispatch_request แต่ await view
+    try:
+        request_started.send(flask_app, _async_wrapper=flask_app.ensure_sync)
+        rv = flask_app.preprocess_request()
+        if rv is None:
+            rv = await view(**request.view_args)
+    except Exception as e:
+        rv = flask_app.handle_user_exception(e)
+    return flask_app.finalize_request(rv)
+
+async def _serve_async(view, environ, send):
+    # เหมือน Flask.wsgi_app: push request context -> dispatch -> pop (teardown) แล้วค่อยส่ง response
+    ctx = flask_app.request_context(environ)
+    error = None
+    try:
+        try:
+            ctx.push()
+            response = await _dispatch(view)
+        except Exception as e:
+            error = e
+            response = flask_app.handle_exception(e)
+        app_iter, status, headers = response.get_wsgi_response(environ)
+        try:
+            body = b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+    finally:
+        try:
+            # คืน connection ของ aiomysql ก่อนส่งข้อมูลให้ client (client ช้าไม่ถือ connection ค้าง)
+            await close_async_db()
+        finally:
+            if error is not None and flask_app.should_ignore_error(error):
+                error = None
+            ctx.pop(error)
+
+    await send({
+        'type': 'http.response.start',
+        'status': int(status.split(' ', 1)[0]),
+        'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_pool()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] == 'http' and ASGI_ASYNC_VIEWS and scope['method'] in ('GET', 'HEAD'):
+        environ = build_environ(scope, io.BytesIO())
+        view = _async_view(environ)
+        if view is not None:
+            return await _serve_async(view, environ, send)
+    await _wsgi(scope, receive, send)
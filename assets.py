@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+from urllib.parse import urljoin
+
+# ======================
+# ไฟล์ static (CSS/JS/ฟอนต์) แบบเก็บในเครื่อง + ชื่อไฟล์มี hash
+# ======================
+# ขั้นตอน (รันตอน deploy หรือเมื่ออัปเดตเวอร์ชัน library / แก้ template):
+#   1. flask --app app vendor-assets   ดาวน์โหลด library ตามเวอร์ชันที่ล็อคไว้ลง static/vendor/ (ทำครั้งเดียวแล้ว commit ได้)
+#   2. flask --app app build-assets    คอมไพล์ Tailwind จาก templates (เหลือเฉพาะ class ที่ใช้จริง)
+#                                      แล้วคัดลอกทุกไฟล์ไป static/dist/ โดยใส่ hash ของเนื้อไฟล์ในชื่อ + เขียน manifest.json
+# ไฟล์ใน static/dist/ ชื่อเปลี่ยนทุกครั้งที่เนื้อหาเปลี่ยน จึงส่ง Cache-Control อายุ 1 ปี (immutable) ได้
+# ถ้ายังไม่ได้ build (ไม่มี manifest) template จะกลับไปใช้ CDN เดิม ระบบยังใช้งานได้ตามปกติ
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+VENDOR_DIR = os.path.join(STATIC_DIR, 'vendor')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+TAILWIND_INPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tailwind.css')
+TAILWIND_BIN = os.environ.get("TAILWIND_BIN", "tailwindcss")   # Tailwind standalone CLI (v3)
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# ชื่อ asset -> ไฟล์ต้นทางใน static/, URL สำหรับดาวน์โหลดมาเก็บ, CDN สำรองกรณียังไม่ build
+ASSETS = {
+    'tailwind.css': {
+        'source': 'build/tailwind.css',
+        'cdn': 'https://cdn.tailwindcss.com',
+    },
+    'style.css': {
+        'source': 'style.css',
+        'cdn': None,
+    },
+    'chart.js': {
+        'source': 'vendor/chart.umd.min.js',
+        'vendor': 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js',
+        'cdn': 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js',
+    },
+    'sweetalert2.js': {
+        'source': 'vendor/sweetalert2.all.min.js',
+        'vendor': 'https://cdn.jsdelivr.net/npm/sweetalert2@11/dist/sweetalert2.all.min.js',
+        'cdn': 'https://cdn.jsdelivr.net/npm/sweetalert2@11',
+    },
+    'fontawesome.css': {
+        'source': 'vendor/fontawesome/all.min.css',
+        'vendor': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
+        'cdn': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
+    },
+    'fonts.css': {
+        'source': 'vendor/fonts/fonts.css',
+        'vendor': 'https://fonts.googleapis.com/css2?family=Prompt:wght@300;400;500;700&family=Sarabun:wght@300;400;500;700&display=swap',
+        'cdn': 'https://fonts.googleapis.com/css2?family=Prompt:wght@300;400;500;700&family=Sarabun:wght@300;400;500;700&display=swap',
+    },
+}
+
+CSS_URL_RE = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+# Google Fonts ส่ง woff2 ให้เฉพาะ browser รุ่นใหม่ ต้องแนบ User-Agent
+VENDOR_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+def _is_external(ref):
+    return ref.startswith(('data:', 'http:', 'https:', '//', '#'))
+
+# ======================
+# 1. ดาวน์โหลด library มาเก็บไว้ใน static/vendor/
+# ======================
+def vendor_assets():
+    import requests
+    session = requests.Session()
+    session.headers['User-Agent'] = VENDOR_USER_AGENT
+    fetched = []
+
+    for name, spec in ASSETS.items():
+        url = spec.get('vendor')
+        if not url:
+            continue
+        target = os.path.join(STATIC_DIR, spec['source'])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        response = session.get(url, timeout=30)
+        response.raise_for_status()
+
+        if target.endswith('.css'):
+            # ไฟล์ที่ CSS อ้างถึง (ฟอนต์) โหลดตามมาไว้ข้างๆ แล้วแก้ url() ให้ชี้ไฟล์ในเครื่อง
+            css = response.text
+            asset_dir = os.path.join(os.path.dirname(target), 'files')
+            os.makedirs(asset_dir, exist_ok=True)
+
+            def localize(match):
+                ref = match.group(2)
+                if ref.startswith('data:'):
+                    return match.group(0)
+                absolute = urljoin(url, ref)
+                filename = os.path.basename(absolute.split('?')[0].split('#')[0])
+                file_response = session.get(absolute, timeout=30)
+                file_response.raise_for_status()
+                with open(os.path.join(asset_dir, filename), 'wb') as f:
+                    f.write(file_response.content)
+                return f"url(files/{filename})"
+
+            css = CSS_URL_RE.sub(localize, css)
+            with open(target, 'w', encoding='utf-8') as f:
+                f.write(css)
+        else:
+            with open(target, 'wb') as f:
+                f.write(response.content)
+        fetched.append(name)
+    return fetched
+
+# ======================
+# 2. คอมไพล์ Tailwind + ใส่ hash ในชื่อไฟล์
+# ======================
+def compile_tailwind():
+    output = os.path.join(STATIC_DIR, ASSETS['tailwind.css']['source'])
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    subprocess.run([TAILWIND_BIN, '-i', TAILWIND_INPUT, '-o', output, '--minify'],
+                   cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+
+def _hashed_name(path, content):
+    stem, ext = os.path.splitext(os.path.basename(path))
+    return f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+
+class _DistWriter:
+    def __init__(self):
+        self.emitted = {}
+
+    def emit(self, path):
+        # คัดลอกไฟล์ไป dist/ ชื่อใหม่มี hash; ถ้าเป็น CSS แก้ url() ให้ชี้ไฟล์ hash ก่อน
+        path = os.path.normpath(path)
+        if path in self.emitted:
+            return self.emitted[path]
+
+        with open(path, 'rb') as f:
+            content = f.read()
+        if path.endswith('.css'):
+            base = os.path.dirname(path)
+
+            def rewrite(match):
+                ref = match.group(2)
+                if _is_external(ref):
+                    return match.group(0)
+                clean = ref.split('?')[0].split('#')[0]
+                fragment = '#' + ref.split('#', 1)[1] if '#' in ref else ''
+                return f"url({self.emit(os.path.join(base, clean))}{fragment})"
+
+            content = CSS_URL_RE.sub(rewrite, content.decode('utf-8')).encode('utf-8')
+
+        name = _hashed_name(path, content)
+        with open(os.path.join(DIST_DIR, name), 'wb') as f:
+            f.write(content)
+        self.emitted[path] = name
+        return name
+
+def build_assets(tailwind=True):
+    if tailwind:
+        compile_tailwind()
+
+    # สร้าง dist ใหม่ทั้งหมด ไฟล์ชื่อเก่าจะถูกลบ (browser ที่ยังถือ HTML เก่าอยู่จะโหลดผ่าน CDN ไม่ได้ ให้ build ตอน deploy)
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    os.makedirs(DIST_DIR)
+    writer = _DistWriter()
+    manifest = {}
+    for name, spec in ASSETS.items():
+        source = os.path.join(STATIC_DIR, spec['source'])
+        if not os.path.exists(source):
+            continue
+        manifest[name] = writer.emit(source)
+
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+# ======================
+# 3. ใช้ใน Flask: asset_url() ใน template + Cache-Control ของไฟล์ใน dist/
+# ======================
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def init_app(app):
+    from flask import request, url_for
+    manifest = load_manifest()
+
+    def has_asset(name):
+        return name in manifest
+
+    def asset_url(name):
+        if name in manifest:
+            return url_for('static', filename=f"dist/{manifest[name]}")
+        spec = ASSETS[name]
+        if spec.get('cdn'):
+            return spec['cdn']
+        return url_for('static', filename=spec['source'])
+
+    app.jinja_env.globals.update(asset_url=asset_url, has_asset=has_asset)
+
+    @app.after_request
+    def cache_static_assets(response):
+        if request.endpoint == 'static' and request.view_args.get('filename', '').startswith('dist/') \
+                and response.status_code == 200:
+            response.headers['Cache-Control'] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+        return response
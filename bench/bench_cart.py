@@ -0,0 +1,159 @@
+# ======================
+# Concurrency test: เบิกหลายรายการ ทีละรายการ vs ตะกร้า (transaction เดียว)
+# ======================
+# หลาย thread ยิงตะกร้าสุ่ม (ของซ้ำกันได้ระหว่าง thread) พร้อมกันกับ DB ตาม env DB_*
+# ทุกตะกร้า rollback ตอนจบ ข้อมูลจริงจึงไม่เปลี่ยน (แต่ล็อคแถวจริงระหว่างทำงาน)
+#   single : แยก transaction ต่อรายการ (แบบ withdraw_item เดิม)
+#   naive  : transaction เดียว แต่ล็อคทีละแถวตามลำดับที่ผู้ใช้ใส่ -> เกิด deadlock ได้
+#   cart   : stock.withdraw_cart (ล็อคครั้งเดียวเรียงตาม item_id)
+#   python bench/bench_cart.py --item-ids 1-20 --user-id 1 --threads 8 --cart-size 5
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from stock import normalize_cart, withdraw_cart
+from stock_summary import apply_item_changes
+
+DEADLOCK = 1213
+LOCK_WAIT_TIMEOUT = 1205
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def parse_ids(text):
+    ids = []
+    for part in text.split(','):
+        if '-' in part:
+            low, high = part.split('-')
+            ids.extend(range(int(low), int(high) + 1))
+        elif part:
+            ids.append(int(part))
+    return ids
+
+
+def withdraw_single(conn, cursor, user_id, lines):
+    for line in lines:
+        conn.start_transaction()
+        cursor.execute("SELECT item_name, quantity, unit FROM items WHERE item_id = %s FOR UPDATE", (line['item_id'],))
+        cursor.fetchone()
+        cursor.execute("INSERT INTO transactions (user_id, status) VALUES (%s, 'อนุมัติแล้ว')", (user_id,))
+        cursor.execute("""
+            INSERT INTO transaction_details (transaction_id, item_id, amount)
+            VALUES (%s, %s, %s)
+        """, (cursor.lastrowid, line['item_id'], line['amount']))
+        cursor.execute("UPDATE items SET quantity = quantity - %s WHERE item_id = %s", (line['amount'], line['item_id']))
+        conn.rollback()
+
+
+def withdraw_naive(conn, cursor, user_id, lines):
+    conn.start_transaction()
+    for line in lines:
+        cursor.execute("SELECT item_name, quantity, unit FROM items WHERE item_id = %s FOR UPDATE", (line['item_id'],))
+        cursor.fetchone()
+    cursor.execute("INSERT INTO transactions (user_id, status) VALUES (%s, 'อนุมัติแล้ว')", (user_id,))
+    transaction_id = cursor.lastrowid
+    for line in lines:
+        cursor.execute("""
+            INSERT INTO transaction_details (transaction_id, item_id, amount)
+            VALUES (%s, %s, %s)
+        """, (transaction_id, line['item_id'], line['amount']))
+        cursor.execute("UPDATE items SET quantity = quantity - %s WHERE item_id = %s", (line['amount'], line['item_id']))
+    conn.rollback()
+
+
+def withdraw_batched(conn, cursor, user_id, lines):
+    conn.start_transaction()
+    _, _, changes = withdraw_cart(cursor, user_id, normalize_cart(lines))
+    apply_item_changes(cursor, changes)
+    conn.rollback()
+
+
+STRATEGIES = {
+    'single': withdraw_single,
+    'naive': withdraw_naive,
+    'cart': withdraw_batched,
+}
+
+
+def worker(strategy, args, item_ids, seed, results):
+    rng = random.Random(seed)
+    samples, errors = [], {'deadlock': 0, 'lock_wait_timeout': 0, 'other': 0}
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        for i in range(args.warmup + args.carts):
+            lines = [{'item_id': item_id, 'amount': 1} for item_id in rng.sample(item_ids, args.cart_size)]
+            started = time.perf_counter()
+            try:
+                strategy(conn, cursor, args.user_id, lines)
+            except Exception as e:
+                conn.rollback()
+                errno = getattr(e, 'errno', None)
+                key = 'deadlock' if errno == DEADLOCK else 'lock_wait_timeout' if errno == LOCK_WAIT_TIMEOUT else 'other'
+                if i >= args.warmup:
+                    errors[key] += 1
+                continue
+            if i >= args.warmup:
+                samples.append((time.perf_counter() - started) * 1000)
+        cursor.close()
+    finally:
+        conn.close()
+    results.append((samples, errors))
+
+
+def run(name, args, item_ids):
+    results = []
+    threads = [threading.Thread(target=worker, args=(STRATEGIES[name], args, item_ids, seed, results))
+               for seed in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    samples = [s for r in results for s in r[0]]
+    errors = {key: sum(r[1][key] for r in results) for key in ('deadlock', 'lock_wait_timeout', 'other')}
+    return {
+        'carts_per_s': round(len(samples) / elapsed, 1),
+        'p50_ms': round(statistics.median(samples), 3) if samples else None,
+        'p99_ms': round(percentile(samples, 99), 3) if samples else None,
+        **errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel multi-item withdrawals: per-item vs single-transaction cart')
+    parser.add_argument('--item-ids', required=True, help='เช่น 1-20 หรือ 1,5,9')
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--cart-size', type=int, default=5)
+    parser.add_argument('--carts', type=int, default=200, help='จำนวนตะกร้าต่อ thread')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), action='append')
+    args = parser.parse_args()
+
+    item_ids = parse_ids(args.item_ids)
+    if args.cart_size > len(item_ids):
+        parser.error('--cart-size ต้องไม่เกินจำนวน item ที่ให้มา')
+    db.DB_POOL_SIZE = max(db.DB_POOL_SIZE, args.threads)
+
+    for name in args.strategy or ['single', 'naive', 'cart']:
+        result = run(name, args, item_ids)
+        print(f"{name:>7}: {result['carts_per_s']} carts/s p50={result['p50_ms']}ms p99={result['p99_ms']}ms "
+              f"deadlocks={result['deadlock']} lock_timeouts={result['lock_wait_timeout']} errors={result['other']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+# ======================
+# Load test: เสิร์ฟหน้าอ่านอย่างเดียวแบบ sync (gunicorn app:app) vs ASGI (asgi.py) ที่ concurrency ต่างๆ
+# ======================
+# เปิด server จริงทั้งสองแบบด้วย gunicorn จำนวน worker เท่ากัน (--workers) บน DB ตัวเดียวกัน
+#   sync : gunicorn app:app                                  (แบบใน Procfile, worker แบบ sync)
+#   async: gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+# แล้วยิง GET หน้า index / room_view / tracking / history / borrow_history วนกันไป
+# ด้วย client พร้อมกัน N ตัว (--concurrency) ตัวละหนึ่ง request ต่อครั้ง ระดับละ --duration วินาที
+# วัด req/s, p50/p95/p99 และจำนวน error/timeout (--timeout) ต่อแบบต่อระดับ
+# - ใช้กับ DB ที่สร้างด้วย bench/seed.py (ค่าเริ่มต้น inventory_bench) ไม่แก้ข้อมูล
+# - client ไม่ส่ง If-None-Match (ทุก request render ใหม่ = กรณีหนักสุด) ใส่ --etag เพื่อจำลองจอที่รีเฟรชเอง
+# - ตัวยิงเป็น asyncio process เดียว ที่ concurrency สูงมากตัวยิงเองอาจเป็นคอขวด ทั้งสองแบบใช้ตัวยิงเดียวกัน
+#   ถ้าจะวัดละเอียดให้ชี้ --sync-url / --async-url ไปที่ server ที่เปิดไว้บนเครื่องอื่น
+#   python bench/seed.py --scale 100k --reset
+#   python bench/bench_concurrency.py --workers 2 --concurrency 1,10,50,100 --output concurrency.json
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from urllib.parse import quote, urlsplit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+SERVERS = {
+    'sync': ['app:app'],
+    'async': ['asgi:app', '-k', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def bench_paths():
+    # ห้องที่มีพัสดุมากสุด + ช่วง 30 วันล่าสุดของประวัติ (หาจาก DB ที่ seed ไว้)
+    import db
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT s.location FROM storages s JOIN items i ON i.storage_id = s.storage_id
+            GROUP BY s.location ORDER BY COUNT(*) DESC LIMIT 1
+        """)
+        room = cursor.fetchone()[0]
+        cursor.execute("SELECT DATE(MAX(transaction_date)) - INTERVAL 30 DAY FROM transactions")
+        start_date = cursor.fetchone()[0]
+        conn.commit()
+    finally:
+        conn.close()
+    return [
+        '/',
+        f"/room/{quote(room)}",
+        '/tracking',
+        f"/history?location={quote(room)}&start_date={start_date}",
+        '/borrow_history',
+    ]
+
+
+# ======================
+# เปิด/ปิด server
+# ======================
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, args):
+    port = free_port()
+    env = dict(os.environ, DB_NAME=args.database, OVERDUE_SCAN_WORKER='0')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', *SERVERS[mode], '--workers', str(args.workers),
+         '--bind', f"127.0.0.1:{port}", '--timeout', str(int(args.timeout) + 30), '--log-level', 'warning'],
+        cwd=ROOT_DIR, env=env)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            with urllib.request.urlopen(f"{url}/db_pool_stats", timeout=2):
+                return process, url
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                stop_server(process)
+                raise SystemExit(f"{mode} server did not start (see output above)")
+            time.sleep(0.2)
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# ======================
+# ตัวยิง (HTTP/1.1 แบบเปิด connection ใหม่ทุก request ทั้งสองแบบเท่ากัน)
+# ======================
+async def fetch(host, port, path, etag):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        head = f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n"
+        if etag:
+            head += f"If-None-Match: {etag}\r\n"
+        writer.write((head + "\r\n").encode('latin1'))
+        await writer.drain()
+        data = await reader.read()
+    finally:
+        writer.close()
+    header, _, _ = data.partition(b'\r\n\r\n')
+    lines = header.decode('latin1').split('\r\n')
+    headers = dict(line.split(': ', 1) for line in lines[1:] if ': ' in line)
+    return int(lines[0].split(' ', 2)[1]), headers.get('ETag') or headers.get('etag')
+
+
+async def client(url, paths, offset, args, stop_at, samples, counts):
+    target = urlsplit(url)
+    etags = {}
+    i = offset
+    while time.monotonic() < stop_at:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            status, etag = await asyncio.wait_for(fetch(target.hostname, target.port, path, etags.get(path)), args.timeout)
+        except asyncio.TimeoutError:
+            counts['timeouts'] += 1
+            continue
+        except OSError:
+            counts['errors'] += 1
+            continue
+        if status >= 400:
+            counts['errors'] += 1
+            continue
+        if args.etag and etag:
+            etags[path] = etag
+        counts['not_modified'] += status == 304
+        samples.append((time.perf_counter() - started) * 1000)
+
+
+async def run_level(url, paths, concurrency, args):
+    samples, counts = [], {'errors': 0, 'timeouts': 0, 'not_modified': 0}
+    # warmup: ให้แคช/pool ของทุก worker พร้อมก่อนวัด
+    await asyncio.gather(*[client(url, paths, n, args, time.monotonic() + args.warmup, [], dict(counts))
+                           for n in range(concurrency)])
+    started = time.perf_counter()
+    stop_at = time.monotonic() + args.duration
+    await asyncio.gather(*[client(url, paths, n, args, stop_at, samples, counts) for n in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    return {
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'req_per_s': round(len(samples) / elapsed, 1),
+        'p50_ms': round(statistics.median(samples), 1) if samples else None,
+        'p95_ms': round(percentile(samples, 95), 1) if samples else None,
+        'p99_ms': round(percentile(samples, 99), 1) if samples else None,
+        **counts,
+    }
+
+
+def print_row(mode, result):
+    print(f"{mode:>6} c={result['concurrency']:<4} {result['req_per_s']:>8} req/s  p50={result['p50_ms']}ms "
+          f"p95={result['p95_ms']}ms p99={result['p99_ms']}ms errors={result['errors']} timeouts={result['timeouts']}"
+          f"{' 304=' + str(result['not_modified']) if result['not_modified'] else ''}")
+
+
+def compare(results):
+    print(f"\n{'c':>5}  {'sync req/s':>10} {'async req/s':>11} {'x':>6}  {'sync p99':>9} {'async p99':>9}")
+    for sync, asgi in zip(results['sync'], results['async']):
+        ratio = asgi['req_per_s'] / sync['req_per_s'] if sync['req_per_s'] else 0
+        print(f"{sync['concurrency']:>5}  {sync['req_per_s']:>10} {asgi['req_per_s']:>11} {ratio:>5.2f}x  "
+              f"{sync['p99_ms']:>9} {asgi['p99_ms']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Read-heavy dashboard pages: sync gunicorn vs ASGI under concurrent load')
+    parser.add_argument('--database', default='inventory_bench')
+    parser.add_argument('--workers', type=int, default=2, help='จำนวน worker ของ gunicorn (เท่ากันทั้งสองแบบ)')
+    parser.add_argument('--concurrency', default='1,10,50,100', help='จำนวน client พร้อมกัน คั่นด้วย ,')
+    parser.add_argument('--duration', type=float, default=10, help='วินาทีต่อระดับ')
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--timeout', type=float, default=30, help='วินาทีที่ client รอต่อ request')
+    parser.add_argument('--etag', action='store_true', help='ส่ง If-None-Match ของรอบก่อน (จอที่รีเฟรชเอง)')
+    parser.add_argument('--modes', default='sync,async')
+    parser.add_argument('--sync-url', help='ใช้ server แบบ sync ที่เปิดไว้แล้ว แทนการเปิดเอง')
+    parser.add_argument('--async-url', help='ใช้ server แบบ ASGI ที่เปิดไว้แล้ว แทนการเปิดเอง')
+    parser.add_argument('--output', help='เขียนผลเป็นไฟล์ JSON')
+    args = parser.parse_args()
+
+    # db.py อ่าน DB_NAME ตอน import
+    os.environ['DB_NAME'] = args.database
+    levels = [int(x) for x in args.concurrency.split(',') if x]
+    modes = [m for m in args.modes.split(',') if m]
+    unknown = set(modes) - set(SERVERS)
+    if unknown:
+        raise SystemExit(f"Unknown mode(s): {', '.join(sorted(unknown))}")
+    paths = bench_paths()
+    print(f"Paths: {', '.join(paths)}")
+
+    results = {}
+    for mode in modes:
+        url = getattr(args, f"{mode}_url")
+        process = None
+        if not url:
+            process, url = start_server(mode, args)
+        try:
+            results[mode] = []
+            for concurrency in levels:
+                result = asyncio.run(run_level(url, paths, concurrency, args))
+                results[mode].append(result)
+                print_row(mode, result)
+        finally:
+            if process:
+                stop_server(process)
+
+    if args.output:
+        report = {'workers': args.workers, 'duration': args.duration, 'etag': args.etag, 'paths': paths, 'results': results}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Wrote {args.output}")
+    if 'sync' in results and 'async' in results:
+        compare(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+# ======================
+# Load test: ตัดสต็อกของยอดฮิต แบบล็อคแถว (locking) vs UPDATE แบบมีเงื่อนไข (atomic)
+# ======================
+# หลาย thread เบิกของชิ้นเดียวกัน (หรือไม่กี่ชิ้น) พร้อมกัน ด้วยชุดคำสั่งเดียวกับ withdraw_item
+# ผ่าน stock.take_stock + stock.run_in_transaction กับ DB ตาม env DB_*
+# ปกติ rollback ทุกรอบ ข้อมูลจริงจึงไม่เปลี่ยน ใส่ --commit ถ้าอยากให้สต็อกลดจริง (ระวังของหมด)
+#   python bench/bench_decrement.py --item-ids 1 --user-id 1 --threads 16 --requests 500
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from stock import take_stock, run_in_transaction, StockError
+
+
+class BenchSession:
+    # หน้าตาแบบ DbSession (start_transaction/commit/rollback) สำหรับ run_in_transaction
+    # นับจำนวน transaction ที่เริ่มไว้ ส่วนที่เกินจำนวน request คือรอบที่ต้อง retry
+    def __init__(self, conn, commit):
+        self.conn = conn
+        self.do_commit = commit
+        self.starts = 0
+
+    def start_transaction(self):
+        self.starts += 1
+        self.conn.start_transaction()
+
+    def commit(self):
+        if self.do_commit:
+            self.conn.commit()
+        else:
+            self.conn.rollback()
+
+    def rollback(self):
+        self.conn.rollback()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def withdraw_once(session, cursor, strategy, item_id, user_id, retries):
+    def work():
+        take_stock(cursor, item_id, 1, strategy=strategy)
+        cursor.execute("INSERT INTO transactions (user_id, status) VALUES (%s, 'อนุมัติแล้ว')", (user_id,))
+        cursor.execute("""
+            INSERT INTO transaction_details (transaction_id, item_id, amount)
+            VALUES (%s, %s, %s)
+        """, (cursor.lastrowid, item_id, 1))
+
+    run_in_transaction(session, work, retries=retries)
+
+
+def worker(strategy, args, item_ids, seed, results):
+    rng = random.Random(seed)
+    samples, counts = [], {'out_of_stock': 0, 'failed': 0}
+    conn = db.get_db_connection()
+    session = BenchSession(conn, args.commit)
+    try:
+        cursor = conn.cursor(dictionary=True, prepared=True)
+        for i in range(args.warmup + args.requests):
+            started = time.perf_counter()
+            try:
+                withdraw_once(session, cursor, strategy, rng.choice(item_ids), args.user_id, args.retries)
+            except StockError:
+                counts['out_of_stock'] += 1
+                continue
+            except Exception:
+                counts['failed'] += 1
+                continue
+            if i >= args.warmup:
+                samples.append((time.perf_counter() - started) * 1000)
+    finally:
+        conn.close()
+    counts['retries'] = session.starts - (args.warmup + args.requests)
+    results.append((samples, counts))
+
+
+def run(strategy, args, item_ids):
+    results = []
+    threads = [threading.Thread(target=worker, args=(strategy, args, item_ids, seed, results))
+               for seed in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    samples = [s for r in results for s in r[0]]
+    counts = {key: sum(r[1][key] for r in results) for key in ('out_of_stock', 'failed', 'retries')}
+    return {
+        'req_per_s': round(len(samples) / elapsed, 1),
+        'p50_ms': round(statistics.median(samples), 3) if samples else None,
+        'p99_ms': round(percentile(samples, 99), 3) if samples else None,
+        **counts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hot-item stock decrement: SELECT FOR UPDATE vs conditional UPDATE')
+    parser.add_argument('--item-ids', required=True, help='เช่น 1 หรือ 1,2,3 (ยิ่งน้อยยิ่งแย่งกันหนัก)')
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=500, help='จำนวนครั้งต่อ thread')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--retries', type=int, default=3)
+    parser.add_argument('--commit', action='store_true')
+    args = parser.parse_args()
+
+    item_ids = [int(x) for x in args.item_ids.split(',') if x]
+    db.DB_POOL_SIZE = max(db.DB_POOL_SIZE, args.threads)
+
+    for strategy in ('locking', 'atomic'):
+        result = run(strategy, args, item_ids)
+        print(f"{strategy:>8}: {result['req_per_s']} req/s p50={result['p50_ms']}ms p99={result['p99_ms']}ms "
+              f"retries={result['retries']} out_of_stock={result['out_of_stock']} failed={result['failed']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# ======================
+# Micro-benchmark: render หน้าแรก/หน้าห้อง แบบไม่แคช vs fragment cache
+# ======================
+# render index.html (รวม modals.html) ด้วยข้อมูลสังเคราะห์ ไม่ต้องมี DB
+# แบบ "off" ส่งเลขเวอร์ชันเป็น None (render สดทุกบล็อก) แบบ "on" ส่งเลขเวอร์ชันคงที่ (ได้จากแคชหลังรอบแรก)
+#   python bench/bench_fragments.py --users 300 --storages 200 --rooms 20 --iterations 500
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template
+from app import app
+from fragment_cache import fragment_cache
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def make_context(args, location, cached):
+    users = [{'user_id': i, 'fullname': f'ผู้ใช้ทดสอบ {i}', 'department': f'แผนก {i % 12}'}
+             for i in range(1, args.users + 1)]
+    rooms = [f'ห้อง {r}' for r in range(1, args.rooms + 1)]
+    storages = [{'storage_id': i, 'storage_name': f'ตู้ {i}', 'location': rooms[i % len(rooms)]}
+                for i in range(1, args.storages + 1)]
+    room_stats = [{'location': room, 'item_count': 40, 'storage_count': args.storages // args.rooms} for room in rooms]
+    return dict(
+        current_location=location,
+        items=[], next_cursor=None, total_items=1000, low_stock=10, borrow_count=3,
+        room_stats=[] if location else room_stats,
+        chart_labels=[] if location else rooms,
+        low_stock_data=[1] * (0 if location else len(rooms)),
+        normal_stock_data=[5] * (0 if location else len(rooms)),
+        users=users, storages=storages, locations=rooms,
+        refdata_version=1 if cached else None,
+        data_version=1 if cached else None,
+    )
+
+
+def run(args, location, cached):
+    context = make_context(args, location, cached)
+    fragment_cache.clear()
+    samples = []
+    with app.test_request_context('/'):
+        for i in range(args.warmup + args.iterations):
+            started = time.perf_counter()
+            render_template('index.html', **context)
+            if i >= args.warmup:
+                samples.append((time.perf_counter() - started) * 1000)
+    return {
+        'p50_ms': round(statistics.median(samples), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'pages_per_s': round(len(samples) / (sum(samples) / 1000), 1),
+        **fragment_cache.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Jinja render time with and without the fragment cache')
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--storages', type=int, default=200)
+    parser.add_argument('--rooms', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=20)
+    args = parser.parse_args()
+
+    for page, location in (('index', None), ('room', 'ห้อง 1')):
+        for mode, cached in (('off', False), ('on', True)):
+            result = run(args, location, cached)
+            print(f"{page:>5} cache={mode:<3}: p50={result['p50_ms']}ms p99={result['p99_ms']}ms "
+                  f"{result['pages_per_s']} pages/s hits={result['hits']} misses={result['misses']}")
+
+
+if __name__ == '__main__':
+    main()
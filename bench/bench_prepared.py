@@ -0,0 +1,78 @@
+# ======================
+# Micro-benchmark: เส้นทางเบิกของ แบบปกติ vs Prepared Statement
+# ======================
+# ยิงชุดคำสั่งเดียวกับ withdraw_item (ล็อคแถว, บันทึกหัว+รายการ, ตัดสต็อก) กับ DB ตาม env DB_*
+# แล้ว rollback ทุกรอบ ข้อมูลจริงจึงไม่เปลี่ยน
+#   python bench/bench_prepared.py --item-id 1 --user-id 1 --iterations 2000
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import get_db_connection
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def withdraw_once(conn, cursor, item_id, user_id, amount=1):
+    conn.start_transaction()
+    cursor.execute("SELECT item_name, quantity, unit FROM items WHERE item_id = %s FOR UPDATE", (item_id,))
+    item = cursor.fetchone()
+    cursor.execute("INSERT INTO transactions (user_id, status) VALUES (%s, 'อนุมัติแล้ว')", (user_id,))
+    transaction_id = cursor.lastrowid
+    cursor.execute("""
+        INSERT INTO transaction_details (transaction_id, item_id, amount) 
+        VALUES (%s, %s, %s)
+    """, (transaction_id, item_id, amount))
+    cursor.execute("UPDATE items SET quantity = quantity - %s WHERE item_id = %s", (amount, item_id))
+    cursor.execute("SELECT fullname FROM users WHERE user_id = %s", (user_id,))
+    cursor.fetchone()
+    conn.rollback()
+    return item
+
+
+def run(prepared, args):
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=True, prepared=prepared)
+        for _ in range(args.warmup):
+            withdraw_once(conn, cursor, args.item_id, args.user_id)
+
+        samples = []
+        for _ in range(args.iterations):
+            started = time.perf_counter()
+            withdraw_once(conn, cursor, args.item_id, args.user_id)
+            samples.append((time.perf_counter() - started) * 1000)
+        cursor.close()
+    finally:
+        conn.close()
+
+    return {
+        'p50_ms': round(statistics.median(samples), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Withdraw path latency: plain vs prepared statements')
+    parser.add_argument('--item-id', type=int, required=True)
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--warmup', type=int, default=100)
+    args = parser.parse_args()
+
+    for label, prepared in (('plain', False), ('prepared', True)):
+        result = run(prepared, args)
+        print(f"{label:>9}: p50={result['p50_ms']}ms p99={result['p99_ms']}ms mean={result['mean_ms']}ms")
+
+
+if __name__ == '__main__':
+    main()
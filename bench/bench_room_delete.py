@@ -0,0 +1,169 @@
+# ======================
+# Load test: ลบห้องใหญ่ระหว่างที่ห้องอื่นกำลังเบิกของ (แบบเดิม transaction เดียว vs งานแบ่งก้อน)
+# ======================
+# 1. สร้างห้องทดสอบ (--storages ตู้, --items พัสดุ, --history ประวัติการเบิก+ยืมต่อพัสดุ) กับ DB ตาม env DB_*
+# 2. เริ่มลบห้องนั้น แล้วให้หลาย thread เบิกพัสดุของห้องอื่น (--item-ids) ไปพร้อมกันจนลบเสร็จ
+# 3. แสดงเวลาเบิก p50/p99/max ระหว่างลบ เทียบกับช่วงก่อนลบ (ถ้าถูกบล็อกจะเห็น max พุ่งเท่าเวลาลบ)
+# การเบิกถูก rollback ทุกรอบ ข้อมูลจริงไม่เปลี่ยน ห้องทดสอบถูกลบทิ้งในตัว
+#   python bench/bench_room_delete.py --item-ids 1,2 --user-id 1 --items 20000 --history 5 --mode chunked
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from stock import take_stock, StockError
+from stock_summary import refresh_locations
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed_room(args, location):
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.executemany("INSERT INTO storages (storage_name, location) VALUES (%s, %s)",
+                           [(f'bench-storage-{s}', location) for s in range(args.storages)])
+        cursor.execute("SELECT storage_id FROM storages WHERE location = %s", (location,))
+        storage_ids = [r[0] for r in cursor.fetchall()]
+        conn.commit()
+
+        for start in range(0, args.items, 1000):
+            count = min(1000, args.items - start)
+            cursor.executemany("INSERT INTO items (item_name, quantity, unit, storage_id) VALUES (%s, %s, %s, %s)",
+                               [(f'bench-item-{start + i}', 100, 'ชิ้น', storage_ids[(start + i) % len(storage_ids)])
+                                for i in range(count)])
+            cursor.execute("SELECT LAST_INSERT_ID()")
+            first_id = cursor.fetchone()[0]
+            item_ids = range(first_id, first_id + count)
+            for _ in range(args.history):
+                cursor.execute("INSERT INTO transactions (user_id, status) VALUES (%s, 'อนุมัติแล้ว')", (args.user_id,))
+                transaction_id = cursor.lastrowid
+                cursor.executemany("INSERT INTO transaction_details (transaction_id, item_id, amount) VALUES (%s, %s, 1)",
+                                   [(transaction_id, item_id) for item_id in item_ids])
+                cursor.executemany("""
+                    INSERT INTO borrow_transactions (item_id, user_id, amount, note, borrow_date, status)
+                    VALUES (%s, %s, 1, 'bench', NOW(), 'returned')
+                """, [(item_id, args.user_id) for item_id in item_ids])
+            conn.commit()
+
+        refresh_locations(cursor, [location])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def delete_legacy(location):
+    # ชุดคำสั่งเดิมของ delete_room (transaction เดียว)
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        conn.start_transaction()
+        cursor.execute("""
+            DELETE FROM borrow_transactions
+            WHERE item_id IN (SELECT item_id FROM items WHERE storage_id IN (SELECT storage_id FROM storages WHERE location = %s))
+        """, (location,))
+        cursor.execute("""
+            DELETE FROM transaction_details
+            WHERE item_id IN (SELECT item_id FROM items WHERE storage_id IN (SELECT storage_id FROM storages WHERE location = %s))
+        """, (location,))
+        cursor.execute("DELETE FROM items WHERE storage_id IN (SELECT storage_id FROM storages WHERE location = %s)", (location,))
+        cursor.execute("DELETE FROM storages WHERE location = %s", (location,))
+        refresh_locations(cursor, [location])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def delete_chunked(location):
+    from room_deletion import create_job, run_job
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        job_id = create_job(cursor, location)
+        conn.commit()
+    finally:
+        conn.close()
+    run_job(job_id)
+
+
+def withdraw_loop(args, item_id, stop, samples):
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=True, prepared=True)
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                conn.start_transaction()
+                take_stock(cursor, item_id, 1)
+                cursor.execute("INSERT INTO transactions (user_id, status) VALUES (%s, 'อนุมัติแล้ว')", (args.user_id,))
+                cursor.execute("INSERT INTO transaction_details (transaction_id, item_id, amount) VALUES (%s, %s, 1)",
+                               (cursor.lastrowid, item_id))
+            except StockError:
+                pass
+            finally:
+                conn.rollback()
+            samples.append((time.perf_counter() - started) * 1000)
+    finally:
+        conn.close()
+
+
+def measure(args, item_ids, work):
+    stop = threading.Event()
+    samples = [[] for _ in range(args.threads)]
+    threads = [threading.Thread(target=withdraw_loop, args=(args, item_ids[i % len(item_ids)], stop, samples[i]))
+               for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    started = time.perf_counter()
+    work()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for t in threads:
+        t.join()
+    flat = [s for per_thread in samples for s in per_thread]
+    return elapsed, {
+        'withdrawals': len(flat),
+        'p50_ms': round(statistics.median(flat), 2) if flat else None,
+        'p99_ms': round(percentile(flat, 99), 2) if flat else None,
+        'max_ms': round(max(flat), 2) if flat else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Withdrawal latency in other rooms while a large room is deleted')
+    parser.add_argument('--item-ids', required=True, help='พัสดุของห้องอื่นที่ใช้เบิกระหว่างลบ เช่น 1,2')
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('--storages', type=int, default=20)
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--history', type=int, default=5, help='จำนวนแถวประวัติการเบิกและการยืมต่อพัสดุ')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--baseline-seconds', type=float, default=3)
+    parser.add_argument('--mode', choices=('legacy', 'chunked'), default='chunked')
+    args = parser.parse_args()
+
+    item_ids = [int(x) for x in args.item_ids.split(',') if x]
+    db.DB_POOL_SIZE = max(db.DB_POOL_SIZE, args.threads + 2)
+    location = f'bench-room-{int(time.time())}'
+
+    print(f"Seeding {location}: {args.storages} storages, {args.items} items, {args.history} history rows/item ...")
+    seed_room(args, location)
+
+    _, baseline = measure(args, item_ids, lambda: time.sleep(args.baseline_seconds))
+    print(f"  baseline: {baseline}")
+
+    delete = delete_legacy if args.mode == 'legacy' else delete_chunked
+    elapsed, during = measure(args, item_ids, lambda: delete(location))
+    print(f"{args.mode:>9}: delete took {elapsed:.2f}s, withdrawals meanwhile: {during}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,550 @@
+# ======================
+# Benchmark ทุก endpoint ผ่าน Flask test client (latency / จำนวน query / peak RSS ต่อ route)
+# ======================
+# ใช้กับ DB ที่สร้างด้วย bench/seed.py (ค่าเริ่มต้น inventory_bench) ผลเป็น JSON ไว้เทียบข้าม commit
+# - ทุก endpoint ใน app.url_map ต้องมี scenario อย่างน้อยหนึ่งอัน (ที่ขาดจะแสดงเป็น uncovered)
+# - จำนวน query อ่านจาก header X-DB-Queries (export CSV ใช้ connection ของตัวเอง จึงเป็น 0)
+# - ค่าเริ่มต้นรันแต่ละ scenario ใน process ใหม่ peak RSS จึงเป็นของ route นั้นจริงๆ
+#   rss_over_baseline_mb = peak RSS ลบ process ที่แค่ import แอป + เตรียมข้อมูล (ไม่ยิง request)
+# - scenario ที่แก้ข้อมูลรันหลังกลุ่มอ่านอย่างเดียว และเตรียมข้อมูลของตัวเอง (ไม่นับเวลา)
+#   ข้อมูลจึงเปลี่ยนไปเล็กน้อยทุกครั้งที่รัน ก่อนเทียบผลให้ seed ใหม่ด้วย --reset
+#   python bench/seed.py --scale 100k --reset
+#   python bench/bench_routes.py --iterations 50 --output before.json
+#   python bench/bench_routes.py --iterations 50 --output after.json --compare before.json
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+SCENARIOS = []
+
+
+def scenario(name, endpoint, mutates=False):
+    def register(build):
+        SCENARIOS.append({'name': name, 'endpoint': endpoint, 'mutates': mutates, 'build': build})
+        return build
+    return register
+
+
+def req(method, url, after=None, **kwargs):
+    # after(response): เก็บกวาดหลังวัดเวลา (ไม่นับเวลา)
+    return method, url, kwargs, after
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    # Linux รายงานเป็น KB, macOS เป็นไบต์
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+# ======================
+# ข้อมูลที่ scenario ใช้ (หาจาก DB ที่ seed ไว้ ไม่นับเวลา)
+# ======================
+class Fixtures:
+    def __init__(self):
+        import db
+        self.conn = db.get_db_connection()
+        self.counter = 0
+        self.room = self.one("""
+            SELECT s.location FROM storages s JOIN items i ON i.storage_id = s.storage_id
+            WHERE s.location LIKE 'ห้อง %%' GROUP BY s.location ORDER BY COUNT(*) DESC LIMIT 1
+        """)
+        self.storage_id = self.one("SELECT MIN(storage_id) FROM storages WHERE location = %s", (self.room,))
+        self.user_id = self.one("SELECT MIN(user_id) FROM users")
+        self.item_ids = [r[0] for r in self.all("""
+            SELECT i.item_id FROM items i JOIN storages s ON i.storage_id = s.storage_id
+            WHERE s.location = %s ORDER BY i.quantity DESC LIMIT 3
+        """, (self.room,))]
+        latest = self.one("SELECT MAX(transaction_date) FROM transactions") or datetime.now()
+        self.end_date = latest.strftime('%Y-%m-%d')
+        self.start_date = (latest - timedelta(days=30)).strftime('%Y-%m-%d')
+        self.run_id = int(time.time())
+        # cursor หน้าลึก (ราวกลางประวัติ) วัดเงื่อนไข seek ของ keyset pagination แทนที่จะวัดแค่หน้าแรก
+        self.history_cursor = self.middle_cursor("""
+            SELECT t.transaction_date, t.transaction_id, td.item_id
+            FROM transactions t JOIN transaction_details td ON t.transaction_id = td.transaction_id
+            ORDER BY t.transaction_date DESC, t.transaction_id DESC, td.item_id DESC
+        """, "SELECT COUNT(*) FROM transaction_details")
+        self.borrow_history_cursor = self.middle_cursor(
+            "SELECT borrow_date, id FROM borrow_transactions ORDER BY borrow_date DESC, id DESC",
+            "SELECT COUNT(*) FROM borrow_transactions")
+
+    def middle_cursor(self, sql, count_sql):
+        from pagination import encode_cursor
+        rows = self.all(f"{sql} LIMIT 1 OFFSET %s", ((self.one(count_sql) or 0) // 2,))
+        return encode_cursor(list(rows[0])) if rows else None
+
+    def all(self, sql, args=()):
+        cursor = self.conn.cursor()
+        cursor.execute(sql, args)
+        rows = cursor.fetchall()
+        self.conn.commit()
+        return rows
+
+    def one(self, sql, args=()):
+        rows = self.all(sql, args)
+        return rows[0][0] if rows else None
+
+    def execute(self, sql, args=()):
+        cursor = self.conn.cursor()
+        cursor.execute(sql, args)
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def unique(self, prefix):
+        self.counter += 1
+        return f"{prefix}-{self.run_id}-{self.counter}"
+
+    def new_item(self, quantity=50):
+        from stock_summary import apply_item_changes
+        cursor = self.conn.cursor()
+        cursor.execute("INSERT INTO items (item_name, quantity, unit, storage_id) VALUES (%s, %s, 'ชิ้น', %s)",
+                       (self.unique('bench-item'), quantity, self.storage_id))
+        item_id = cursor.lastrowid
+        apply_item_changes(cursor, [(self.storage_id, None, (quantity, 10))])
+        self.conn.commit()
+        return item_id
+
+    def ready_report(self):
+        # รายงานที่สร้างเสร็จแล้ว 1 อัน (สร้างใหม่ถ้ายังไม่มี/ไฟล์หายไป)
+        from reports import enqueue_report, get_report_path, run_next_report
+        cursor = self.conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT id, status, file_name FROM report_jobs WHERE kind = 'items' AND status = 'done' ORDER BY id DESC LIMIT 1
+        """)
+        job = cursor.fetchone()
+        self.conn.commit()
+        if job and get_report_path(job):
+            return job['id']
+        job_id = enqueue_report(self.conn.cursor(), 'items', {'location': self.room})
+        self.conn.commit()
+        while run_next_report() not in (job_id, None):
+            pass
+        return job_id
+
+    def room_deletion_job(self):
+        from room_deletion import create_job, run_job
+        job_id = self.one("SELECT MAX(id) FROM room_deletion_jobs")
+        if job_id:
+            return job_id
+        job_id = create_job(self.conn.cursor(), self.unique('bench-empty-room'))
+        self.conn.commit()
+        run_job(job_id)
+        return job_id
+
+    def wait_room_deletion(self, job_id, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.one("SELECT status FROM room_deletion_jobs WHERE id = %s", (job_id,)) in ('done', 'failed'):
+                return
+            time.sleep(0.05)
+
+
+def _job_id(response):
+    # id งานจาก redirect ไปหน้าสถานะ (None ถ้า route ล้มเหลวแล้ว redirect ไปที่อื่น)
+    last = response.headers.get('Location', '').rstrip('/').split('/')[-1]
+    return int(last) if last.isdigit() else None
+
+
+# ======================
+# scenario: อ่านอย่างเดียว
+# ======================
+@scenario('index', 'dashboard.index')
+def _(fx, client):
+    return req('GET', '/')
+
+@scenario('index_not_modified', 'dashboard.index')
+def _(fx, client):
+    etag = client.get('/').headers.get('ETag')
+    return req('GET', '/', headers={'If-None-Match': etag} if etag else {})
+
+@scenario('room_view', 'dashboard.room_view')
+def _(fx, client):
+    return req('GET', f'/room/{quote(fx.room)}')
+
+@scenario('search_room_items', 'dashboard.search_room_items')
+def _(fx, client):
+    return req('GET', '/api/room_items', query_string={'location': fx.room, 'q': 'กระดาษ'})
+
+@scenario('low_stock_items', 'dashboard.low_stock_items')
+def _(fx, client):
+    return req('GET', '/api/low_stock', query_string={'location': fx.room})
+
+@scenario('tracking', 'dashboard.tracking')
+def _(fx, client):
+    return req('GET', '/tracking')
+
+@scenario('overdue', 'dashboard.overdue')
+def _(fx, client):
+    return req('GET', '/overdue')
+
+@scenario('history', 'dashboard.history')
+def _(fx, client):
+    return req('GET', '/history')
+
+@scenario('history_deep_page', 'dashboard.history')
+def _(fx, client):
+    return req('GET', '/history', query_string={'after': fx.history_cursor})
+
+@scenario('history_filtered', 'dashboard.history')
+def _(fx, client):
+    return req('GET', '/history', query_string={'location': fx.room, 'start_date': fx.start_date, 'end_date': fx.end_date})
+
+@scenario('borrow_history', 'dashboard.borrow_history')
+def _(fx, client):
+    return req('GET', '/borrow_history')
+
+@scenario('borrow_history_deep_page', 'dashboard.borrow_history')
+def _(fx, client):
+    return req('GET', '/borrow_history', query_string={'after': fx.borrow_history_cursor})
+
+@scenario('export_items', 'dashboard.export_items')
+def _(fx, client):
+    return req('GET', '/export_items', query_string={'location': fx.room})
+
+@scenario('export_history', 'dashboard.export_history')
+def _(fx, client):
+    return req('GET', '/export_history', query_string={'start_date': fx.start_date, 'end_date': fx.end_date})
+
+@scenario('report_status', 'reports.report_status')
+def _(fx, client):
+    return req('GET', f'/reports/job/{fx.ready_report()}')
+
+@scenario('report_progress', 'reports.report_progress')
+def _(fx, client):
+    return req('GET', f'/api/reports/{fx.ready_report()}')
+
+@scenario('download_report', 'reports.download_report')
+def _(fx, client):
+    return req('GET', f'/reports/job/{fx.ready_report()}/download')
+
+@scenario('room_deletion_status', 'manage.room_deletion_status')
+def _(fx, client):
+    return req('GET', f'/room_deletion/{fx.room_deletion_job()}')
+
+@scenario('room_deletion_progress', 'manage.room_deletion_progress')
+def _(fx, client):
+    return req('GET', f'/api/room_deletion/{fx.room_deletion_job()}')
+
+@scenario('db_pool_stats', 'db_pool_stats')
+def _(fx, client):
+    return req('GET', '/db_pool_stats')
+
+@scenario('metrics', 'metrics')
+def _(fx, client):
+    return req('GET', '/metrics')
+
+@scenario('static', 'static')
+def _(fx, client):
+    return req('GET', '/static/style.css')
+
+# ======================
+# scenario: แก้ข้อมูล
+# ======================
+@scenario('withdraw_item', 'inventory.withdraw_item', mutates=True)
+def _(fx, client):
+    return req('POST', '/withdraw_item', data={'item_id': fx.item_ids[0], 'amount': 1, 'user_id': fx.user_id,
+                                               'current_room': fx.room})
+
+@scenario('withdraw_cart', 'inventory.withdraw_cart_api', mutates=True)
+def _(fx, client):
+    return req('POST', '/api/withdraw_cart', json={'user_id': fx.user_id,
+                                                   'items': [{'item_id': i, 'amount': 1} for i in fx.item_ids]})
+
+@scenario('borrow_item', 'dashboard.borrow_item', mutates=True)
+def _(fx, client):
+    return req('POST', '/borrow_item', data={'item_id': fx.item_ids[1], 'amount': 1, 'user_id': fx.user_id,
+                                             'note': 'bench', 'due_date': '', 'current_room': fx.room})
+
+@scenario('return_item', 'dashboard.return_item_confirm', mutates=True)
+def _(fx, client):
+    borrow_id = fx.execute("""
+        INSERT INTO borrow_transactions (item_id, user_id, amount, note, borrow_date, status)
+        VALUES (%s, %s, 1, 'bench', NOW(), 'borrowed')
+    """, (fx.item_ids[1], fx.user_id))
+    return req('POST', '/return_item_confirm', data={'borrow_id': borrow_id, 'return_amount': 1})
+
+@scenario('add_item', 'inventory.add_item', mutates=True)
+def _(fx, client):
+    return req('POST', '/add_item', data={'item_name': fx.unique('bench-item'), 'quantity': 20, 'unit': 'ชิ้น',
+                                          'storage_id': fx.storage_id, 'current_room': fx.room})
+
+@scenario('update_item', 'inventory.update_item', mutates=True)
+def _(fx, client):
+    item_id = fx.new_item()
+    return req('POST', '/update_item', data={'item_id': item_id, 'item_name': fx.unique('bench-item'), 'quantity': 40,
+                                             'unit': 'ชิ้น', 'storage_id': fx.storage_id, 'current_room': fx.room})
+
+@scenario('delete_item', 'inventory.delete_item', mutates=True)
+def _(fx, client):
+    return req('GET', f'/delete_item/{fx.new_item()}', query_string={'current_room': fx.room})
+
+@scenario('import_items', 'inventory.import_items', mutates=True)
+def _(fx, client):
+    storage_name = fx.one("SELECT storage_name FROM storages WHERE storage_id = %s", (fx.storage_id,))
+    lines = ['ชื่อพัสดุ,จำนวนคงเหลือ,หน่วยนับ,ตู้เก็บ,ห้อง']
+    lines += [f'bench-import-{n},{n},ชิ้น,{storage_name},{fx.room}' for n in range(200)]
+    upload = (io.BytesIO('\n'.join(lines).encode('utf-8')), 'bench.csv')
+    return req('POST', '/import_items', data={'mode': 'import', 'current_room': fx.room, 'file': upload},
+               content_type='multipart/form-data')
+
+@scenario('add_user', 'manage.add_user', mutates=True)
+def _(fx, client):
+    return req('POST', '/add_user', data={'fullname': fx.unique('bench-user'), 'department': 'bench'})
+
+@scenario('update_user', 'manage.update_user', mutates=True)
+def _(fx, client):
+    user_id = fx.execute("INSERT INTO users (fullname, department) VALUES (%s, 'bench')", (fx.unique('bench-user'),))
+    return req('POST', '/update_user', data={'user_id': user_id, 'fullname': fx.unique('bench-user'), 'department': 'bench'})
+
+@scenario('delete_user', 'manage.delete_user', mutates=True)
+def _(fx, client):
+    user_id = fx.execute("INSERT INTO users (fullname, department) VALUES (%s, 'bench')", (fx.unique('bench-user'),))
+    return req('GET', f'/delete_user/{user_id}')
+
+@scenario('add_storage', 'manage.add_storage', mutates=True)
+def _(fx, client):
+    return req('POST', '/add_storage', data={'storage_name': fx.unique('bench-storage'), 'location': fx.room})
+
+@scenario('update_storage', 'manage.update_storage', mutates=True)
+def _(fx, client):
+    storage_id = fx.execute("INSERT INTO storages (storage_name, location) VALUES (%s, %s)",
+                            (fx.unique('bench-storage'), fx.room))
+    return req('POST', '/update_storage', data={'storage_id': storage_id, 'storage_name': fx.unique('bench-storage'),
+                                                'location': fx.room})
+
+@scenario('delete_storage', 'manage.delete_storage', mutates=True)
+def _(fx, client):
+    storage_id = fx.execute("INSERT INTO storages (storage_name, location) VALUES (%s, %s)",
+                            (fx.unique('bench-storage'), fx.room))
+    return req('GET', f'/delete_storage/{storage_id}')
+
+@scenario('edit_room', 'manage.edit_room', mutates=True)
+def _(fx, client):
+    old_name = fx.unique('bench-room')
+    fx.execute("INSERT INTO storages (storage_name, location) VALUES ('bench-storage', %s)", (old_name,))
+    return req('POST', '/edit_room', data={'old_name': old_name, 'new_name': f'{old_name}-renamed'})
+
+@scenario('delete_room', 'manage.delete_room', mutates=True)
+def _(fx, client):
+    # วัดแค่การสร้างงาน (route ตอบทันที) รอ worker ลบจนเสร็จหลังวัดเวลา
+    location = fx.unique('bench-room')
+    storage_id = fx.execute("INSERT INTO storages (storage_name, location) VALUES ('bench-storage', %s)", (location,))
+    fx.conn.cursor().executemany("INSERT INTO items (item_name, quantity, unit, storage_id) VALUES (%s, 5, 'ชิ้น', %s)",
+                                 [(f'bench-item-{n}', storage_id) for n in range(20)])
+    fx.conn.commit()
+    return req('GET', f'/delete_room/{quote(location)}', after=lambda response: _job_id(response) and fx.wait_room_deletion(_job_id(response)))
+
+@scenario('create_report', 'reports.create_report', mutates=True)
+def _(fx, client):
+    return req('POST', '/reports/items', data={'location': fx.room},
+               after=lambda response: fx.execute("DELETE FROM report_jobs WHERE id = %s", (_job_id(response),)))
+
+
+# ======================
+# วัดผล
+# ======================
+def run_scenario(spec, fx, client, iterations, warmup):
+    samples, queries, statuses, errors = [], [], {}, 0
+    for i in range(warmup + iterations):
+        method, url, kwargs, after = spec['build'](fx, client)
+        started = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        response.get_data()   # export แบบ streaming: นับเวลาจนส่งครบ
+        elapsed = (time.perf_counter() - started) * 1000
+        response.close()
+
+        # flash ที่ค้างใน session ทำให้หน้าถัดไปข้าม ETag: อ่านทิ้ง และนับข้อความ error (route ทำงานไม่สำเร็จ)
+        with client.session_transaction() as session:
+            flashes = session.pop('_flashes', [])
+        if after:
+            after(response)
+        if i < warmup:
+            continue
+        samples.append(elapsed)
+        queries.append(int(response.headers.get('X-DB-Queries', 0)))
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+        errors += response.status_code >= 400 or any(category == 'error' for category, _ in flashes)
+
+    return {
+        'endpoint': spec['endpoint'],
+        'iterations': iterations,
+        'p50_ms': round(statistics.median(samples), 3),
+        'p90_ms': round(percentile(samples, 90), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'max_ms': round(max(samples), 3),
+        'mean_ms': round(statistics.mean(samples), 3),
+        'queries': statistics.median(queries),
+        'statuses': statuses,
+        'errors': errors,
+    }
+
+
+def make_client():
+    from app import app
+    return app, app.test_client()
+
+
+def run_child(args):
+    # process ลูก: รัน scenario เดียว (หรือแค่เตรียมข้อมูลเพื่อวัด RSS พื้นฐาน) แล้วพิมพ์ JSON บรรทัดสุดท้าย
+    app, client = make_client()
+    fx = Fixtures()
+    result = {}
+    if args.child != '__baseline__':
+        spec = next(s for s in SCENARIOS if s['name'] == args.child)
+        result = run_scenario(spec, fx, client, args.iterations, args.warmup)
+    result['peak_rss_mb'] = peak_rss_mb()
+    print(json.dumps(result))
+
+
+def run_isolated(args, names):
+    def child(name):
+        command = [sys.executable, os.path.abspath(__file__), '--database', args.database, '--child', name,
+                   '--iterations', str(args.iterations), '--warmup', str(args.warmup)]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    baseline = child('__baseline__')['peak_rss_mb']
+    results = {}
+    for name in names:
+        result = child(name)
+        result['rss_over_baseline_mb'] = round(result['peak_rss_mb'] - baseline, 1)
+        results[name] = result
+        print_row(name, result)
+    return baseline, results
+
+
+def run_inline(args, names):
+    app, client = make_client()
+    fx = Fixtures()
+    results = {}
+    for name in names:
+        spec = next(s for s in SCENARIOS if s['name'] == name)
+        results[name] = run_scenario(spec, fx, client, args.iterations, args.warmup)
+        print_row(name, results[name])
+    return None, results
+
+
+def print_row(name, result):
+    rss = f" rss={result['peak_rss_mb']}MB (+{result['rss_over_baseline_mb']})" if 'peak_rss_mb' in result else ''
+    flag = f" ERRORS={result['errors']}" if result['errors'] else ''
+    print(f"{name:>24}: p50={result['p50_ms']}ms p99={result['p99_ms']}ms queries={result['queries']}{rss}{flag}")
+
+
+def collect_meta(args):
+    import db
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        counts = {}
+        for table in ('users', 'storages', 'items', 'transactions', 'transaction_details', 'borrow_transactions'):
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            counts[table] = cursor.fetchone()[0]
+        cursor.execute("SELECT VERSION()")
+        server = cursor.fetchone()[0]
+        conn.commit()
+    finally:
+        conn.close()
+
+    def git(*command):
+        try:
+            return subprocess.run(['git', *command], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+        except OSError:
+            return None
+
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'db_server': server,
+        'rows': counts,
+        'iterations': args.iterations,
+        'warmup': args.warmup,
+        'isolated': not args.no_isolate,
+    }
+
+
+def compare(base, current):
+    print(f"\n{'route':>24}  {'p50 base':>9} {'p50 now':>9} {'change':>8}  {'p99 base':>9} {'p99 now':>9}  queries")
+    for name, result in current['routes'].items():
+        old = base['routes'].get(name)
+        if not old:
+            print(f"{name:>24}  (new)")
+            continue
+        change = (result['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100 if old['p50_ms'] else 0
+        print(f"{name:>24}  {old['p50_ms']:>9} {result['p50_ms']:>9} {change:>+7.1f}%  "
+              f"{old['p99_ms']:>9} {result['p99_ms']:>9}  {old['queries']} -> {result['queries']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latency, query count and peak RSS for every endpoint')
+    parser.add_argument('--database', default='inventory_bench')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--only', help='ชื่อ scenario คั่นด้วย , (ดูได้จาก --list)')
+    parser.add_argument('--list', action='store_true')
+    parser.add_argument('--no-isolate', action='store_true', help='รันทุก scenario ใน process เดียว (เร็วกว่า ไม่วัด RSS)')
+    parser.add_argument('--output', help='เขียนผลเป็นไฟล์ JSON')
+    parser.add_argument('--compare', help='ไฟล์ JSON จากรอบก่อน (เช่น commit ก่อนหน้า)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # db.py อ่าน DB_NAME ตอน import
+    os.environ['DB_NAME'] = args.database
+    if args.child:
+        return run_child(args)
+
+    from app import app
+    endpoints = {rule.endpoint for rule in app.url_map.iter_rules()}
+    uncovered = sorted(endpoints - {s['endpoint'] for s in SCENARIOS})
+    if args.list:
+        for spec in SCENARIOS:
+            print(f"{spec['name']:>24}  {spec['endpoint']}{'  (mutates)' if spec['mutates'] else ''}")
+        return
+    if uncovered:
+        print(f"Endpoints without a scenario: {', '.join(uncovered)}")
+
+    # อ่านอย่างเดียวก่อน แล้วค่อยกลุ่มที่แก้ข้อมูล
+    names = [s['name'] for s in sorted(SCENARIOS, key=lambda s: s['mutates'])]
+    if args.only:
+        wanted = args.only.split(',')
+        unknown = set(wanted) - set(names)
+        if unknown:
+            raise SystemExit(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+        names = [name for name in names if name in wanted]
+
+    meta = collect_meta(args)
+    print(f"{meta['commit'] and meta['commit'][:10]} on {meta['db_server']}, rows: {meta['rows']}")
+    baseline, results = (run_inline if args.no_isolate else run_isolated)(args, names)
+    meta['baseline_rss_mb'] = baseline
+    report = {'meta': meta, 'uncovered_endpoints': uncovered, 'routes': results}
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Wrote {args.output}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
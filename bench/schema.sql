@@ -0,0 +1,54 @@
+-- โครงสร้างตารางหลักก่อน migrations/ (ใช้สร้าง DB สำหรับ benchmark ดู bench/seed.py)
+-- ได้จากคอลัมน์ที่ routes/ ใช้จริง; ตารางอื่นและ index ทั้งหมดมาจาก migrations/ ตามลำดับ
+-- foreign key ตามที่หน้าเว็บคาดไว้ (ลบพัสดุ/ตู้/ผู้ใช้ที่มีประวัติไม่ได้)
+-- index ที่ MySQL สร้างให้อัตโนมัติสำหรับ foreign key จะถูกแทนด้วย index ใน 001_history_indexes.sql
+CREATE TABLE users (
+    user_id INT AUTO_INCREMENT PRIMARY KEY,
+    fullname VARCHAR(255) NOT NULL,
+    department VARCHAR(255) NULL
+) DEFAULT CHARSET = utf8mb4;
+
+CREATE TABLE storages (
+    storage_id INT AUTO_INCREMENT PRIMARY KEY,
+    storage_name VARCHAR(100) NOT NULL,
+    location VARCHAR(100) NULL
+) DEFAULT CHARSET = utf8mb4;
+
+CREATE TABLE items (
+    item_id INT AUTO_INCREMENT PRIMARY KEY,
+    item_name VARCHAR(255) NOT NULL,
+    quantity INT NOT NULL DEFAULT 0,
+    unit VARCHAR(50) NULL,
+    storage_id INT NOT NULL,
+    FOREIGN KEY (storage_id) REFERENCES storages (storage_id)
+) DEFAULT CHARSET = utf8mb4;
+
+CREATE TABLE transactions (
+    transaction_id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    transaction_date DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    status VARCHAR(50) NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users (user_id)
+) DEFAULT CHARSET = utf8mb4;
+
+CREATE TABLE transaction_details (
+    detail_id INT AUTO_INCREMENT PRIMARY KEY,
+    transaction_id INT NOT NULL,
+    item_id INT NOT NULL,
+    amount INT NOT NULL,
+    FOREIGN KEY (transaction_id) REFERENCES transactions (transaction_id),
+    FOREIGN KEY (item_id) REFERENCES items (item_id)
+) DEFAULT CHARSET = utf8mb4;
+
+CREATE TABLE borrow_transactions (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    item_id INT NOT NULL,
+    user_id INT NOT NULL,
+    amount INT NOT NULL,
+    note TEXT NULL,
+    borrow_date DATETIME NOT NULL,
+    return_date DATETIME NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'borrowed',
+    FOREIGN KEY (item_id) REFERENCES items (item_id),
+    FOREIGN KEY (user_id) REFERENCES users (user_id)
+) DEFAULT CHARSET = utf8mb4;
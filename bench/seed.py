@@ -0,0 +1,236 @@
+# ======================
+# สร้าง DB สำหรับ benchmark + ข้อมูลสังเคราะห์ (ได้ข้อมูลชุดเดิมทุกครั้งจาก --seed เดียวกัน)
+# ======================
+# 1. สร้าง database --database (ค่าเริ่มต้น inventory_bench) บน server ตาม env DB_HOST/DB_PORT/DB_USER/DB_PASSWORD
+# 2. สร้างตารางหลักจาก bench/schema.sql แล้วรัน migrations/ ทั้งหมด (โครงสร้างเดียวกับ production)
+# 3. ใส่ข้อมูลตามขนาด --scale (1k / 100k / 1m = จำนวนรายการเบิก) ปรับทีละค่าได้ด้วย --transactions ฯลฯ
+#    วันที่ทั้งหมดนับย้อนจาก --anchor (ค่าคงที่) ผลจึงเทียบข้ามวัน/ข้าม commit ได้
+# 4. คำนวณตารางสรุปรายห้องใหม่
+# ก่อนเทียบผลแต่ละ commit ควรสร้างใหม่ด้วย --reset (การวัด route ที่แก้ข้อมูลทำให้ข้อมูลเปลี่ยนไปเล็กน้อย)
+#   python bench/seed.py --scale 100k --reset
+#   MariaDB: ข้าม FULLTEXT ngram ให้เอง แล้วรัน bench ด้วย SEARCH_FULLTEXT=0
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BATCH_SIZE = 5000
+
+# จำนวนรายการเบิก -> ขนาดส่วนอื่นๆ ที่สมสัดส่วนกัน
+SCALES = {
+    '1k': dict(transactions=1_000, users=50, rooms=5, storages_per_room=6, items=1_000),
+    '100k': dict(transactions=100_000, users=500, rooms=20, storages_per_room=10, items=20_000),
+    '1m': dict(transactions=1_000_000, users=2_000, rooms=50, storages_per_room=12, items=100_000),
+}
+DEPARTMENTS = ['ฝ่ายบริหาร', 'ฝ่ายการเงิน', 'ฝ่ายบุคคล', 'ฝ่ายไอที', 'ฝ่ายวิชาการ', 'ฝ่ายอาคารสถานที่',
+               'คณะครุศาสตร์', 'คณะวิทยาศาสตร์', 'คณะมนุษยศาสตร์', 'สำนักงานอธิการบดี']
+PRODUCTS = [('กระดาษ A4', 'รีม'), ('ปากกาลูกลื่น', 'ด้าม'), ('แฟ้มเอกสาร', 'เล่ม'), ('หมึกพิมพ์', 'ตลับ'),
+            ('เทปกาว', 'ม้วน'), ('ลวดเย็บกระดาษ', 'กล่อง'), ('ซองจดหมาย', 'แพ็ค'), ('ถ่านไฟฉาย', 'ก้อน'),
+            ('สายแลน', 'เส้น'), ('เมาส์', 'ตัว'), ('คีย์บอร์ด', 'ตัว'), ('น้ำยาทำความสะอาด', 'ขวด'),
+            ('ถุงขยะ', 'แพ็ค'), ('กรรไกร', 'อัน'), ('โพสต์อิท', 'แพ็ค')]
+OPEN_BORROW_RATIO = 0.05
+BORROWS_PER_TRANSACTION = 0.2
+
+
+def scale_config(args):
+    config = dict(SCALES[args.scale])
+    for key in config:
+        value = getattr(args, key)
+        if value is not None:
+            config[key] = value
+    config['borrows'] = int(config['transactions'] * BORROWS_PER_TRANSACTION)
+    return config
+
+
+def server_connection(database=None):
+    import mysql.connector
+    import db
+    config = dict(db.DB_CONFIG)
+    config.pop('database')
+    if database:
+        config['database'] = database
+    return mysql.connector.connect(**config)
+
+
+def create_database(args):
+    conn = server_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = %s", (args.database,))
+        existing = cursor.fetchone()[0]
+        if existing and not args.reset:
+            raise SystemExit(f"Database {args.database} already has {existing} table(s); use --reset to recreate it")
+        if existing and 'bench' not in args.database:
+            raise SystemExit(f"Refusing to drop {args.database}: --reset only drops databases with 'bench' in the name")
+        cursor.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+        cursor.execute(f"CREATE DATABASE `{args.database}` DEFAULT CHARACTER SET utf8mb4")
+        cursor.execute("SELECT VERSION()")
+        return cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def apply_schema(args, server_version):
+    from migrate import MIGRATIONS_DIR, split_statements
+    mariadb = 'mariadb' in server_version.lower()
+    conn = server_connection(args.database)
+    try:
+        cursor = conn.cursor()
+        with open(os.path.join(BENCH_DIR, 'schema.sql'), encoding='utf-8') as f:
+            for stmt in split_statements(f.read()):
+                cursor.execute(stmt)
+        # เหมือน migrate.run_migrations แต่ข้าม FULLTEXT ngram บน MariaDB (ไม่มี parser นี้)
+        cursor.execute("""
+            CREATE TABLE schema_migrations (
+                filename VARCHAR(255) PRIMARY KEY,
+                applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+            if not filename.endswith('.sql'):
+                continue
+            with open(os.path.join(MIGRATIONS_DIR, filename), encoding='utf-8') as f:
+                for stmt in split_statements(f.read()):
+                    if mariadb and 'WITH PARSER ngram' in stmt:
+                        continue
+                    cursor.execute(stmt)
+            cursor.execute("INSERT INTO schema_migrations (filename) VALUES (%s)", (filename,))
+            conn.commit()
+    finally:
+        conn.close()
+    if mariadb:
+        print("  MariaDB: skipped FULLTEXT ngram indexes, run the benchmark with SEARCH_FULLTEXT=0")
+
+
+def insert_batches(conn, cursor, sql, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+        conn.commit()
+
+
+def seed_data(args, config):
+    rng = random.Random(args.seed)
+    anchor = datetime.strptime(args.anchor, '%Y-%m-%d')
+    span = timedelta(days=args.days).total_seconds()
+    conn = server_connection(args.database)
+    try:
+        cursor = conn.cursor()
+        # ข้อมูลถูกต้องตามที่สร้างอยู่แล้ว ปิดการตรวจเพื่อให้ใส่ข้อมูลเร็วขึ้น
+        cursor.execute("SET unique_checks = 0, foreign_key_checks = 0")
+
+        users = config['users']
+        insert_batches(conn, cursor, "INSERT INTO users (user_id, fullname, department) VALUES (%s, %s, %s)",
+                       ((u, f'ผู้ใช้ทดสอบ {u}', rng.choice(DEPARTMENTS)) for u in range(1, users + 1)))
+
+        storages = []
+        for r in range(config['rooms']):
+            location = f'ห้อง {101 + r}'
+            for s in range(config['storages_per_room']):
+                storages.append((len(storages) + 1, f'ตู้ {chr(65 + s % 26)}{s // 26 + 1}', location))
+        insert_batches(conn, cursor, "INSERT INTO storages (storage_id, storage_name, location) VALUES (%s, %s, %s)",
+                       storages)
+
+        def item_rows():
+            for item_id in range(1, config['items'] + 1):
+                name, unit = PRODUCTS[item_id % len(PRODUCTS)]
+                reorder_level = rng.choice((5, 10, 10, 10, 20))
+                # ราว 15% ต่ำกว่าจุดสั่งซื้อ
+                quantity = rng.randint(0, reorder_level - 1) if rng.random() < 0.15 else rng.randint(reorder_level, 500)
+                yield (item_id, f'{name} รุ่น {item_id}', quantity, unit, rng.randint(1, len(storages)), reorder_level)
+        insert_batches(conn, cursor, """
+            INSERT INTO items (item_id, item_name, quantity, unit, storage_id, reorder_level) VALUES (%s, %s, %s, %s, %s, %s)
+        """, item_rows())
+
+        # รายการเบิกเรียงตามเวลา (id ไล่ตามวันที่ เหมือนข้อมูลจริง) 1-3 รายการพัสดุต่อครั้ง
+        transactions = config['transactions']
+        details = []
+
+        def transaction_rows():
+            for transaction_id in range(1, transactions + 1):
+                when = anchor - timedelta(seconds=span * (1 - transaction_id / transactions))
+                for item_id in rng.sample(range(1, config['items'] + 1), rng.choice((1, 1, 1, 2, 3))):
+                    details.append((transaction_id, item_id, rng.randint(1, 5)))
+                yield (transaction_id, rng.randint(1, users), when.replace(microsecond=0), 'อนุมัติแล้ว')
+                if len(details) >= BATCH_SIZE:
+                    flush_details()
+
+        def flush_details():
+            cursor_details.executemany("INSERT INTO transaction_details (transaction_id, item_id, amount) VALUES (%s, %s, %s)",
+                                       details)
+            details.clear()
+
+        cursor_details = conn.cursor()
+        insert_batches(conn, cursor, """
+            INSERT INTO transactions (transaction_id, user_id, transaction_date, status) VALUES (%s, %s, %s, %s)
+        """, transaction_rows())
+        if details:
+            flush_details()
+        conn.commit()
+
+        borrows = config['borrows']
+
+        def borrow_rows():
+            for b in range(1, borrows + 1):
+                borrowed = (anchor - timedelta(seconds=span * (1 - b / borrows))).replace(microsecond=0)
+                item_id, user_id, amount = rng.randint(1, config['items']), rng.randint(1, users), rng.randint(1, 3)
+                due = borrowed.date() + timedelta(days=rng.choice((3, 7, 7, 14, 30)))
+                if rng.random() < OPEN_BORROW_RATIO:
+                    yield (item_id, user_id, amount, 'bench', borrowed, due, None, 'borrowed')
+                else:
+                    returned = borrowed + timedelta(days=rng.randint(1, 30))
+                    yield (item_id, user_id, amount, 'bench | คืนแล้ว (ปกติ): ', borrowed, due, returned, 'returned')
+        insert_batches(conn, cursor, """
+            INSERT INTO borrow_transactions (item_id, user_id, amount, note, borrow_date, due_date, return_date, status)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, borrow_rows())
+
+        cursor.execute("ANALYZE TABLE users, storages, items, transactions, transaction_details, borrow_transactions")
+        cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create and seed a benchmark database')
+    parser.add_argument('--database', default='inventory_bench')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='100k')
+    parser.add_argument('--transactions', type=int)
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--rooms', type=int)
+    parser.add_argument('--storages-per-room', dest='storages_per_room', type=int)
+    parser.add_argument('--items', type=int)
+    parser.add_argument('--days', type=int, default=730, help='ช่วงวันที่ของประวัติ นับย้อนจาก --anchor')
+    parser.add_argument('--anchor', default='2026-01-01')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='ลบ database เดิมแล้วสร้างใหม่')
+    args = parser.parse_args()
+
+    # db.py อ่าน DB_NAME ตอน import: ตั้งก่อน import ส่วนอื่นของแอป
+    os.environ['DB_NAME'] = args.database
+    config = scale_config(args)
+
+    started = time.perf_counter()
+    server_version = create_database(args)
+    print(f"Creating schema in {args.database} ({server_version}) ...")
+    apply_schema(args, server_version)
+    print(f"Seeding {config} ...")
+    seed_data(args, config)
+
+    from stock_summary import rebuild_summary
+    print(f"Rebuilt summary for {rebuild_summary()} location(s) in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+import csv
+import io
+import math
+from stock_summary import apply_item_changes, DEFAULT_REORDER_LEVEL
+
+# ======================
+# นำเข้าพัสดุ / ปรับยอดคงเหลือทีละมากๆ จากไฟล์ CSV หรือ XLSX
+# ======================
+# - อ่านไฟล์ทีละแถว (ไม่โหลดทั้งไฟล์เข้าหน่วยความจำ) ตรวจข้อมูลไปพร้อมกัน
+# - แถวที่ผ่านจะถูกสะสมเป็นก้อนละ IMPORT_CHUNK_SIZE แล้วเขียนด้วย executemany
+#   (mysql-connector รวม INSERT หลายแถวเป็นคำสั่งเดียวให้) และ commit ทีละก้อน
+# - แถวที่ไม่ผ่านจะถูกเก็บไว้ในรายงานข้อผิดพลาด (ระบุเลขแถวในไฟล์)
+# หัวคอลัมน์ใช้แบบเดียวกับไฟล์ export_items จึงนำไฟล์ที่ export ออกไปแก้แล้วนำเข้ากลับได้เลย
+IMPORT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+MAX_INT_VALUE = 2147483647   # คอลัมน์ quantity / reorder_level เป็น INT
+
+MODE_IMPORT = 'import'   # เพิ่มพัสดุใหม่ / อัปเดตจำนวน+หน่วย ถ้ามีชื่อนี้ในตู้นี้อยู่แล้ว
+MODE_ADJUST = 'adjust'   # ตรวจนับสต็อก: ตั้งจำนวนคงเหลือของพัสดุที่มีอยู่แล้ว
+
+COLUMN_ALIASES = {
+    'item_name': ['ชื่อพัสดุ', 'item_name'],
+    'quantity': ['จำนวนคงเหลือ', 'จำนวน', 'quantity'],
+    'unit': ['หน่วยนับ', 'หน่วย', 'unit'],
+    'storage_name': ['ตู้เก็บ', 'storage_name', 'storage'],
+    'location': ['ห้อง', 'location'],
+    'reorder_level': ['จุดสั่งซื้อ', 'reorder_level'],   # ไม่บังคับ: ว่าง = ใช้ค่าเดิม/ค่าเริ่มต้น
+}
+
+class BulkImportError(Exception):
+    pass
+
+def _iter_csv(file_storage):
+    stream = io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig', newline='')
+    for row in csv.reader(stream):
+        yield row
+
+def _iter_xlsx(file_storage):
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_storage.stream, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ['' if v is None else v for v in row]
+    finally:
+        workbook.close()
+
+def iter_rows(file_storage):
+    # คืนค่า (เลขแถวในไฟล์, dict ของคอลัมน์ที่รู้จัก)
+    filename = (file_storage.filename or '').lower()
+    if filename.endswith('.xlsx'):
+        rows = _iter_xlsx(file_storage)
+    elif filename.endswith('.csv'):
+        rows = _iter_csv(file_storage)
+    else:
+        raise BulkImportError('รองรับเฉพาะไฟล์ .csv และ .xlsx')
+
+    header = next(rows, None)
+    if not header:
+        raise BulkImportError('ไฟล์ว่างเปล่า')
+    header = [str(h).strip() for h in header]
+
+    positions = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in header:
+                positions[field] = header.index(alias)
+                break
+
+    for line_no, row in enumerate(rows, start=2):
+        if not any(str(v).strip() for v in row):
+            continue
+        yield line_no, {field: row[pos] if pos < len(row) else '' for field, pos in positions.items()}
+
+def _validate(record, mode, storage_ids):
+    name = str(record.get('item_name', '')).strip()
+    if not name:
+        return None, 'ไม่มีชื่อพัสดุ'
+    if len(name) > 100:
+        return None, 'ชื่อพัสดุยาวเกิน 100 ตัวอักษร'
+
+    raw_quantity = str(record.get('quantity', '')).strip()
+    try:
+        quantity = float(raw_quantity)
+    except ValueError:
+        return None, f'จำนวนต้องเป็นตัวเลข ("{raw_quantity}")'
+    # float() รับ nan / inf ได้ ต้องตรวจเองก่อน int() (ไม่งั้น ValueError / OverflowError ทำให้ทั้งไฟล์ล้ม)
+    if not math.isfinite(quantity):
+        return None, f'จำนวนต้องเป็นตัวเลข ("{raw_quantity}")'
+    if quantity != int(quantity):
+        return None, 'จำนวนต้องเป็นจำนวนเต็ม'
+    quantity = int(quantity)
+    if quantity < 0:
+        return None, 'จำนวนต้องไม่ติดลบ'
+    if quantity > MAX_INT_VALUE:
+        return None, f'จำนวนมากเกินไป ("{raw_quantity}")'
+
+    storage_key = (str(record.get('storage_name', '')).strip(), str(record.get('location', '')).strip())
+    storage_id = storage_ids.get(storage_key)
+    if storage_id is None:
+        return None, f'ไม่พบตู้เก็บ "{storage_key[0]}" ในห้อง "{storage_key[1]}"'
+
+    unit = str(record.get('unit', '')).strip()
+    if mode == MODE_IMPORT:
+        if not unit:
+            return None, 'ไม่มีหน่วยนับ'
+        if len(unit) > 20:
+            return None, 'หน่วยนับยาวเกิน 20 ตัวอักษร'
+
+    raw_reorder_level = str(record.get('reorder_level', '')).strip()
+    if raw_reorder_level:
+        try:
+            reorder_level = float(raw_reorder_level)
+        except ValueError:
+            return None, f'จุดสั่งซื้อต้องเป็นตัวเลข ("{raw_reorder_level}")'
+        if not math.isfinite(reorder_level):
+            return None, f'จุดสั่งซื้อต้องเป็นตัวเลข ("{raw_reorder_level}")'
+        reorder_level = int(reorder_level)
+        if reorder_level < 0:
+            return None, 'จุดสั่งซื้อต้องไม่ติดลบ'
+        if reorder_level > MAX_INT_VALUE:
+            return None, f'จุดสั่งซื้อมากเกินไป ("{raw_reorder_level}")'
+    else:
+        reorder_level = None
+
+    return {'item_name': name, 'quantity': quantity, 'unit': unit, 'storage_id': storage_id,
+            'reorder_level': reorder_level}, None
+
+def _lock_existing(cursor, chunk):
+    # ล็อคและอ่านยอดเดิมของพัสดุในก้อนนี้ด้วย query เดียว (ใช้คำนวณตารางสรุปรายห้อง)
+    # คืนค่า {(storage_id, item_name): (item_id, (quantity, reorder_level))}
+    keys = sorted({(r['storage_id'], r['item_name']) for _, r in chunk})
+    placeholders = ', '.join(['(%s, %s)'] * len(keys))
+    cursor.execute(f"""
+        SELECT item_id, storage_id, item_name, quantity, reorder_level FROM items
+        WHERE (storage_id, item_name) IN ({placeholders})
+        FOR UPDATE
+    """, tuple(v for key in keys for v in key))
+    return {(row[1], row[2]): (row[0], (row[3], row[4])) for row in cursor.fetchall()}
+
+def _write_import_chunk(cursor, chunk):
+    existing = _lock_existing(cursor, chunk)
+    current = {key: state for key, (_, state) in existing.items()}
+    rows, changes = [], []
+    for _, r in chunk:
+        key = (r['storage_id'], r['item_name'])
+        before = current.get(key)
+        level = r['reorder_level'] if r['reorder_level'] is not None else (before[1] if before else DEFAULT_REORDER_LEVEL)
+        current[key] = (r['quantity'], level)
+        changes.append((r['storage_id'], before, current[key]))
+        rows.append((r['item_name'], r['quantity'], r['unit'], r['storage_id'], level))
+
+    cursor.executemany("""
+        INSERT INTO items (item_name, quantity, unit, storage_id, reorder_level)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE quantity = VALUES(quantity), unit = VALUES(unit), reorder_level = VALUES(reorder_level)
+    """, rows)
+    apply_item_changes(cursor, changes)
+    return len(chunk), []
+
+def _write_adjust_chunk(cursor, chunk):
+    # พัสดุที่หาไม่เจอรายงานเป็นข้อผิดพลาด
+    existing = _lock_existing(cursor, chunk)
+    current = {key: state for key, (_, state) in existing.items()}
+    updates, changes, errors = [], [], []
+    for line_no, r in chunk:
+        key = (r['storage_id'], r['item_name'])
+        if key not in existing:
+            errors.append((line_no, f'ไม่พบพัสดุ "{r["item_name"]}" ในตู้นี้'))
+            continue
+        before = current[key]
+        level = r['reorder_level'] if r['reorder_level'] is not None else before[1]
+        current[key] = (r['quantity'], level)
+        changes.append((r['storage_id'], before, current[key]))
+        updates.append((r['quantity'], level, existing[key][0]))
+    if updates:
+        cursor.executemany("UPDATE items SET quantity = %s, reorder_level = %s WHERE item_id = %s", updates)
+        apply_item_changes(cursor, changes)
+    return len(updates), errors
+
+def run_import(db, file_storage, mode, storages):
+    storage_ids = {(s['storage_name'], s['location']): s['storage_id'] for s in storages}
+    write_chunk = _write_import_chunk if mode == MODE_IMPORT else _write_adjust_chunk
+    report = {'processed': 0, 'written': 0, 'failed': 0, 'errors': []}
+
+    def add_error(line_no, message):
+        report['failed'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'line': line_no, 'message': message})
+
+    def flush(chunk):
+        # commit ทีละก้อน ถ้าก้อนไหนพังจะ rollback เฉพาะก้อนนั้นแล้วทำก้อนถัดไปต่อ
+        cursor = db.cursor()
+        try:
+            written, errors = write_chunk(cursor, chunk)
+            db.commit()
+            report['written'] += written
+            for line_no, message in errors:
+                add_error(line_no, message)
+        except Exception as e:
+            db.rollback()
+            for line_no, _ in chunk:
+                add_error(line_no, f'บันทึกไม่สำเร็จ: {e}')
+
+    chunk = []
+    for line_no, record in iter_rows(file_storage):
+        report['processed'] += 1
+        row, error = _validate(record, mode, storage_ids)
+        if error:
+            add_error(line_no, error)
+            continue
+        chunk.append((line_no, row))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    return report
@@ -0,0 +1,167 @@
+import hashlib
+import inspect
+import os
+import threading
+import time
+from datetime import date
+from functools import wraps
+from db import get_db
+
+# ======================
+# เลขเวอร์ชันข้อมูล + HTTP conditional GET (ETag / Last-Modified)
+# ======================
+# จอในห้องที่รีเฟรชหน้าเองอัตโนมัติ จะได้ 304 (ไม่มี body) ถ้าข้อมูลไม่เปลี่ยน โดยไม่ต้อง query/render ใหม่
+# - ทุก route ที่แก้ข้อมูลเรียก bump_data_version() หลัง commit (ผ่าน snapshot.invalidate_snapshot)
+#   เพิ่มเลขในแถว 'data' ของ app_versions เป็นคำสั่งสั้นๆ แยกออกมา ไม่ถือ row lock ไว้ตลอด transaction
+#   ต้องเพิ่มหลัง commit เท่านั้น: ถ้าเพิ่มก่อน หน้าที่ render ระหว่างนั้นจะได้เลขใหม่แต่ข้อมูลเก่า แล้วค้างอยู่แบบนั้น
+# - แต่ละ process เช็คเลขใน DB อย่างมากทุก DATA_VERSION_CHECK_INTERVAL วินาที (query PK แถวเดียว)
+#   ช่วงเวลาระหว่างนั้นคำขอแบบมี If-None-Match ตอบ 304 ได้โดยไม่แตะ DB เลย
+# - ยังไม่ได้รัน migration (ไม่มีแถว 'data') จะไม่ส่ง ETag หน้าจอทำงานแบบเดิม
+DATA_VERSION_CHECK_INTERVAL = float(os.environ.get("DATA_VERSION_CHECK_INTERVAL", 1))
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+_lock = threading.Lock()
+_state = None          # (version, updated_at เป็น unix timestamp)
+_checked_at = 0.0
+_build_token = None
+
+def bump_data_version(db=None):
+    # db: DbSession ของ request (ค่าเริ่มต้น) หรือ connection ของงานเบื้องหลังที่ commit ไปแล้ว
+    global _checked_at
+    if db is None:
+        db = get_db()
+    try:
+        cursor = db.cursor()
+        cursor.execute("UPDATE app_versions SET version = version + 1 WHERE name = 'data'")
+        db.commit()
+    except Exception as e:
+        # ข้อมูลหลัก commit ไปแล้ว อย่าให้ route แจ้งว่าบันทึกไม่สำเร็จ
+        db.rollback()
+        print(f"Data version bump failed: {e}")
+    with _lock:
+        _checked_at = 0.0
+
+_STATE_SQL = "SELECT version, UNIX_TIMESTAMP(updated_at) as updated_at FROM app_versions WHERE name = 'data'"
+
+def _cached_state(now):
+    with _lock:
+        if now - _checked_at < DATA_VERSION_CHECK_INTERVAL:
+            return True, _state
+    return False, None
+
+def _store_state(row, now):
+    global _state, _checked_at
+    state = (row['version'], int(row['updated_at'])) if row else None
+    with _lock:
+        _state, _checked_at = state, now
+    return state
+
+def get_data_state():
+    now = time.monotonic()
+    cached, state = _cached_state(now)
+    if cached:
+        return state
+
+    try:
+        cursor = get_db().cursor(dictionary=True)
+        cursor.execute(_STATE_SQL)
+        row = cursor.fetchone()
+    except Exception:
+        row = None
+    return _store_state(row, now)
+
+async def get_data_state_async():
+    # เหมือน get_data_state แต่อ่านผ่าน async pool (โหมด ASGI ดู asgi.py)
+    from db_async import get_async_db
+    now = time.monotonic()
+    cached, state = _cached_state(now)
+    if cached:
+        return state
+
+    try:
+        row = await get_async_db().fetchone(_STATE_SQL)
+    except Exception:
+        row = None
+    return _store_state(row, now)
+
+def get_data_version():
+    state = get_data_state()
+    return state[0] if state else None
+
+async def get_data_version_async():
+    state = await get_data_state_async()
+    return state[0] if state else None
+
+def _get_build_token():
+    # template เปลี่ยน (deploy ใหม่) แต่ข้อมูลไม่เปลี่ยน ต้องได้ ETag ใหม่ด้วย
+    global _build_token
+    if _build_token is None:
+        digest = hashlib.sha1()
+        for root, _, files in sorted(os.walk(TEMPLATES_DIR)):
+            for name in sorted(files):
+                stat = os.stat(os.path.join(root, name))
+                digest.update(f"{name}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+        from assets import load_manifest
+        digest.update(repr(sorted(load_manifest().items())).encode())
+        _build_token = digest.hexdigest()[:10]
+    return _build_token
+
+def conditional_page(view=None, per_day=False):
+    # ใช้กับหน้า GET ที่เนื้อหาขึ้นกับข้อมูลใน DB อย่างเดียว (ไม่ขึ้นกับผู้ใช้)
+    # per_day=True: หน้าที่แสดงสถานะตามวันที่ (เช่น เกินกำหนดคืน) ได้ ETag ใหม่ทุกวันแม้ข้อมูลไม่เปลี่ยน
+    #   ใช้ @conditional_page(per_day=True)
+    from flask import request, session, make_response
+    from refdata import get_refdata_version
+
+    if view is None:
+        return lambda view: conditional_page(view, per_day=per_day)
+
+    def check(state):
+        # คืน (etag, updated_at, ตอบ 304 ได้หรือไม่)
+        version, updated_at = state
+        # refdata เป็นแคชของ process นี้ ใส่เลขที่ใช้อยู่จริงไว้ด้วย worker ที่ยังถือรายชื่อเก่าจะได้ ETag ต่างกัน
+        etag = f"{version}-{get_refdata_version()}-{_get_build_token()}"
+        if per_day:
+            today = date.today()
+            etag += f"-{today:%Y%m%d}"
+            # If-Modified-Since จากเมื่อวานต้องไม่ได้ 304
+            updated_at = max(updated_at, int(time.mktime(today.timetuple())))
+        inm = request.if_none_match
+        if inm:
+            return etag, updated_at, inm.contains_weak(etag)
+        ims = request.if_modified_since
+        return etag, updated_at, ims is not None and updated_at <= ims.timestamp()
+
+    def finish(response, etag, updated_at):
+        # หน้า error หรือหน้าที่เพิ่งใช้ flash (session ถูกแก้) ไม่ต้องแคช
+        if response.status_code not in (200, 304) or session.modified:
+            return response
+        response.set_etag(etag, weak=True)
+        # Last-Modified ละเอียดแค่วินาที ถ้าเพิ่งแก้ในวินาทีนี้ อาจมีการแก้อีกในวินาทีเดียวกันได้ จึงยังไม่ส่ง
+        if updated_at < time.time() - 1:
+            response.last_modified = updated_at
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    if inspect.iscoroutinefunction(view):
+        # view แบบ async ของโหมด ASGI (routes/dashboard_async.py)
+        @wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            state = await get_data_state_async() if not session.get('_flashes') else None
+            if state is None:
+                return await view(*args, **kwargs)
+            etag, updated_at, not_modified = check(state)
+            response = make_response('', 304) if not_modified else make_response(await view(*args, **kwargs))
+            return finish(response, etag, updated_at)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # มีข้อความ flash ค้างอยู่ = หน้านี้ต้องแสดงข้อความครั้งเดียว ห้ามตอบ 304/ให้แคช
+        state = get_data_state() if not session.get('_flashes') else None
+        if state is None:
+            return view(*args, **kwargs)
+        etag, updated_at, not_modified = check(state)
+        response = make_response('', 304) if not_modified else make_response(view(*args, **kwargs))
+        return finish(response, etag, updated_at)
+    return wrapper
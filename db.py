@@ -1,32 +1,370 @@
 import os
+import queue
+from collections import OrderedDict
+import threading
+import time
 import mysql.connector
-from mysql.connector import pooling
-
-try:
-    # สร้าง Pool เผื่อไว้ดึงใช้งาน ป้องกัน Error Too Many Connections
-    db_pool = mysql.connector.pooling.MySQLConnectionPool(
-        pool_name="psru_pool",
-        pool_size=5,
-        host=os.environ.get("DB_HOST", "localhost"),
-        user=os.environ.get("DB_USER", "root"),
-        password=os.environ.get("DB_PASSWORD", ""),
-        database=os.environ.get("DB_NAME", "your_db_name"),
-        port=int(os.environ.get("DB_PORT", 3306)),
-        autocommit=False # ปิด Auto Commit เพื่อใช้ Transaction
-    )
-except Exception as e:
-    print(f"Error creating pool: {e}")
-    db_pool = None
+from mysql.connector.errors import PoolError
+
+# ======================
+# Connection Pool ของระบบ
+# ======================
+# - ขนาด pool / เวลารอ / อายุ connection ตั้งค่าผ่าน env ได้
+# - ถ้า pool เต็มจะรอคิวได้ไม่เกิน DB_POOL_TIMEOUT วินาที (แทนที่จะ error ทันที)
+# - connection ที่ว่างนานจะถูก ping ก่อนใช้ ที่อายุเกิน DB_POOL_RECYCLE จะถูกสร้างใหม่
+# - สร้าง pool ตอนเรียกใช้ครั้งแรก ไม่ใช่ตอน import
+# - มีตัวนับสถิติ (get_pool_stats) ไว้ดูว่าควรตั้งขนาด pool เท่าไร
+# - ส่งเหตุการณ์ยืม/คืน/pool เต็ม ให้ตัวเก็บ metrics ได้ผ่าน add_pool_listener (ดู metrics.py)
+DB_CONFIG = {
+    'host': os.environ.get("DB_HOST", "localhost"),
+    'user': os.environ.get("DB_USER", "root"),
+    'password': os.environ.get("DB_PASSWORD", ""),
+    'database': os.environ.get("DB_NAME", "office_inventory"),
+    'port': int(os.environ.get("DB_PORT", 3306)),
+    'autocommit': False # ปิด Auto Commit เพื่อใช้ Transaction
+}
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 10))
+DB_POOL_RECYCLE = float(os.environ.get("DB_POOL_RECYCLE", 3600))
+DB_POOL_PRE_PING = float(os.environ.get("DB_POOL_PRE_PING", 30))   # ping ถ้าว่างนานเกินกี่วินาที
+DB_PREPARED_STATEMENTS = os.environ.get("DB_PREPARED_STATEMENTS", "1") != "0"
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", 32))
+
+# listener(event, value): event = 'checkout' (value = วินาทีที่รอคิว), 'release', 'exhausted'
+_pool_listeners = []
+
+def add_pool_listener(listener):
+    _pool_listeners.append(listener)
+
+def _notify_pool(event, value=None):
+    for listener in _pool_listeners:
+        try:
+            listener(event, value)
+        except Exception:
+            pass
+
+# ======================
+# แคช Prepared Statement ต่อ connection (LRU)
+# ======================
+# query ที่ยิงบ่อย (เบิก/ยืม/คืน/หน้าแรก) จะถูก prepare ที่ฝั่ง server ครั้งเดียวต่อ connection
+# แล้วใช้ซ้ำ ไม่ต้อง parse SQL ใหม่ทุกครั้ง; เกินจำนวนที่กำหนดจะปิดอันที่ไม่ได้ใช้นานสุดทิ้ง
+class StatementCache:
+    def __init__(self, raw, size):
+        self.raw = raw
+        self.size = size
+        self._cursors = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, operation, dictionary):
+        key = (operation, dictionary)
+        cursor = self._cursors.get(key)
+        if cursor is not None:
+            self._cursors.move_to_end(key)
+            self.hits += 1
+            return cursor
+
+        self.misses += 1
+        cursor = self.raw.cursor(prepared=True, dictionary=dictionary)
+        self._cursors[key] = cursor
+        if len(self._cursors) > self.size:
+            _, oldest = self._cursors.popitem(last=False)
+            try:
+                oldest.close()
+            except Exception:
+                pass
+        return cursor
+
+class PreparedCursor:
+    # หน้าตาเหมือน cursor ปกติ แต่แต่ละ SQL จะไปใช้ prepared cursor ของตัวเองจากแคช
+    def __init__(self, statements, dictionary):
+        self._statements = statements
+        self._dictionary = dictionary
+        self._current = None
+
+    def __getattr__(self, name):
+        if self._current is None:
+            raise AttributeError(name)
+        return getattr(self._current, name)
+
+    def __iter__(self):
+        return iter(self._current)
+
+    def execute(self, operation, params=()):
+        raw = self._statements.raw
+        # ผลลัพธ์ที่ค้างจาก statement ก่อนหน้าจะทำให้ execute ถัดไปพัง ให้อ่านทิ้งก่อน
+        if raw.unread_result:
+            raw.consume_results()
+        self._current = self._statements.get(operation, self._dictionary)
+        return self._current.execute(operation, params)
+
+    def executemany(self, operation, seq_params):
+        raw = self._statements.raw
+        if raw.unread_result:
+            raw.consume_results()
+        self._current = self._statements.get(operation, self._dictionary)
+        return self._current.executemany(operation, seq_params)
+
+    def close(self):
+        # cursor จริงเป็นของแคชประจำ connection ไม่ต้องปิด
+        self._current = None
+
+class PooledConnection:
+    # ห่อ connection จริงไว้ เรียก close() แล้วจะคืนเข้า pool แทนการตัดสาย
+    def __init__(self, pool, raw, info):
+        self._pool = pool
+        self._raw = raw
+        self._info = info
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise PoolError("Connection has already been returned to the pool")
+        return getattr(self._raw, name)
+
+    def is_connected(self):
+        return self._raw is not None and self._raw.is_connected()
+
+    def cursor(self, *args, prepared=False, dictionary=False, **kwargs):
+        if self._raw is None:
+            raise PoolError("Connection has already been returned to the pool")
+        if prepared and DB_PREPARED_STATEMENTS:
+            return PreparedCursor(self._info['statements'], dictionary)
+        return self._raw.cursor(*args, dictionary=dictionary, **kwargs)
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool._release(raw, self._info)
+
+class ConnectionPool:
+    def __init__(self, size, timeout, recycle, pre_ping, **config):
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.config = config
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.stats = {
+            'checkouts': 0,
+            'in_use': 0,
+            'exhausted': 0,
+            'created': 0,
+            'recycled': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    def get_connection(self):
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.stats['exhausted'] += 1
+            _notify_pool('exhausted')
+            raise PoolError(f"Connection pool exhausted (size={self.size}, waited {self.timeout}s)")
+        waited = time.monotonic() - started
+
+        try:
+            raw, info = self._checkout_raw()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.stats['checkouts'] += 1
+            self.stats['in_use'] += 1
+            self.stats['wait_time_total'] += waited
+            self.stats['wait_time_max'] = max(self.stats['wait_time_max'], waited)
+        _notify_pool('checkout', waited)
+        return PooledConnection(self, raw, info)
+
+    def _checkout_raw(self):
+        now = time.monotonic()
+        while True:
+            try:
+                raw, info, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                raw = self._create()
+                return raw, {'created_at': now, 'statements': StatementCache(raw, DB_STATEMENT_CACHE_SIZE)}
+
+            if now - info['created_at'] > self.recycle:
+                self._discard(raw, recycled=True)
+                continue
+            if now - idle_since > self.pre_ping:
+                try:
+                    raw.ping(reconnect=False)
+                except Exception:
+                    self._discard(raw, recycled=True)
+                    continue
+            return raw, info
+
+    def _create(self):
+        raw = mysql.connector.connect(**self.config)
+        with self._lock:
+            self.stats['created'] += 1
+        return raw
+
+    def _discard(self, raw, recycled=False):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        if recycled:
+            with self._lock:
+                self.stats['recycled'] += 1
+
+    def _release(self, raw, info):
+        try:
+            # เคลียร์สถานะที่ค้างจาก request ก่อน เพื่อไม่ให้คนถัดไปได้ transaction ค้างไปใช้
+            if raw.unread_result:
+                raw.consume_results()
+            if raw.in_transaction:
+                raw.rollback()
+            if raw.is_connected():
+                self._idle.put((raw, info, time.monotonic()))
+            else:
+                self._discard(raw, recycled=True)
+        except Exception:
+            self._discard(raw, recycled=True)
+        finally:
+            with self._lock:
+                self.stats['in_use'] -= 1
+            self._slots.release()
+            _notify_pool('release')
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['size'] = self.size
+        stats['idle'] = self._idle.qsize()
+        return stats
+
+db_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global db_pool
+    if db_pool is None:
+        with _pool_lock:
+            if db_pool is None:
+                db_pool = ConnectionPool(DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING, **DB_CONFIG)
+    return db_pool
 
 def get_db_connection():
-    if db_pool:
-        return db_pool.get_connection()
-    # สำรองกรณี Pool ไม่ทำงาน
-    return mysql.connector.connect(
-        host=os.environ.get("DB_HOST", "localhost"),
-        user=os.environ.get("DB_USER", "root"),
-        password=os.environ.get("DB_PASSWORD", "rootroot"),
-        database=os.environ.get("DB_NAME", "office_inventory"),
-        port=int(os.environ.get("DB_PORT", 3306)),
-        autocommit=False
-    )
\ No newline at end of file
+    return get_pool().get_connection()
+
+def get_pool_stats():
+    return get_pool().get_stats()
+
+# ======================
+# DB Session ต่อ 1 request (เก็บไว้ใน flask.g)
+# ======================
+# ทุก route เรียก get_db() แทนการเปิด/ปิด connection เอง
+# - ยืม connection จาก pool อย่างมาก 1 เส้นต่อ request (ยืมตอนใช้งานจริงครั้งแรก)
+# - ใช้ cursor ชนิดเดิมซ้ำภายใน request เดียวกัน
+# - นับจำนวน query และเวลาที่ใช้ใน DB ต่อ request (ส่งกลับใน header Server-Timing)
+# - คืน connection อัตโนมัติใน teardown_appcontext
+class InstrumentedCursor:
+    def __init__(self, session, cursor):
+        self._session = session
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, operation, params=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params)
+        finally:
+            self._session._record(time.perf_counter() - started)
+
+    def executemany(self, operation, seq_params):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params)
+        finally:
+            self._session._record(time.perf_counter() - started)
+
+class DbSession:
+    def __init__(self):
+        self._conn = None
+        self._cursors = {}
+        self.query_count = 0
+        self.db_time = 0.0
+
+    @property
+    def connection(self):
+        if self._conn is None:
+            started = time.perf_counter()
+            self._conn = get_db_connection()
+            self.db_time += time.perf_counter() - started
+        return self._conn
+
+    def cursor(self, dictionary=False, prepared=False):
+        # prepared=True ใช้กับ query ที่ยิงบ่อยและมีพารามิเตอร์ (ดู StatementCache)
+        key = (dictionary, prepared)
+        cursor = self._cursors.get(key)
+        if cursor is None:
+            cursor = InstrumentedCursor(self, self.connection.cursor(dictionary=dictionary, prepared=prepared))
+            self._cursors[key] = cursor
+        return cursor
+
+    def start_transaction(self):
+        self.connection.start_transaction()
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        # ยังไม่ได้ยืม connection แปลว่ายังไม่มีอะไรให้ย้อน
+        if self._conn is not None and self._conn.is_connected():
+            self._conn.rollback()
+
+    def _record(self, elapsed):
+        self.query_count += 1
+        self.db_time += elapsed
+
+    def close(self):
+        for cursor in self._cursors.values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self._cursors = {}
+        # คืน pool เสมอแม้สายหลุดไปแล้ว (pool ทิ้ง connection ที่ตายเองและคืนช่องให้ ไม่งั้นช่องของ pool รั่ว)
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+def get_db():
+    from flask import g
+    if 'db' not in g:
+        g.db = DbSession()
+    return g.db
+
+def current_session():
+    # DbSession ของ request นี้ หรือ AsyncDbSession (db_async.py) ถ้าเป็นหน้าที่เสิร์ฟแบบ async
+    from flask import g
+    return g.get('db') or g.get('adb')
+
+def init_app(app):
+    from flask import g
+
+    @app.after_request
+    def add_db_timing(response):
+        session = current_session()
+        if session is not None:
+            response.headers['X-DB-Queries'] = str(session.query_count)
+            response.headers['Server-Timing'] = f"db;dur={session.db_time * 1000:.1f}"
+        return response
+
+    @app.teardown_appcontext
+    def close_db(exc):
+        session = g.pop('db', None)
+        if session is not None:
+            session.close()
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import time
+import aiomysql
+from mysql.connector.errors import PoolError
+from db import DB_CONFIG, DB_POOL_TIMEOUT, DB_POOL_RECYCLE
+
+# ======================
+# Async Connection Pool (โหมด ASGI ดู asgi.py)
+# ======================
+# ใช้เฉพาะหน้าอ่านอย่างเดียวที่เสิร์ฟแบบ async (routes/dashboard_async.py) ผ่าน aiomysql
+# ระหว่างรอ DB event loop ไปตอบ request อื่นต่อได้ worker หนึ่งตัวจึงรับจอที่รีเฟรชพร้อมกันได้หลายสิบจอ
+# - ขนาด pool แยกจาก pool ของ db.py (DB_ASYNC_POOL_SIZE) รอคิวไม่เกิน DB_POOL_TIMEOUT วินาทีเหมือนกัน
+# - autocommit เปิดไว้: หน้าอ่านไม่ต้องใช้ transaction และ aiomysql จะปิดทิ้ง connection
+#   ที่คืนเข้า pool ขณะยังค้าง transaction อยู่
+# - pool ผูกกับ event loop ที่สร้าง (1 loop ต่อ worker) สร้างตอนเรียกใช้ครั้งแรก ปิดตอน server หยุด
+DB_ASYNC_POOL_SIZE = int(os.environ.get("DB_ASYNC_POOL_SIZE", 20))
+DB_ASYNC_POOL_MIN = int(os.environ.get("DB_ASYNC_POOL_MIN", 1))
+
+_pool = None
+_pool_loop = None
+_pool_lock = None
+
+async def get_async_pool():
+    global _pool, _pool_loop, _pool_lock
+    loop = asyncio.get_running_loop()
+    if _pool is not None and _pool_loop is loop:
+        return _pool
+    if _pool_loop is not loop:
+        _pool, _pool_loop, _pool_lock = None, loop, asyncio.Lock()
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await aiomysql.create_pool(
+                minsize=DB_ASYNC_POOL_MIN, maxsize=DB_ASYNC_POOL_SIZE, pool_recycle=int(DB_POOL_RECYCLE),
+                host=DB_CONFIG['host'], port=DB_CONFIG['port'], user=DB_CONFIG['user'],
+                password=DB_CONFIG['password'], db=DB_CONFIG['database'],
+                charset='utf8mb4', autocommit=True)
+    return _pool
+
+async def close_async_pool():
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+        await pool.wait_closed()
+
+def get_async_pool_stats():
+    if _pool is None:
+        return None
+    return {'size': _pool.maxsize, 'open': _pool.size, 'idle': _pool.freesize,
+            'in_use': _pool.size - _pool.freesize}
+
+# ======================
+# Async DB Session ต่อ 1 request (เก็บไว้ใน flask.g เหมือน DbSession ของ db.py)
+# ======================
+# ยืม connection อย่างมาก 1 เส้นต่อ request และนับจำนวน query / เวลาใน DB แบบเดียวกัน
+# (header X-DB-Queries / Server-Timing และ metrics อ่านค่าชุดนี้)
+# ต่างจาก DbSession ตรงที่ไม่มี cursor: เรียก await fetchall(sql, params) / fetchone(...) ได้ผลเป็น dict
+class AsyncDbSession:
+    def __init__(self):
+        self._pool = None
+        self._conn = None
+        self.query_count = 0
+        self.db_time = 0.0
+
+    async def connection(self):
+        if self._conn is None:
+            started = time.perf_counter()
+            self._pool = await get_async_pool()
+            try:
+                self._conn = await asyncio.wait_for(self._pool.acquire(), DB_POOL_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise PoolError(f"Async connection pool exhausted (size={DB_ASYNC_POOL_SIZE}, waited {DB_POOL_TIMEOUT}s)")
+            finally:
+                self.db_time += time.perf_counter() - started
+        return self._conn
+
+    async def _run(self, operation, params, fetch):
+        conn = await self.connection()
+        started = time.perf_counter()
+        try:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(operation, params)
+                return await fetch(cursor)
+        except BaseException:
+            # error / request ถูกยกเลิกกลาง query: สถานะของ connection ไม่แน่นอน ปิดทิ้งแล้วค่อยคืน pool
+            # (pool ตัดเส้นที่ปิดแล้วออกและคืนช่องให้) query ถัดไปใน request เดียวกันจะยืมเส้นใหม่
+            self._conn = None
+            conn.close()
+            self._pool.release(conn)
+            raise
+        finally:
+            self.query_count += 1
+            self.db_time += time.perf_counter() - started
+
+    async def fetchall(self, operation, params=None):
+        return await self._run(operation, params, lambda cursor: _fetchall(cursor))
+
+    async def fetchone(self, operation, params=None):
+        return await self._run(operation, params, lambda cursor: cursor.fetchone())
+
+    async def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn)
+
+async def _fetchall(cursor):
+    # PyMySQL คืน tuple ของแถว ให้เป็น list เหมือน mysql.connector
+    return list(await cursor.fetchall())
+
+def get_async_db():
+    from flask import g
+    if 'adb' not in g:
+        g.adb = AsyncDbSession()
+    return g.adb
+
+async def close_async_db():
+    from flask import g
+    session = g.pop('adb', None)
+    if session is not None:
+        await session.close()
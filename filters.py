@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta
+
+# ======================
+# ตัวกรองช่วงวันที่ (ใช้ร่วมกันทุกหน้าประวัติและ export)
+# ======================
+# แปลง start_date/end_date (YYYY-MM-DD) เป็นเงื่อนไขช่วงแบบครึ่งเปิด
+#   column >= start AND column < end + 1 วัน
+# บนคอลัมน์ datetime ตรงๆ (ไม่ครอบด้วย DATE()) เพื่อให้ DB ใช้ index แบบ range scan ได้
+
+def parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (ValueError, TypeError):
+        return None
+
+def apply_date_range(query, params, column, start_date, end_date):
+    start = parse_date(start_date)
+    end = parse_date(end_date)
+    if start:
+        query += f" AND {column} >= %s"
+        params.append(start)
+    if end:
+        query += f" AND {column} < %s"
+        params.append(end + timedelta(days=1))
+    return query
@@ -0,0 +1,82 @@
+import os
+import threading
+from collections import OrderedDict
+from jinja2 import nodes, Undefined
+from jinja2.ext import Extension
+
+# ======================
+# แคช HTML บางส่วนของ template (fragment cache)
+# ======================
+# ใช้ใน template:
+#   {% cache 'user-options', refdata_version %} ...HTML ที่สร้างจาก users... {% endcache %}
+# - key = ชื่อ fragment + ค่าที่ส่งตามหลัง ต้องใส่ "ทุกอย่าง" ที่ทำให้ HTML ในบล็อกต่างกัน
+#   (เลขเวอร์ชันของข้อมูลที่ใช้ + ตัวแปรอื่นในบล็อก เช่น current_location)
+# - เลขเวอร์ชันต้องมาพร้อมกับข้อมูลที่ render จริง (refdata['version'], snapshot['data_version'])
+#   ไม่ใช่อ่านเลขล่าสุดแยกต่างหาก ไม่งั้นอาจเก็บ HTML เก่าไว้ใต้เลขใหม่
+# - ค่าใดใน key เป็น None/ไม่ได้ส่งมา (เช่น ยังไม่ได้รัน migration ของเลขเวอร์ชัน) จะ render สดทุกครั้ง
+#   ตัวแปรที่เป็น None ได้ตามปกติ ให้ใส่แบบ current_location or ''
+# - เก็บในหน่วยความจำของ process ไม่เกิน FRAGMENT_CACHE_SIZE ชิ้น เกินแล้วทิ้งชิ้นที่ไม่ได้ใช้นานที่สุด (LRU)
+#   เลขเวอร์ชันเปลี่ยนแล้ว ชิ้นเก่าจะไม่มีใครเรียกอีก และถูกดันออกไปเอง
+FRAGMENT_CACHE_SIZE = int(os.environ.get("FRAGMENT_CACHE_SIZE", 256))
+
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+fragment_cache = LRUCache(FRAGMENT_CACHE_SIZE)
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [nodes.List(key)]), [], [], body).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        if any(part is None or isinstance(part, Undefined) for part in key):
+            return caller()
+        key = tuple(key)
+        html = fragment_cache.get(key)
+        if html is None:
+            html = caller()
+            fragment_cache.set(key, html)
+        return html
+
+def init_app(app):
+    app.jinja_env.add_extension(FragmentCacheExtension)
@@ -0,0 +1,23 @@
+import glob
+import os
+from dotenv import load_dotenv
+
+# ======================
+# ค่าตั้งของ gunicorn (gunicorn อ่านไฟล์นี้เองอัตโนมัติเมื่อรันจากโฟลเดอร์โปรเจกต์)
+# ======================
+# metrics แบบหลาย worker (PROMETHEUS_MULTIPROC_DIR ดู metrics.py):
+# - ล้างไฟล์ค่าของรอบก่อนตอนเริ่ม master
+# - worker ที่ตายแล้ว ค่า gauge ของมันต้องไม่ถูกนับต่อ
+load_dotenv()
+
+def on_starting(server):
+    multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(multiproc_dir, '*.db')):
+            os.remove(path)
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,144 @@
+import os
+import threading
+from datetime import date, timedelta
+from db import get_db_connection
+from filters import parse_date
+from notifier import enqueue_line_notify, wake_notifier
+
+# ======================
+# การยืม: กำหนดคืน / รายการที่ยังไม่คืน / แจ้งเตือนเกินกำหนด
+# ======================
+# รายการที่ยังไม่คืนอ่านผ่าน index idx_borrow_open_due (is_open, due_date) ของ migration 011
+# is_open เป็น generated column จาก status จึงถูกต้องเสมอไม่ว่าแถวจะถูกแก้จากที่ไหน
+# - หน้าติดตามการยืม / ยอดกำลังยืมในหน้าแรก: is_open = 1 อ่านเฉพาะรายการที่ค้าง
+# - เกินกำหนด: is_open = 1 AND due_date < วันนี้ เป็น range บน index เดียวกัน
+# - scan แจ้งเตือน (thread ทุก OVERDUE_SCAN_INTERVAL วินาที หรือ cron: flask --app app overdue-scan)
+#   เดินเฉพาะรายการเกินกำหนดที่ยังไม่ได้เตือนภายใน OVERDUE_REMIND_HOURS ชั่วโมง
+#   ส่ง LINE ผ่านคิว outbox ของ notifier.py; SKIP LOCKED กันหลาย worker เตือนซ้ำ
+BORROW_DEFAULT_DAYS = int(os.environ.get("BORROW_DEFAULT_DAYS", 7))
+OVERDUE_SCAN_INTERVAL = float(os.environ.get("OVERDUE_SCAN_INTERVAL", 3600))
+OVERDUE_REMIND_HOURS = int(os.environ.get("OVERDUE_REMIND_HOURS", 24))
+OVERDUE_SCAN_BATCH = 200
+OVERDUE_LINES_PER_MESSAGE = 20
+
+OPEN_LOAN_SQL = "b.is_open = 1"
+LOAN_COLUMNS = """
+    b.id, b.borrow_date, b.due_date, b.amount, b.note, b.status,
+    i.item_name, i.unit, u.fullname, u.department, s.storage_name, s.location
+"""
+LOAN_JOINS = """
+    FROM borrow_transactions b
+    JOIN items i ON b.item_id = i.item_id
+    JOIN users u ON b.user_id = u.user_id
+    JOIN storages s ON i.storage_id = s.storage_id
+"""
+
+_worker = None
+_worker_lock = threading.Lock()
+
+class LoanError(Exception):
+    pass
+
+def parse_due_date(value, today=None):
+    # ค่าว่าง = วันนี้ + BORROW_DEFAULT_DAYS
+    today = today or date.today()
+    if not value:
+        return today + timedelta(days=BORROW_DEFAULT_DAYS)
+    parsed = parse_date(value)
+    if not parsed:
+        raise LoanError('รูปแบบวันที่กำหนดคืนไม่ถูกต้อง')
+    if parsed.date() < today:
+        raise LoanError('กำหนดคืนต้องไม่ก่อนวันนี้')
+    return parsed.date()
+
+def is_overdue(loan, today=None):
+    return loan['due_date'] is not None and loan['due_date'] < (today or date.today())
+
+def overdue_query(location=''):
+    query = f"SELECT {LOAN_COLUMNS} {LOAN_JOINS} WHERE {OPEN_LOAN_SQL} AND b.due_date < %s"
+    params = []
+    if location:
+        query += " AND s.location = %s"
+        params.append(location)
+    return query + " ORDER BY b.due_date ASC, b.id ASC", params
+
+def get_overdue_loans(cursor, today=None, location=''):
+    # cursor ต้องเป็น dictionary cursor
+    query, params = overdue_query(location)
+    cursor.execute(query, (today or date.today(), *params))
+    return cursor.fetchall()
+
+# ======================
+# แจ้งเตือนเกินกำหนด
+# ======================
+def _format_reminders(loans, today):
+    messages = []
+    for start in range(0, len(loans), OVERDUE_LINES_PER_MESSAGE):
+        chunk = loans[start:start + OVERDUE_LINES_PER_MESSAGE]
+        lines = [f"📦 {loan['item_name']} {loan['amount']} {loan['unit']} - {loan['fullname']} "
+                 f"(เกินกำหนด {(today - loan['due_date']).days} วัน)" for loan in chunk]
+        messages.append(f"⏰ พัสดุค้างคืนเกินกำหนด {len(loans)} รายการ\n" + "\n".join(lines))
+    return messages
+
+def scan_overdue(today=None):
+    # คืนจำนวนรายการที่เตือน; งานต่อรอบเป็นสัดส่วนกับรายการเกินกำหนดที่ถึงรอบเตือน ไม่ใช่ทั้งตาราง
+    if not os.environ.get("LINE_ACCESS_TOKEN") or not os.environ.get("LINE_USER_ID"):
+        return 0
+    today = today or date.today()
+    conn = get_db_connection()
+    reminded = 0
+    last_due, last_id = date.min, 0
+    try:
+        cursor = conn.cursor(dictionary=True)
+        while True:
+            # ล็อคเฉพาะแถวการยืม (ไม่ JOIN ใน FOR UPDATE จะได้ไม่ล็อคแถวพัสดุที่คนอื่นกำลังเบิก)
+            cursor.execute("""
+                SELECT b.id, b.due_date FROM borrow_transactions b
+                WHERE b.is_open = 1 AND b.due_date < %s
+                  AND (b.due_date > %s OR (b.due_date = %s AND b.id > %s))
+                  AND (b.reminded_at IS NULL OR b.reminded_at < NOW() - INTERVAL %s HOUR)
+                ORDER BY b.due_date, b.id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (today, last_due, last_due, last_id, OVERDUE_REMIND_HOURS, OVERDUE_SCAN_BATCH))
+            rows = cursor.fetchall()
+            if not rows:
+                conn.commit()
+                break
+            last_due, last_id = rows[-1]['due_date'], rows[-1]['id']
+            ids = tuple(row['id'] for row in rows)
+            placeholders = ', '.join(['%s'] * len(ids))
+
+            cursor.execute(f"SELECT {LOAN_COLUMNS} {LOAN_JOINS} WHERE b.id IN ({placeholders}) ORDER BY b.due_date, b.id", ids)
+            loans = cursor.fetchall()
+            for message in _format_reminders(loans, today):
+                enqueue_line_notify(cursor, message)
+            cursor.execute(f"UPDATE borrow_transactions SET reminded_at = NOW() WHERE id IN ({placeholders})", ids)
+            conn.commit()
+            reminded += len(rows)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    if reminded:
+        wake_notifier()
+    return reminded
+
+def run_overdue_scanner(stop_event=None):
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            scan_overdue()
+        except Exception as e:
+            print(f"Overdue Scan Error: {e}")
+        stop_event.wait(OVERDUE_SCAN_INTERVAL)
+
+def start_overdue_scanner():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=run_overdue_scanner, name="overdue-scanner", daemon=True)
+            _worker.start()
+    return _worker
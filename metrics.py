@@ -0,0 +1,97 @@
+import os
+import time
+from prometheus_client import (Counter, Gauge, Histogram, CollectorRegistry, REGISTRY,
+                               generate_latest, CONTENT_TYPE_LATEST, multiprocess)
+import db
+
+# ======================
+# Metrics สำหรับ Prometheus (/metrics)
+# ======================
+# - เวลาตอบกลับต่อ endpoint (เช่น dashboard.index, inventory.withdraw_item) เป็น histogram
+# - จำนวน query และเวลาใน DB ต่อ request (นับจาก DbSession ใน db.py / AsyncDbSession ใน db_async.py ตัวเดียวกับ header Server-Timing)
+# - เวลารอคิวยืม connection / pool เต็ม / connection ที่ถูกยืมอยู่ (จาก listener ของ pool ใน db.py)
+# gunicorn หลาย worker: ตั้ง env PROMETHEUS_MULTIPROC_DIR เป็นโฟลเดอร์ว่างที่เขียนได้
+# แต่ละ worker จะเขียนค่าลงไฟล์ในโฟลเดอร์นั้น แล้ว /metrics จะรวมของทุก worker ให้ (ดู gunicorn.conf.py)
+# label ใช้ชื่อ endpoint ของ Flask (ไม่ใช่ URL จริง) จำนวน series จึงคงที่ ไม่โตตามชื่อห้อง/รหัสพัสดุ
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+REQUEST_LATENCY = Histogram('inventory_http_request_duration_seconds', 'เวลาตอบกลับต่อ request',
+                            ['endpoint', 'method'])
+REQUESTS = Counter('inventory_http_requests_total', 'จำนวน request แยกตาม status',
+                   ['endpoint', 'method', 'status'])
+REQUEST_QUERIES = Histogram('inventory_db_queries_per_request', 'จำนวน query ต่อ request',
+                            ['endpoint'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100))
+REQUEST_DB_TIME = Histogram('inventory_db_time_seconds_per_request', 'เวลาที่ใช้ใน DB ต่อ request (รวมเวลารอยืม connection)',
+                            ['endpoint'])
+POOL_WAIT = Histogram('inventory_db_pool_checkout_wait_seconds', 'เวลารอคิวยืม connection จาก pool',
+                      buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10))
+POOL_EXHAUSTED = Counter('inventory_db_pool_exhausted_total', 'จำนวนครั้งที่รอ connection จนหมดเวลา')
+POOL_IN_USE = Gauge('inventory_db_pool_in_use', 'connection ที่ถูกยืมอยู่', multiprocess_mode='livesum')
+
+def _on_pool_event(event, value):
+    if event == 'checkout':
+        POOL_WAIT.observe(value)
+        POOL_IN_USE.inc()
+    elif event == 'release':
+        POOL_IN_USE.dec()
+    elif event == 'exhausted':
+        POOL_EXHAUSTED.inc()
+
+# .labels() ต้องสร้าง key + ล็อคทุกครั้ง เก็บ metric ลูกของแต่ละ endpoint ไว้ใช้ซ้ำ (จำนวน endpoint คงที่)
+_children = {}
+
+def _series(endpoint, method, status):
+    key = (endpoint, method, status)
+    series = _children.get(key)
+    if series is None:
+        series = _children[key] = (REQUEST_LATENCY.labels(endpoint, method),
+                                   REQUESTS.labels(endpoint, method, status),
+                                   REQUEST_QUERIES.labels(endpoint),
+                                   REQUEST_DB_TIME.labels(endpoint))
+    return series
+
+def _observe(endpoint, method, status, started, session):
+    latency, requests, queries, db_time = _series(endpoint, method, status)
+    latency.observe(time.perf_counter() - started)
+    requests.inc()
+    if session is not None:
+        queries.observe(session.query_count)
+        db_time.observe(session.db_time)
+
+def render_metrics():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+def init_app(app):
+    from flask import g, request, Response
+
+    if not METRICS_ENABLED:
+        return
+
+    db.add_pool_listener(_on_pool_event)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None and request.endpoint != 'metrics':
+            _observe(request.endpoint or 'unmatched', request.method, response.status_code, started, db.current_session())
+        return response
+
+    @app.teardown_request
+    def record_failed_request(exc):
+        # exception ที่ไม่มีใครจับ after_request จะไม่ถูกเรียก (ยังเหลือเวลาเริ่มต้นค้างอยู่)
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            _observe(request.endpoint or 'unmatched', request.method, 500, started, db.current_session())
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render_metrics(), mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,46 @@
+import os
+from db import get_db_connection
+
+# ======================
+# รันไฟล์ SQL ใน migrations/ ตามลำดับชื่อไฟล์ (รันแล้วจะไม่รันซ้ำ)
+# ใช้งาน: flask --app app migrate
+# ======================
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+def split_statements(sql):
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [stmt.strip() for stmt in "\n".join(lines).split(';') if stmt.strip()]
+
+def run_migrations():
+    conn, cursor = None, None
+    applied_now = []
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                filename VARCHAR(255) PRIMARY KEY,
+                applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("SELECT filename FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+
+        for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+            if not filename.endswith('.sql') or filename in applied:
+                continue
+            with open(os.path.join(MIGRATIONS_DIR, filename), encoding='utf-8') as f:
+                statements = split_statements(f.read())
+            # DDL ของ MySQL commit เองทีละคำสั่ง ถ้าไฟล์พังกลางทางต้องแก้มือแล้วรันใหม่
+            for stmt in statements:
+                cursor.execute(stmt)
+            cursor.execute("INSERT INTO schema_migrations (filename) VALUES (%s)", (filename,))
+            conn.commit()
+            applied_now.append(filename)
+    except Exception:
+        if conn: conn.rollback()
+        raise
+    finally:
+        if cursor: cursor.close()
+        if conn: conn.close()
+    return applied_now
@@ -0,0 +1,11 @@
+-- ดัชนีสำหรับหน้าประวัติ: กรองช่วงวันที่ + แบ่งหน้าแบบ keyset + คีย์ที่ใช้ JOIN
+-- (InnoDB แนบ primary key ท้าย secondary index ให้อยู่แล้ว จึงได้ลำดับ (date, id) ครบ)
+CREATE INDEX idx_transactions_date ON transactions (transaction_date);
+CREATE INDEX idx_transactions_user ON transactions (user_id);
+CREATE INDEX idx_transaction_details_txn_item ON transaction_details (transaction_id, item_id);
+CREATE INDEX idx_transaction_details_item ON transaction_details (item_id);
+CREATE INDEX idx_borrow_date_status ON borrow_transactions (borrow_date, status);
+CREATE INDEX idx_borrow_item ON borrow_transactions (item_id);
+CREATE INDEX idx_borrow_user ON borrow_transactions (user_id);
+CREATE INDEX idx_items_storage ON items (storage_id);
+CREATE INDEX idx_storages_location ON storages (location);
@@ -0,0 +1,13 @@
+-- คิวแจ้งเตือน LINE (outbox): เขียนใน transaction เดียวกับการเบิก แล้วให้ worker ส่งทีหลัง
+CREATE TABLE notification_outbox (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    recipient VARCHAR(64) NOT NULL,
+    message TEXT NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error VARCHAR(255) NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sent_at DATETIME NULL,
+    KEY idx_outbox_pending (status, next_attempt_at)
+) DEFAULT CHARSET = utf8mb4;
@@ -0,0 +1,6 @@
+-- ตัวนับเวอร์ชันข้อมูลที่ใช้ร่วมกันทุก gunicorn worker (ใช้ตรวจว่าแคชในแต่ละ process ยังสดอยู่ไหม)
+CREATE TABLE app_versions (
+    name VARCHAR(32) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+) DEFAULT CHARSET = utf8mb4;
+INSERT INTO app_versions (name, version) VALUES ('refdata', 0);
@@ -0,0 +1,6 @@
+-- ค้นหาพัสดุในห้อง: FULLTEXT แบบ ngram (ตัดคำภาษาไทยได้โดยไม่ต้องมีช่องว่าง)
+-- + index ปกติบน item_name สำหรับเรียงลำดับ/แบ่งหน้า และค้นแบบขึ้นต้นด้วย
+-- หมายเหตุ: ngram parser มีใน MySQL 5.7+ เท่านั้น ถ้าใช้ MariaDB ให้ลบสองบรรทัด FULLTEXT และตั้ง SEARCH_FULLTEXT=0
+CREATE INDEX idx_items_name ON items (item_name);
+CREATE FULLTEXT INDEX ftx_items_name ON items (item_name) WITH PARSER ngram;
+CREATE FULLTEXT INDEX ftx_storages_name ON storages (storage_name) WITH PARSER ngram;
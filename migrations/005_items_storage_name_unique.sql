@@ -0,0 +1,5 @@
+-- นำเข้าพัสดุจากไฟล์ (bulk_import.py) ใช้ INSERT ... ON DUPLICATE KEY UPDATE
+-- จึงต้องมี unique key ชื่อพัสดุต่อตู้ (ตู้เดียวกันห้ามมีชื่อพัสดุซ้ำ)
+-- หมายเหตุ: ถ้ามีพัสดุชื่อซ้ำในตู้เดียวกันอยู่แล้ว ต้องรวม/เปลี่ยนชื่อก่อนรัน migration นี้
+--   SELECT storage_id, item_name, COUNT(*) FROM items GROUP BY storage_id, item_name HAVING COUNT(*) > 1;
+CREATE UNIQUE INDEX uq_items_storage_name ON items (storage_id, item_name);
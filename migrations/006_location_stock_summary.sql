@@ -0,0 +1,24 @@
+-- ตารางสรุปสต็อกรายห้อง ดูแลต่อเนื่องโดย stock_summary.py (1 แถวต่อห้อง)
+-- ตอนนี้ของใกล้หมดคิดจากจุดสั่งซื้อรายชิ้น items.reorder_level (stock_summary.is_low / LOW_STOCK_SQL)
+-- quantity < 10 ด้านล่างคือเกณฑ์ ณ ไฟล์นี้ เท่ากับ DEFAULT_REORDER_LEVEL ที่ 007 ใช้เป็นค่าเริ่มต้นของคอลัมน์
+-- ถ้าตัวเลขเพี้ยน: flask --app app verify-summary --fix
+CREATE TABLE location_stock_summary (
+    location VARCHAR(100) NOT NULL PRIMARY KEY,
+    storage_count INT NOT NULL DEFAULT 0,
+    item_count INT NOT NULL DEFAULT 0,
+    total_qty BIGINT NOT NULL DEFAULT 0,
+    low_count INT NOT NULL DEFAULT 0,
+    normal_count INT NOT NULL DEFAULT 0
+) DEFAULT CHARSET = utf8mb4;
+
+INSERT INTO location_stock_summary (location, storage_count, item_count, total_qty, low_count, normal_count)
+SELECT s.location,
+       COUNT(DISTINCT s.storage_id),
+       COUNT(i.item_id),
+       COALESCE(SUM(i.quantity), 0),
+       COALESCE(SUM(CASE WHEN i.item_id IS NOT NULL AND i.quantity < 10 THEN 1 ELSE 0 END), 0),
+       COALESCE(SUM(CASE WHEN i.item_id IS NOT NULL AND i.quantity >= 10 THEN 1 ELSE 0 END), 0)
+FROM storages s
+LEFT JOIN items i ON s.storage_id = i.storage_id
+WHERE s.location IS NOT NULL
+GROUP BY s.location;
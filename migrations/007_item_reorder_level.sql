@@ -0,0 +1,8 @@
+-- จุดสั่งซื้อรายพัสดุ: ใกล้หมดเมื่อ quantity < reorder_level (ดู stock_summary.py)
+-- ค่าเริ่มต้น 10 = เกณฑ์เดิมของหน้าแรก ตัวเลขในตารางสรุปรายห้องจึงไม่เปลี่ยน
+-- stock_gap เป็น generated column พร้อม index ให้ "ของที่ต่ำกว่าจุดสั่งซื้อ" (stock_gap < 0) เป็น range scan
+-- CAST เป็น SIGNED กันค่าติดลบล้นกรณี quantity เป็น UNSIGNED
+ALTER TABLE items
+    ADD COLUMN reorder_level INT NOT NULL DEFAULT 10,
+    ADD COLUMN stock_gap INT AS (CAST(quantity AS SIGNED) - reorder_level) STORED,
+    ADD INDEX idx_items_stock_gap (stock_gap);
@@ -0,0 +1,3 @@
+-- เลขเวอร์ชันของข้อมูลทั้งระบบ เพิ่มขึ้นหลังทุกการแก้ไข (ดู data_version.py) ใช้ทำ ETag/Last-Modified ของหน้าจอ
+ALTER TABLE app_versions ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
+INSERT INTO app_versions (name, version) VALUES ('data', 0);
@@ -0,0 +1,17 @@
+-- งานลบห้องแบบแบ่งก้อน (room_deletion.py) เก็บความคืบหน้าไว้ให้ทำต่อได้ถ้า process ตายกลางทาง
+CREATE TABLE room_deletion_jobs (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    location VARCHAR(100) NOT NULL,
+    storage_ids TEXT NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    total_items INT NOT NULL DEFAULT 0,
+    deleted_items INT NOT NULL DEFAULT 0,
+    deleted_history BIGINT NOT NULL DEFAULT 0,
+    last_item_id INT NOT NULL DEFAULT 0,
+    lease_until DATETIME NULL,
+    last_error VARCHAR(255) NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at DATETIME NULL,
+    KEY idx_room_deletion_status (status, lease_until),
+    KEY idx_room_deletion_location (location, status)
+) DEFAULT CHARSET = utf8mb4;
@@ -0,0 +1,17 @@
+-- งานสร้างรายงาน Excel เบื้องหลัง (reports.py) ไฟล์ที่เสร็จแล้วเก็บใน REPORTS_DIR
+CREATE TABLE report_jobs (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(32) NOT NULL,
+    params TEXT NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    row_count INT NOT NULL DEFAULT 0,
+    file_name VARCHAR(255) NULL,
+    download_name VARCHAR(255) NULL,
+    attempts INT NOT NULL DEFAULT 0,
+    lease_until DATETIME NULL,
+    last_error VARCHAR(255) NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at DATETIME NULL,
+    KEY idx_report_jobs_status (status, lease_until),
+    KEY idx_report_jobs_finished (status, finished_at)
+) DEFAULT CHARSET = utf8mb4;
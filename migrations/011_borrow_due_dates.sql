@@ -0,0 +1,10 @@
+-- การยืม: กำหนดคืน + เวลาที่แจ้งเตือนเกินกำหนดล่าสุด (ดู loans.py)
+-- is_open เป็น generated column จาก status (ตรงกับเงื่อนไขเดิม status != 'returned' เสมอ ไม่ต้องดูแลเอง)
+-- index (is_open, due_date) ทำให้ "ยังไม่คืน" และ "เกินกำหนด" เป็น range scan เฉพาะรายการที่ยังค้าง
+-- ไม่ต้องไล่ทั้งตารางที่โตขึ้นเรื่อยๆ; รายการเดิมไม่มีกำหนดคืน (NULL = ไม่นับว่าเกินกำหนด)
+-- หมายเหตุ: STORED column ทำให้ ALTER สร้างตารางใหม่ทั้งตาราง ตารางใหญ่ควรรันนอกเวลาใช้งาน
+ALTER TABLE borrow_transactions
+    ADD COLUMN due_date DATE NULL,
+    ADD COLUMN reminded_at DATETIME NULL,
+    ADD COLUMN is_open TINYINT AS (IF(status <> 'returned', 1, 0)) STORED,
+    ADD INDEX idx_borrow_open_due (is_open, due_date);
@@ -0,0 +1,9 @@
+-- ตารางที่สร้างใน 002 / 003 / 006 / 009 / 010 เดิมไม่ได้ระบุ charset จึงได้ค่าเริ่มต้นของ server
+-- (utf8mb3 / latin1 บน server เก่า) ข้อความแจ้งเตือนหรือชื่อห้องที่มีอีโมจิจะบันทึกไม่ได้
+-- ไฟล์เดิมแก้ให้ระบุ utf8mb4 แล้ว (DB ใหม่) ไฟล์นี้แปลงตารางของ DB ที่รัน migration ไปก่อนหน้านั้น
+-- CONVERT TO สร้างตารางใหม่ทั้งตาราง แต่ทุกตารางนี้เล็ก (คิว/งาน/สรุปรายห้อง)
+ALTER TABLE notification_outbox CONVERT TO CHARACTER SET utf8mb4;
+ALTER TABLE app_versions CONVERT TO CHARACTER SET utf8mb4;
+ALTER TABLE location_stock_summary CONVERT TO CHARACTER SET utf8mb4;
+ALTER TABLE room_deletion_jobs CONVERT TO CHARACTER SET utf8mb4;
+ALTER TABLE report_jobs CONVERT TO CHARACTER SET utf8mb4;
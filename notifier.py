@@ -0,0 +1,254 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from db import get_db_connection
+
+# ======================
+# ระบบแจ้งเตือน LINE (ส่งเบื้องหลังผ่านคิว outbox)
+# ======================
+# หน้าเว็บแค่เขียนข้อความลงตาราง notification_outbox ใน transaction เดียวกับการเบิก
+# แล้ว worker จะดึงไปส่งทีละชุด ถ้าส่งไม่สำเร็จจะลองใหม่แบบ backoff
+# ทำให้เวลาตอบสนองและเวลาที่ล็อคแถวพัสดุไม่ขึ้นกับความเร็วของ LINE API อีกต่อไป
+# ตัวส่งควรมีตัวเดียว: process แยก flask --app app notify-worker (บรรทัด notify ใน Procfile, ค่าเริ่มต้น)
+# - token bucket และการรวมข้อความอยู่ในหน่วยความจำของ process ที่ส่ง อัตรา NOTIFY_RATE_PER_SEC
+#   จึงเป็นอัตราจริงที่ยิงไป LINE ก็ต่อเมื่อมีตัวส่งตัวเดียว
+# - process แยกไม่ได้ยินการปลุกจากหน้าเว็บ (wake_notifier) แจ้งเตือนจึงออกภายใน NOTIFY_POLL_INTERVAL วินาที
+#   และทุกข้อความที่เข้าคิวในช่วงนั้นถูกรวมเป็น push เดียวกันอยู่แล้ว
+# - NOTIFY_WORKER=1 ให้ทุก process ของเว็บรัน thread ส่งเอง (ไม่ต้องมี process แยก ส่งทันทีหลังเบิก)
+#   แต่ละ process มี token bucket ของตัวเอง: gunicorn -w N ยิงได้รวม N x NOTIFY_RATE_PER_SEC
+#   ต้องตั้ง NOTIFY_RATE_PER_SEC / NOTIFY_RATE_BURST เป็นค่าที่ต้องการหารด้วยจำนวน worker เอง
+LINE_API_URL = os.environ.get("LINE_API_URL", "https://api.line.me/v2/bot/message/push")
+LINE_MAX_MESSAGES = 5         # LINE รับได้สูงสุด 5 ข้อความต่อการ push หนึ่งครั้ง
+NOTIFY_POLL_INTERVAL = float(os.environ.get("NOTIFY_POLL_INTERVAL", 5))
+NOTIFY_BATCH_SIZE = int(os.environ.get("NOTIFY_BATCH_SIZE", 50))
+NOTIFY_MAX_ATTEMPTS = int(os.environ.get("NOTIFY_MAX_ATTEMPTS", 6))
+NOTIFY_BACKOFF_BASE = int(os.environ.get("NOTIFY_BACKOFF_BASE", 10))   # วินาที (10, 20, 40, ...)
+NOTIFY_BACKOFF_MAX = int(os.environ.get("NOTIFY_BACKOFF_MAX", 1800))
+NOTIFY_LEASE_SECONDS = 60     # กันไม่ให้ worker ตัวอื่นหยิบข้อความที่กำลังส่งอยู่ซ้ำ
+# รอสักครู่หลังถูกปลุก เพื่อรวมแจ้งเตือนที่เกิดติดๆ กัน (เช่น เบิกหลายรายการ) เป็น push เดียว
+NOTIFY_COALESCE_WINDOW = float(os.environ.get("NOTIFY_COALESCE_WINDOW", 2))
+# จำกัดอัตราการยิง LINE API ฝั่งเรา (token bucket ต่อ process ที่ส่ง ดูหัวไฟล์)
+NOTIFY_RATE_PER_SEC = float(os.environ.get("NOTIFY_RATE_PER_SEC", 5))
+NOTIFY_RATE_BURST = int(os.environ.get("NOTIFY_RATE_BURST", 10))
+
+_wake = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+_session = None
+_session_lock = threading.Lock()
+
+class TokenBucket:
+    # clock / sleep เปลี่ยนได้ (ใช้นาฬิกาปลอมในเทสต์)
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(capacity)
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # บล็อกจนกว่าจะมี token ว่าง แล้วหักออกหนึ่งอัน
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+class LineRateLimited(Exception):
+    # LINE ตอบ 429: retry_after = วินาทีที่ต้องรอตาม header Retry-After (None = ไม่ได้บอกมา)
+    def __init__(self, retry_after):
+        super().__init__(f"429 Too Many Requests (Retry-After: {retry_after})")
+        self.retry_after = retry_after
+
+def parse_retry_after(value):
+    # Retry-After เป็นได้ทั้งจำนวนวินาที หรือวันเวลาแบบ HTTP-date
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0, int((when - datetime.now(timezone.utc)).total_seconds() + 0.999))
+
+_rate_limiter = TokenBucket(NOTIFY_RATE_PER_SEC, NOTIFY_RATE_BURST)
+
+def get_http_session():
+    # ใช้ session เดียวต่อ process (keep-alive + connection pool) ไม่ต้อง handshake TCP/TLS ทุกครั้ง
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+    return _session
+
+def enqueue_line_notify(cursor, message):
+    # เรียกภายใน transaction ของผู้เรียก ข้อความจะถูกส่งก็ต่อเมื่อ commit สำเร็จเท่านั้น
+    LINE_USER_ID = os.environ.get("LINE_USER_ID")
+    if not os.environ.get("LINE_ACCESS_TOKEN") or not LINE_USER_ID:
+        return
+    cursor.execute("INSERT INTO notification_outbox (recipient, message) VALUES (%s, %s)",
+                   (LINE_USER_ID, message))
+
+def wake_notifier():
+    # ให้ worker ส่งทันทีหลัง commit แทนที่จะรอรอบ poll ถัดไป
+    _wake.set()
+
+def send_line_notify(recipient, messages):
+    LINE_ACCESS_TOKEN = os.environ.get("LINE_ACCESS_TOKEN")
+    if not LINE_ACCESS_TOKEN:
+        raise RuntimeError("LINE_ACCESS_TOKEN is not set")
+
+    headers = {
+        'Content-Type': 'application/json',
+        'Authorization': f'Bearer {LINE_ACCESS_TOKEN}'
+    }
+    data = {
+        'to': recipient,
+        'messages': [{'type': 'text', 'text': m} for m in messages]
+    }
+    _rate_limiter.acquire()
+    response = get_http_session().post(LINE_API_URL, headers=headers, json=data, timeout=5)
+    if response.status_code == 429:
+        raise LineRateLimited(parse_retry_after(response.headers.get('Retry-After')))
+    response.raise_for_status()
+
+def _claim_batch():
+    # จองข้อความที่ถึงเวลาส่ง (SKIP LOCKED ให้หลาย worker ทำงานพร้อมกันได้โดยไม่แย่งกัน)
+    conn, cursor = None, None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        conn.start_transaction()
+        cursor.execute("""
+            SELECT id, recipient, message, attempts FROM notification_outbox
+            WHERE status = 'pending' AND next_attempt_at <= NOW()
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (NOTIFY_BATCH_SIZE,))
+        rows = cursor.fetchall()
+        if rows:
+            ids = [r['id'] for r in rows]
+            cursor.execute(f"""
+                UPDATE notification_outbox SET next_attempt_at = NOW() + INTERVAL %s SECOND
+                WHERE id IN ({', '.join(['%s'] * len(ids))})
+            """, (NOTIFY_LEASE_SECONDS, *ids))
+        conn.commit()
+        return rows
+    except Exception:
+        if conn: conn.rollback()
+        raise
+    finally:
+        if cursor: cursor.close()
+        if conn: conn.close()
+
+def _mark_results(sent_ids, failed, deferred=(), defer_seconds=0, defer_error=None):
+    conn, cursor = None, None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        if deferred:
+            # โดน 429: เลื่อนไปตาม Retry-After โดยไม่นับเป็นความพยายามที่ล้มเหลว
+            cursor.execute(f"""
+                UPDATE notification_outbox SET last_error = %s, next_attempt_at = NOW() + INTERVAL %s SECOND
+                WHERE id IN ({', '.join(['%s'] * len(deferred))})
+            """, (defer_error[:255], defer_seconds, *deferred))
+        if sent_ids:
+            cursor.execute(f"""
+                UPDATE notification_outbox SET status = 'sent', sent_at = NOW(), attempts = attempts + 1
+                WHERE id IN ({', '.join(['%s'] * len(sent_ids))})
+            """, tuple(sent_ids))
+        for row, error in failed:
+            attempts = row['attempts'] + 1
+            if attempts >= NOTIFY_MAX_ATTEMPTS:
+                cursor.execute("""
+                    UPDATE notification_outbox SET status = 'failed', attempts = %s, last_error = %s
+                    WHERE id = %s
+                """, (attempts, error[:255], row['id']))
+            else:
+                delay = min(NOTIFY_BACKOFF_BASE * (2 ** (attempts - 1)), NOTIFY_BACKOFF_MAX)
+                cursor.execute("""
+                    UPDATE notification_outbox
+                    SET attempts = %s, last_error = %s, next_attempt_at = NOW() + INTERVAL %s SECOND
+                    WHERE id = %s
+                """, (attempts, error[:255], delay, row['id']))
+        conn.commit()
+    except Exception:
+        if conn: conn.rollback()
+        raise
+    finally:
+        if cursor: cursor.close()
+        if conn: conn.close()
+
+def process_outbox_once():
+    rows = _claim_batch()
+    if not rows:
+        return 0
+
+    # รวมข้อความของผู้รับคนเดียวกันเป็นชุดละไม่เกิน 5 ข้อความ
+    by_recipient = {}
+    for row in rows:
+        by_recipient.setdefault(row['recipient'], []).append(row)
+
+    sent_ids, failed = [], []
+    chunks = [(recipient, group[i:i + LINE_MAX_MESSAGES])
+              for recipient, group in by_recipient.items()
+              for i in range(0, len(group), LINE_MAX_MESSAGES)]
+    for n, (recipient, chunk) in enumerate(chunks):
+        try:
+            send_line_notify(recipient, [r['message'] for r in chunk])
+            sent_ids.extend(r['id'] for r in chunk)
+        except LineRateLimited as e:
+            # LINE ให้หยุดยิง: ชุดนี้และชุดที่เหลือในรอบนี้เลื่อนไปตาม Retry-After (ไม่บอกมา = ใช้ backoff ขั้นแรก)
+            print(f"LINE Notify Error: {e}")
+            deferred = [r['id'] for _, rest in chunks[n:] for r in rest]
+            delay = min(e.retry_after if e.retry_after is not None else NOTIFY_BACKOFF_BASE, NOTIFY_BACKOFF_MAX)
+            _mark_results(sent_ids, failed, deferred, delay, str(e))
+            return len(sent_ids)
+        except Exception as e:
+            print(f"LINE Notify Error: {e}")
+            failed.extend((r, str(e)) for r in chunk)
+
+    _mark_results(sent_ids, failed)
+    return len(sent_ids)
+
+def run_worker(stop_event=None):
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            # ยังมีงานค้างเต็ม batch ให้วนต่อทันที ไม่ต้องรอ
+            while process_outbox_once() >= NOTIFY_BATCH_SIZE:
+                pass
+        except Exception as e:
+            print(f"Notify Worker Error: {e}")
+        if _wake.wait(NOTIFY_POLL_INTERVAL):
+            # ถูกปลุกจากการเบิก รอให้แจ้งเตือนที่ตามมาติดๆ เข้าคิวก่อนแล้วค่อยส่งรวดเดียว
+            stop_event.wait(NOTIFY_COALESCE_WINDOW)
+        _wake.clear()
+
+def start_notification_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=run_worker, name="line-notify-worker", daemon=True)
+            _worker.start()
+    return _worker
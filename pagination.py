@@ -0,0 +1,113 @@
+import base64
+import json
+from datetime import datetime
+from flask import request
+
+# ======================
+# แบ่งหน้าแบบ Keyset (Seek) สำหรับหน้าประวัติ
+# ======================
+# แทนที่จะใช้ OFFSET (ยิ่งหน้าลึกยิ่งช้า) จะจำค่าคีย์ของแถวสุดท้ายไว้ใน cursor
+# แล้วให้ DB กระโดดไปต่อจากคีย์นั้นเลย ทำให้ทุกหน้าใช้เวลาเท่ากันไม่ว่าประวัติจะยาวแค่ไหน
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def get_page_size():
+    try:
+        size = int(request.args.get('per_page', DEFAULT_PAGE_SIZE))
+    except (ValueError, TypeError):
+        size = DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+# ค่าวันที่เก็บเป็น {"dt": "..."} เพื่อแยกออกจากข้อความธรรมดา (เช่น ชื่อพัสดุ)
+def encode_cursor(values):
+    raw = json.dumps([{'dt': v.isoformat()} if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        return [datetime.fromisoformat(v['dt']) if isinstance(v, dict) else v for v in values]
+    except (ValueError, TypeError, KeyError):
+        # cursor เสีย/ถูกแก้ไข ให้กลับไปเริ่มหน้าแรก
+        return None
+
+# ดึงข้อมูลหนึ่งหน้า เรียงตามคอลัมน์ใน keys (ค่าเริ่มต้นเรียงจากใหม่ไปเก่า)
+# - query ต้องลงท้ายด้วยเงื่อนไข WHERE (เช่น WHERE 1=1 ...) และยังไม่มี ORDER BY
+# - keys คือ list ของ (คอลัมน์ใน SQL, ชื่อฟิลด์ในผลลัพธ์)
+# - descending=False ใช้กับรายการที่เรียง ก-ฮ เช่น ชื่อพัสดุ
+def keyset_page(cursor, query, params, keys, page_size, after=None, before=None, descending=True):
+    query, params, state = _keyset_query(query, params, keys, page_size, after, before, descending)
+    cursor.execute(query, params)
+    return _keyset_result(cursor.fetchall(), keys, page_size, state)
+
+# เหมือน keyset_page แต่อ่านผ่าน AsyncDbSession (โหมด ASGI ดู db_async.py)
+async def keyset_page_async(db, query, params, keys, page_size, after=None, before=None, descending=True):
+    query, params, state = _keyset_query(query, params, keys, page_size, after, before, descending)
+    return _keyset_result(await db.fetchall(query, params), keys, page_size, state)
+
+def _seek_condition(columns, op, key):
+    # (a, b, c) < (x, y, z) เขียนแบบขยาย: a < x OR (a = x AND (b < y OR (b = y AND c < z)))
+    # MySQL ไม่ใช้ range scan กับ row constructor แบบ < / > (อ่านทั้ง index แล้วกรองทีละแถว)
+    # แบบขยาย optimizer เห็นเป็นช่วง a <= x บน index ของคอลัมน์แรก (เช่น idx_transactions_date) ได้
+    condition, params = f"{columns[-1]} {op} %s", [key[-1]]
+    for col, value in zip(reversed(columns[:-1]), reversed(key[:-1])):
+        condition = f"{col} {op} %s OR ({col} = %s AND ({condition}))"
+        params = [value, value] + params
+    return f"({condition})", params
+
+def _keyset_query(query, params, keys, page_size, after, before, descending):
+    columns = [col for col, _ in keys]
+    params = list(params)
+
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before) if after_key is None else None
+    # cursor ที่จำนวนค่าไม่ตรงกับ keys (ถูกแก้ไข/มาจาก keys ชุดเก่า) ให้กลับไปเริ่มหน้าแรก
+    if after_key is not None and len(after_key) != len(keys):
+        after_key = None
+    if before_key is not None and len(before_key) != len(keys):
+        before_key = None
+
+    forward_op, forward_dir = ('<', 'DESC') if descending else ('>', 'ASC')
+    backward_op, backward_dir = ('>', 'ASC') if descending else ('<', 'DESC')
+
+    if before_key is not None:
+        # ย้อนกลับหน้าก่อน: เรียงกลับด้านแล้วค่อยกลับลำดับใน Python
+        condition, seek_params = _seek_condition(columns, backward_op, before_key)
+        query += f" AND {condition}"
+        params.extend(seek_params)
+        direction = backward_dir
+    else:
+        if after_key is not None:
+            condition, seek_params = _seek_condition(columns, forward_op, after_key)
+            query += f" AND {condition}"
+            params.extend(seek_params)
+        direction = forward_dir
+    order = ", ".join(f"{col} {direction}" for col in columns)
+
+    query += f" ORDER BY {order} LIMIT %s"
+    params.append(page_size + 1)
+    return query, tuple(params), (after_key, before_key)
+
+def _keyset_result(rows, keys, page_size, state):
+    after_key, before_key = state
+    has_more = len(rows) > page_size
+    rows = list(rows[:page_size])
+
+    if before_key is not None:
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = after_key is not None, has_more
+
+    def key_of(row):
+        return encode_cursor([row[field] for _, field in keys])
+
+    return {
+        'rows': rows,
+        'next_cursor': key_of(rows[-1]) if rows and has_next else None,
+        'prev_cursor': key_of(rows[0]) if rows and has_prev else None,
+        'per_page': page_size,
+    }
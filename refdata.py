@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from db import get_db
+
+# ======================
+# แคชข้อมูลอ้างอิง (users / storages / locations) สำหรับ dropdown ต่างๆ
+# ======================
+# ข้อมูลชุดนี้เปลี่ยนเฉพาะตอนจัดการผู้ใช้/ตู้/ห้อง จึงเก็บไว้ในหน่วยความจำของ process
+# - route ที่แก้ข้อมูลพวกนี้เรียก bump_refdata_version(cursor) ใน transaction เดียวกัน
+#   เพื่อเพิ่มเลขเวอร์ชันในตาราง app_versions (ทุก worker เห็นเลขเดียวกัน)
+# - แต่ละ process จะเช็คเลขเวอร์ชันอย่างมากทุก REFDATA_CHECK_INTERVAL วินาที (query PK แถวเดียว)
+#   ถ้าเลขเปลี่ยนค่อยโหลดตารางใหม่; REFDATA_TTL เป็นเพดานอายุแคชกันพลาด
+REFDATA_CHECK_INTERVAL = float(os.environ.get("REFDATA_CHECK_INTERVAL", 5))
+REFDATA_TTL = float(os.environ.get("REFDATA_TTL", 300))
+
+_lock = threading.Lock()
+_cache = None
+_version = None
+_loaded_at = 0.0
+_checked_at = 0.0
+
+def bump_refdata_version(cursor):
+    global _checked_at
+    cursor.execute("UPDATE app_versions SET version = version + 1 WHERE name = 'refdata'")
+    # ให้ process นี้เช็คเวอร์ชันใหม่ในครั้งถัดไปทันที (ถ้า rollback เลขจะไม่เปลี่ยน แคชก็ยังใช้ต่อได้)
+    with _lock:
+        _checked_at = 0.0
+
+def get_refdata_version():
+    return _version
+
+_VERSION_SQL = "SELECT version FROM app_versions WHERE name = 'refdata'"
+
+def _read_version(cursor):
+    try:
+        cursor.execute(_VERSION_SQL)
+        row = cursor.fetchone()
+        return row['version'] if row else None
+    except Exception:
+        # ยังไม่ได้รัน migration: ใช้ TTL อย่างเดียว
+        return None
+
+def get_reference_data():
+    now = time.monotonic()
+    data, cached = _cached_data(now)
+    if data is not None:
+        return data
+
+    cursor = get_db().cursor(dictionary=True)
+    version = _read_version(cursor)
+    if _still_valid(cached, version, now):
+        return cached[0]
+
+    cursor.execute("SELECT * FROM users")
+    users = cursor.fetchall()
+    cursor.execute("SELECT * FROM storages")
+    return _store_data(users, cursor.fetchall(), version, now)
+
+async def get_reference_data_async(db):
+    # แคชชุดเดียวกับ get_reference_data แต่อ่าน DB ผ่าน AsyncDbSession (โหมด ASGI)
+    now = time.monotonic()
+    data, cached = _cached_data(now)
+    if data is not None:
+        return data
+
+    try:
+        row = await db.fetchone(_VERSION_SQL)
+        version = row['version'] if row else None
+    except Exception:
+        version = None
+    if _still_valid(cached, version, now):
+        return cached[0]
+
+    users = await db.fetchall("SELECT * FROM users")
+    return _store_data(users, await db.fetchall("SELECT * FROM storages"), version, now)
+
+def _cached_data(now):
+    # คืน (แคชที่ใช้ได้เลยโดยไม่ต้องเช็คเวอร์ชัน, (แคช, เวอร์ชัน, เวลาโหลด) ไว้เทียบกับเลขใน DB)
+    with _lock:
+        if _cache is not None and now - _checked_at < REFDATA_CHECK_INTERVAL and now - _loaded_at < REFDATA_TTL:
+            return _cache, None
+        return None, (_cache, _version, _loaded_at)
+
+def _still_valid(cached, version, now):
+    global _checked_at
+    data, cached_version, loaded_at = cached
+    if data is not None and version is not None and version == cached_version and now - loaded_at < REFDATA_TTL:
+        with _lock:
+            _checked_at = now
+        return True
+    return False
+
+def _store_data(users, storages, version, now):
+    global _cache, _version, _loaded_at, _checked_at
+    data = {
+        'users': list(users),
+        'storages': list(storages),
+        'locations': sorted(set(s['location'] for s in storages if s['location'])),
+        # เลขเวอร์ชันของข้อมูลชุดนี้ ใช้เป็น key ของ fragment cache (ดู fragment_cache.py)
+        'version': version,
+    }
+
+    with _lock:
+        _cache, _version, _loaded_at, _checked_at = data, version, now, now
+    return data
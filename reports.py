@@ -0,0 +1,419 @@
+import json
+import os
+import threading
+import time
+from datetime import date
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from db import get_db_connection
+from filters import apply_date_range
+from loans import overdue_query
+
+# ======================
+# งานสร้างรายงาน Excel เบื้องหลัง (report_jobs)
+# ======================
+# export แบบเดิมส่ง CSV ระหว่าง request ข้อมูลเยอะ worker ของ gunicorn จะถูกกันไว้จนส่งครบ แบบใหม่:
+# 1. route บันทึกงานลง report_jobs (ชนิดรายงาน + ตัวกรอง) แล้วพาไปหน้าดูสถานะ ตอบกลับทันที
+# 2. worker หยิบงานด้วย FOR UPDATE SKIP LOCKED (รันหลายตัวพร้อมกันได้) แล้วสร้าง .xlsx จริง
+#    - อ่านจาก cursor แบบไม่บัฟเฟอร์ทีละ REPORT_FETCH_SIZE แถว
+#    - openpyxl แบบ write-only เขียนแถวต่อท้ายไฟล์ชั่วคราวทันที ไม่เก็บทั้งชีทไว้ในหน่วยความจำ
+#    หน่วยความจำระหว่างสร้างจึงคงที่ไม่ว่าข้อมูลจะมีกี่แถว
+# 3. เขียนเสร็จค่อย rename เข้า REPORTS_DIR (ไม่มีไฟล์ครึ่งๆ กลางๆ ให้ดาวน์โหลด) ผู้ใช้ poll สถานะแล้วกดดาวน์โหลด
+# worker: process แยก flask --app app report-worker (ค่าเริ่มต้น, บรรทัด worker ใน Procfile)
+#   หรือ thread ใน process ของเว็บที่เริ่มเมื่อมีคนสั่งรายงาน (ตั้ง REPORT_WORKER=1 ดู routes/reports.py)
+# หลาย process ต้องเห็น REPORTS_DIR เดียวกัน (เครื่องเดียว หรือ mount ร่วมกัน)
+# worker ทุกแบบเริ่มด้วย recover_reports(): คืนงานที่ worker เดิมตายกลางทาง (lease หมด) และลบไฟล์ .tmp ที่ค้าง
+REPORTS_DIR = os.environ.get("REPORTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reports_output'))
+REPORT_FETCH_SIZE = int(os.environ.get("REPORT_FETCH_SIZE", 1000))
+REPORT_PROGRESS_EVERY = 10000            # อัปเดตจำนวนแถว + ต่ออายุ lease ทุกกี่แถว
+REPORT_LEASE_SECONDS = 300               # ถ้า worker ไม่ต่ออายุภายในเวลานี้ ถือว่าตาย ให้ตัวอื่นทำใหม่
+REPORT_MAX_ATTEMPTS = int(os.environ.get("REPORT_MAX_ATTEMPTS", 3))
+REPORT_RETENTION_HOURS = int(os.environ.get("REPORT_RETENTION_HOURS", 24))
+REPORT_POLL_INTERVAL = float(os.environ.get("REPORT_POLL_INTERVAL", 2))
+DATETIME_FORMAT = 'dd/mm/yyyy hh:mm'
+DATE_FORMAT = 'dd/mm/yyyy'
+
+_worker = None
+_worker_lock = threading.Lock()
+_wake = threading.Event()
+
+# ======================
+# นิยามรายงาน (ใช้ร่วมกับ export CSV ใน routes/dashboard.py)
+# ======================
+# columns: (หัวคอลัมน์, ความกว้างใน Excel, number format ของเซลล์หรือ None)
+def items_report(params):
+    location = params.get('location') or ''
+    query = """
+        SELECT i.item_name, i.quantity, i.unit, s.storage_name, s.location, i.reorder_level
+        FROM items i
+        JOIN storages s ON i.storage_id = s.storage_id
+    """
+    args = []
+    if location and location != 'None':
+        query += " WHERE s.location = %s ORDER BY i.item_name ASC"
+        args.append(location)
+        filename = f"inventory_{location}"
+    else:
+        # ไม่ระบุห้อง ให้ดึงทั้งหมด
+        query += " ORDER BY s.location ASC, i.item_name ASC"
+        filename = "inventory_all"
+    return {
+        'title': 'พัสดุ',
+        'query': query,
+        'args': tuple(args),
+        'filename': filename,
+        'columns': [('ชื่อพัสดุ', 40, None), ('จำนวนคงเหลือ', 14, None), ('หน่วยนับ', 12, None),
+                    ('ตู้เก็บ', 24, None), ('ห้อง', 24, None), ('จุดสั่งซื้อ', 12, None)],
+        'to_row': lambda item: [item['item_name'], item['quantity'], item['unit'],
+                                item['storage_name'], item['location'], item['reorder_level']],
+    }
+
+def history_report(params):
+    query = """
+        SELECT t.transaction_date, u.fullname, u.department,
+               i.item_name, td.amount, i.unit, s.storage_name, s.location, t.status
+        FROM transactions t
+        JOIN transaction_details td ON t.transaction_id = td.transaction_id
+        JOIN items i ON td.item_id = i.item_id
+        JOIN users u ON t.user_id = u.user_id
+        JOIN storages s ON i.storage_id = s.storage_id
+        WHERE 1=1
+    """
+    args = []
+    if params.get('location'):
+        query += " AND s.location = %s"
+        args.append(params['location'])
+    query = apply_date_range(query, args, 't.transaction_date', params.get('start_date'), params.get('end_date'))
+    query += " ORDER BY t.transaction_date DESC"
+    return {
+        'title': 'ประวัติการเบิก',
+        'query': query,
+        'args': tuple(args),
+        'filename': "withdraw_history",
+        'columns': [('วัน-เวลาที่เบิก', 18, DATETIME_FORMAT), ('ผู้เบิก', 28, None), ('แผนก', 20, None),
+                    ('รายการ', 40, None), ('จำนวน', 10, None), ('หน่วย', 10, None),
+                    ('สถานที่เก็บ', 36, None), ('สถานะ', 14, None)],
+        'to_row': lambda row: [row['transaction_date'], row['fullname'], row['department'],
+                               row['item_name'], row['amount'], row['unit'],
+                               f"{row['location']} - {row['storage_name']}", row['status']],
+    }
+
+def overdue_report(params):
+    # รายการค้างคืนเกินกำหนด ณ วันที่สร้างไฟล์ (query เดียวกับหน้า /overdue)
+    today = date.today()
+    query, args = overdue_query(params.get('location') or '')
+    return {
+        'title': 'ค้างคืนเกินกำหนด',
+        'query': query,
+        'args': (today, *args),
+        'filename': f"overdue_{today:%Y%m%d}",
+        'columns': [('กำหนดคืน', 12, DATE_FORMAT), ('เกินกำหนด (วัน)', 14, None), ('ผู้ยืม', 28, None),
+                    ('แผนก', 20, None), ('รายการ', 40, None), ('จำนวน', 10, None), ('หน่วย', 10, None),
+                    ('สถานที่เก็บ', 36, None), ('วัน-เวลาที่ยืม', 18, DATETIME_FORMAT)],
+        'to_row': lambda loan: [loan['due_date'], (today - loan['due_date']).days, loan['fullname'],
+                                loan['department'], loan['item_name'], loan['amount'], loan['unit'],
+                                f"{loan['location']} - {loan['storage_name']}", loan['borrow_date']],
+    }
+
+REPORT_TYPES = {
+    'items': items_report,
+    'history': history_report,
+    'overdue': overdue_report,
+}
+
+# ======================
+# คิวงาน
+# ======================
+def enqueue_report(cursor, kind, params):
+    # เรียกใน transaction ของ route เก็บเฉพาะตัวกรองที่รายงานชนิดนั้นใช้
+    if kind not in REPORT_TYPES:
+        raise ValueError(f"Unknown report type: {kind}")
+    params = {key: value for key, value in params.items() if value}
+    cursor.execute("INSERT INTO report_jobs (kind, params) VALUES (%s, %s)",
+                   (kind, json.dumps(params, ensure_ascii=False, sort_keys=True)))
+    return cursor.lastrowid
+
+def get_report_job(cursor, job_id):
+    # cursor ต้องเป็น dictionary cursor
+    cursor.execute("""
+        SELECT id, kind, status, row_count, file_name, download_name, last_error, created_at, finished_at
+        FROM report_jobs WHERE id = %s
+    """, (job_id,))
+    return cursor.fetchone()
+
+def get_report_path(job):
+    # คืน path ของไฟล์ที่พร้อมดาวน์โหลด (None ถ้ายังไม่เสร็จ / หมดอายุ / ไฟล์หายไปแล้ว)
+    if job['status'] != 'done' or not job['file_name']:
+        return None
+    path = os.path.join(REPORTS_DIR, job['file_name'])
+    return path if os.path.exists(path) else None
+
+def _claim_next(conn, cursor):
+    # จองงานถัดไป (รวมงานที่ worker เดิมตายกลางทาง) งานที่ลองครบ REPORT_MAX_ATTEMPTS แล้วให้ล้มเหลวไปเลย
+    while True:
+        cursor.execute("""
+            SELECT id, kind, params, attempts FROM report_jobs
+            WHERE status = 'pending' OR (status = 'running' AND lease_until < NOW())
+            ORDER BY id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        """)
+        job = cursor.fetchone()
+        if not job:
+            conn.commit()
+            return None
+        if job['attempts'] >= REPORT_MAX_ATTEMPTS:
+            cursor.execute("""
+                UPDATE report_jobs SET status = 'failed', lease_until = NULL,
+                    last_error = COALESCE(last_error, 'worker stopped before finishing')
+                WHERE id = %s
+            """, (job['id'],))
+            conn.commit()
+            continue
+        cursor.execute("""
+            UPDATE report_jobs
+            SET status = 'running', attempts = attempts + 1, row_count = 0, lease_until = NOW() + INTERVAL %s SECOND
+            WHERE id = %s
+        """, (REPORT_LEASE_SECONDS, job['id']))
+        conn.commit()
+        return job
+
+def _progress(conn, cursor, job_id, row_count):
+    cursor.execute("""
+        UPDATE report_jobs SET row_count = %s, lease_until = NOW() + INTERVAL %s SECOND WHERE id = %s
+    """, (row_count, REPORT_LEASE_SECONDS, job_id))
+    conn.commit()
+
+# ======================
+# สร้างไฟล์ .xlsx
+# ======================
+def write_xlsx(report, rows, path, on_progress=None):
+    # rows: iterable ของ batch แถว (list of dict) คืนจำนวนแถวที่เขียน
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(report['title'])
+    for index, (_, width, _) in enumerate(report['columns'], start=1):
+        ws.column_dimensions[get_column_letter(index)].width = width
+    ws.freeze_panes = 'A2'
+
+    bold = Font(bold=True)
+    header = []
+    for title, _, _ in report['columns']:
+        cell = WriteOnlyCell(ws, value=title)
+        cell.font = bold
+        header.append(cell)
+    ws.append(header)
+
+    formats = [(index, fmt) for index, (_, _, fmt) in enumerate(report['columns']) if fmt]
+    to_row = report['to_row']
+    count = 0
+    for batch in rows:
+        for row in batch:
+            values = to_row(row)
+            for index, fmt in formats:
+                if values[index] is not None:
+                    cell = WriteOnlyCell(ws, value=values[index])
+                    cell.number_format = fmt
+                    values[index] = cell
+            ws.append(values)
+        count += len(batch)
+        if on_progress and count % REPORT_PROGRESS_EVERY < len(batch):
+            on_progress(count)
+    wb.save(path)
+    return count
+
+def _fetch_batches(cursor):
+    while True:
+        rows = cursor.fetchmany(REPORT_FETCH_SIZE)
+        if not rows:
+            return
+        yield rows
+
+def _generate(job, on_progress):
+    report = REPORT_TYPES[job['kind']](json.loads(job['params']))
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    file_name = f"report_{job['id']}.xlsx"
+    path = os.path.join(REPORTS_DIR, file_name)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    # connection แยกสำหรับอ่านข้อมูล (cursor ไม่บัฟเฟอร์ ระหว่างอ่านใช้ connection เดียวกันทำอย่างอื่นไม่ได้)
+    conn = get_db_connection()
+    cursor = None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(report['query'], report['args'])
+        count = write_xlsx(report, _fetch_batches(cursor), tmp_path, on_progress)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if conn.unread_result: conn.consume_results()
+        if cursor: cursor.close()
+        conn.close()
+    return file_name, f"{report['filename']}.xlsx", count
+
+def run_next_report():
+    # สร้างรายงานที่รออยู่ 1 งาน คืน id งานที่หยิบได้ (None = ไม่มีงาน)
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        job = _claim_next(conn, cursor)
+        if not job:
+            return None
+        try:
+            file_name, download_name, count = _generate(job, lambda n: _progress(conn, cursor, job['id'], n))
+            cursor.execute("""
+                UPDATE report_jobs
+                SET status = 'done', row_count = %s, file_name = %s, download_name = %s,
+                    last_error = NULL, lease_until = NULL, finished_at = NOW()
+                WHERE id = %s
+            """, (count, file_name, download_name, job['id']))
+        except Exception as e:
+            conn.rollback()
+            print(f"Report Error (job {job['id']}): {e}")
+            cursor.execute("""
+                UPDATE report_jobs SET status = 'failed', last_error = %s, lease_until = NULL, finished_at = NOW()
+                WHERE id = %s
+            """, (str(e)[:255], job['id']))
+        conn.commit()
+        return job['id']
+    finally:
+        conn.close()
+
+def run_pending_reports():
+    finished = []
+    while True:
+        job_id = run_next_report()
+        if job_id is None:
+            return finished
+        finished.append(job_id)
+
+def cleanup_reports():
+    # ลบไฟล์รายงานที่เก่ากว่า REPORT_RETENTION_HOURS ชั่วโมง (แถวงานยังอยู่ สถานะเป็น expired)
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT id, file_name FROM report_jobs
+            WHERE status = 'done' AND finished_at < NOW() - INTERVAL %s HOUR
+        """, (REPORT_RETENTION_HOURS,))
+        rows = cursor.fetchall()
+        for row in rows:
+            if row['file_name']:
+                try:
+                    os.remove(os.path.join(REPORTS_DIR, row['file_name']))
+                except FileNotFoundError:
+                    pass
+            cursor.execute("UPDATE report_jobs SET status = 'expired', file_name = NULL WHERE id = %s", (row['id'],))
+        conn.commit()
+        return len(rows)
+    finally:
+        conn.close()
+
+def _remove_stale_tmp_files():
+    # ไฟล์ .tmp ที่ worker ตายกลางทางทิ้งไว้ (ไฟล์ที่ยังเขียนอยู่จะถูกแก้ไขล่าสุดไม่เกิน REPORT_LEASE_SECONDS)
+    # REPORTS_DIR อาจใช้ร่วมกับ process/เครื่องอื่น จึงดูจากอายุไฟล์ ไม่ใช่ pid
+    try:
+        names = os.listdir(REPORTS_DIR)
+    except FileNotFoundError:
+        return 0
+    cutoff = time.time() - REPORT_LEASE_SECONDS
+    removed = 0
+    for name in names:
+        if not name.endswith('.tmp'):
+            continue
+        path = os.path.join(REPORTS_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+def recover_reports():
+    # เรียกตอน worker เริ่ม: คืนงาน running ที่ lease หมดแล้ว (worker เดิมตาย) กลับเป็น pending และลบไฟล์ .tmp ที่ค้าง
+    # งานที่ลองครบ REPORT_MAX_ATTEMPTS แล้ว _claim_next จะให้ล้มเหลวเอง
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE report_jobs SET status = 'pending', lease_until = NULL
+            WHERE status = 'running' AND lease_until < NOW()
+        """)
+        reclaimed = cursor.rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    return reclaimed, _remove_stale_tmp_files()
+
+def _seconds_until_lease_expiry():
+    # งานที่ยังมี worker ถือ lease อยู่ (อาจเป็น process ที่ตายไปแล้ว) จะหมด lease ในอีกกี่วินาที (None = ไม่มี)
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT GREATEST(TIMESTAMPDIFF(SECOND, NOW(), MIN(lease_until)), 0) FROM report_jobs WHERE status = 'running'
+        """)
+        row = cursor.fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+# ======================
+# worker
+# ======================
+def _recover_on_start():
+    try:
+        reclaimed, removed = recover_reports()
+        if reclaimed or removed:
+            print(f"Report Worker: reclaimed {reclaimed} stale job(s), removed {removed} temp file(s)")
+    except Exception as e:
+        print(f"Report Worker Error: {e}")
+
+def run_report_worker(stop_event=None):
+    # process แยก: flask --app app report-worker
+    stop_event = stop_event or threading.Event()
+    _recover_on_start()
+    while not stop_event.is_set():
+        try:
+            run_pending_reports()
+            cleanup_reports()
+        except Exception as e:
+            print(f"Report Worker Error: {e}")
+        stop_event.wait(REPORT_POLL_INTERVAL)
+
+def _worker_loop():
+    # ทำงานที่รออยู่จนหมด ถ้ายังมีงาน running ของ worker อื่นค้างอยู่ให้รอจน lease หมดแล้วดูอีกรอบ
+    # (ถ้า worker นั้นตายไปแล้ว งานจะถูกหยิบมาทำต่อโดยไม่ต้องรอให้มีคนสั่งรายงานใหม่) ไม่มีอะไรค้างแล้วค่อยจบ
+    global _worker
+    _recover_on_start()
+    while True:
+        _wake.clear()
+        try:
+            run_pending_reports()
+            cleanup_reports()
+            wait = _seconds_until_lease_expiry()
+        except Exception as e:
+            print(f"Report Worker Error: {e}")
+            wait = None
+        if wait is None:
+            with _worker_lock:
+                if not _wake.is_set():
+                    _worker = None
+                    return
+            continue
+        # มีงานใหม่เข้ามา (start_report_worker) ระหว่างรอ ก็ตื่นมาทำทันที
+        _wake.wait(wait + 1)
+
+def start_report_worker():
+    # thread เบื้องหลังใน process ของเว็บ (REPORT_WORKER=1) ทำงานที่รออยู่จนหมดแล้วจบเอง
+    # route เรียกทุกครั้งที่มีการสั่งรายงาน งานที่ค้างจาก process เดิมจะถูกหยิบมาทำต่อในรอบนั้นด้วย
+    global _worker
+    with _worker_lock:
+        _wake.set()
+        if _worker is None:
+            _worker = threading.Thread(target=_worker_loop, name="report-worker", daemon=True)
+            _worker.start()
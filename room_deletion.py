@@ -0,0 +1,250 @@
+import json
+import os
+import threading
+from db import get_db_connection
+from data_version import bump_data_version
+from refdata import bump_refdata_version
+from stock_summary import apply_item_changes, refresh_locations
+
+# ======================
+# ลบห้องแบบแบ่งก้อน (งานเบื้องหลัง ทำต่อได้ถ้าค้างกลางทาง)
+# ======================
+# แบบเดิมลบทุกอย่างของห้องใน transaction เดียว ห้องใหญ่จะล็อค items / transaction_details /
+# borrow_transactions ช่วงกว้างไว้นาน ทำให้การเบิกของห้องอื่นค้างไปด้วย แบบใหม่:
+# 1. route สร้างงาน (room_deletion_jobs) พร้อม storage_id ของห้อง ณ ตอนนั้น (หาครั้งเดียว)
+# 2. worker เดินรายการพัสดุของตู้เหล่านั้นตาม item_id ทีละ ROOM_DELETE_ITEM_CHUNK ชิ้น
+#    - ลบประวัติ (borrow_transactions, transaction_details) ของพัสดุก้อนนั้นครั้งละไม่เกิน ROOM_DELETE_BATCH_SIZE แถว
+#      commit + ต่ออายุ lease ทุกครั้ง ล็อคแต่ละรอบจึงสั้นและแคบ (ไม่กันการเบิกพัสดุนั้นนาน และ lease ไม่หมดกลางก้อน)
+#      ลบเฉพาะประวัติของพัสดุที่ยังอยู่ในตู้ของงานนี้ (ย้ายออกไปห้องอื่นระหว่างนั้นจะไม่ถูกแตะ)
+#    - แล้ว transaction สั้นๆ อีกครั้ง: ล็อคแถวพัสดุก้อนนั้น ลบประวัติที่เพิ่มมาหลังรอบก่อน (เหลือน้อย)
+#      ลบพัสดุ + ปรับตารางสรุป + บันทึก last_item_id ใน commit เดียว ถ้าพังจะ rollback ขั้นนี้ทั้งหมด
+#    ถ้าพังหลังลบประวัติไปบางส่วน พัสดุก้อนนั้นยังอยู่และ last_item_id ไม่ขยับ ทำต่อเมื่อไรจะลบก้อนเดิมซ้ำจนจบ
+#    (พัสดุเหล่านี้อยู่ในห้องที่สั่งลบแล้ว จึงไม่ได้เสียประวัติของพัสดุที่จะใช้งานต่อ)
+# 3. ไม่เหลือพัสดุในตู้แล้ว ลบตู้ คำนวณแถวสรุปของห้องใหม่ ปิดงาน
+# งานที่ค้าง (process ตาย / error) ทำต่อจาก last_item_id: กดลบห้องเดิมซ้ำ หรือ flask --app app room-deletions
+# ตู้ที่เพิ่มเข้าห้องหลังเริ่มงานจะไม่ถูกลบ (ห้องจะยังอยู่พร้อมตู้นั้น)
+ROOM_DELETE_BATCH_SIZE = int(os.environ.get("ROOM_DELETE_BATCH_SIZE", 1000))
+ROOM_DELETE_ITEM_CHUNK = int(os.environ.get("ROOM_DELETE_ITEM_CHUNK", 200))
+ROOM_DELETE_LEASE_SECONDS = 120   # ถ้า worker ไม่ต่ออายุภายในเวลานี้ ถือว่าตาย ให้ตัวอื่นทำต่อ
+HISTORY_TABLES = ('borrow_transactions', 'transaction_details')
+
+_worker = None
+_worker_lock = threading.Lock()
+_pending = False
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+def create_job(cursor, location):
+    # เรียกใน transaction ของ route; ห้องเดิมที่มีงานค้างอยู่จะใช้งานเดิม (ทำต่อจากที่ค้าง)
+    cursor.execute("""
+        SELECT id FROM room_deletion_jobs
+        WHERE location = %s AND status IN ('pending', 'running', 'failed')
+        ORDER BY id LIMIT 1
+    """, (location,))
+    row = cursor.fetchone()
+    if row:
+        job_id = row[0]
+        cursor.execute("UPDATE room_deletion_jobs SET status = 'pending', last_error = NULL WHERE id = %s AND status = 'failed'",
+                       (job_id,))
+        return job_id
+
+    cursor.execute("SELECT storage_id FROM storages WHERE location = %s ORDER BY storage_id", (location,))
+    storage_ids = [r[0] for r in cursor.fetchall()]
+    total = 0
+    if storage_ids:
+        cursor.execute(f"SELECT COUNT(*) FROM items WHERE storage_id IN ({_placeholders(storage_ids)})", tuple(storage_ids))
+        total = cursor.fetchone()[0]
+    cursor.execute("""
+        INSERT INTO room_deletion_jobs (location, storage_ids, total_items) VALUES (%s, %s, %s)
+    """, (location, json.dumps(storage_ids), total))
+    return cursor.lastrowid
+
+def get_job(cursor, job_id):
+    # cursor ต้องเป็น dictionary cursor
+    cursor.execute("""
+        SELECT id, location, status, total_items, deleted_items, deleted_history, last_error, created_at, finished_at
+        FROM room_deletion_jobs WHERE id = %s
+    """, (job_id,))
+    return cursor.fetchone()
+
+def _claim(conn, cursor, job_id, include_failed):
+    statuses = "'pending', 'failed'" if include_failed else "'pending'"
+    cursor.execute(f"""
+        UPDATE room_deletion_jobs SET status = 'running', lease_until = NOW() + INTERVAL %s SECOND
+        WHERE id = %s AND (status IN ({statuses}) OR (status = 'running' AND lease_until < NOW()))
+    """, (ROOM_DELETE_LEASE_SECONDS, job_id))
+    claimed = cursor.rowcount == 1
+    conn.commit()
+    return claimed
+
+def _delete_history(conn, cursor, job_id, storage_ids, item_ids):
+    # ลบประวัติของพัสดุก้อนนี้ทีละไม่เกิน ROOM_DELETE_BATCH_SIZE แถว (ใช้ index item_id) commit + ต่อ lease ทุกรอบ
+    placeholders = _placeholders(item_ids)
+    for table in HISTORY_TABLES:
+        while True:
+            cursor.execute(f"""
+                DELETE FROM {table}
+                WHERE item_id IN (SELECT item_id FROM items WHERE item_id IN ({placeholders})
+                                  AND storage_id IN ({_placeholders(storage_ids)}))
+                LIMIT %s
+            """, (*item_ids, *storage_ids, ROOM_DELETE_BATCH_SIZE))
+            deleted = cursor.rowcount
+            cursor.execute("""
+                UPDATE room_deletion_jobs
+                SET deleted_history = deleted_history + %s, lease_until = NOW() + INTERVAL %s SECOND
+                WHERE id = %s
+            """, (deleted, ROOM_DELETE_LEASE_SECONDS, job_id))
+            conn.commit()
+            if deleted < ROOM_DELETE_BATCH_SIZE:
+                break
+
+def _delete_items(conn, cursor, job_id, storage_ids, item_ids):
+    placeholders = _placeholders(item_ids)
+    # ล็อคพัสดุก่อน: ระหว่างนี้ไม่มีใครเพิ่มประวัติที่อ้างถึงพัสดุก้อนนี้ได้อีก ที่หลุดมาหลังรอบก่อนก็เหลือน้อย
+    cursor.execute(f"""
+        SELECT item_id, storage_id, quantity, reorder_level FROM items
+        WHERE item_id IN ({placeholders}) ORDER BY item_id FOR UPDATE
+    """, tuple(item_ids))
+    # พัสดุที่ถูกย้ายออกไปห้องอื่นระหว่างนั้นไม่ต้องลบ
+    rows = [row for row in cursor.fetchall() if row[1] in storage_ids]
+    deleted_history = 0
+    if rows:
+        locked_ids = tuple(row[0] for row in rows)
+        placeholders = _placeholders(locked_ids)
+        for table in HISTORY_TABLES:
+            cursor.execute(f"DELETE FROM {table} WHERE item_id IN ({placeholders})", locked_ids)
+            deleted_history += cursor.rowcount
+        cursor.execute(f"DELETE FROM items WHERE item_id IN ({placeholders})", locked_ids)
+    cursor.execute("""
+        UPDATE room_deletion_jobs
+        SET deleted_items = deleted_items + %s, deleted_history = deleted_history + %s,
+            last_item_id = %s, lease_until = NOW() + INTERVAL %s SECOND
+        WHERE id = %s
+    """, (len(rows), deleted_history, max(item_ids), ROOM_DELETE_LEASE_SECONDS, job_id))
+    # ตารางสรุปเป็นคำสั่งสุดท้ายก่อน commit (ดู stock_summary.py)
+    apply_item_changes(cursor, [(storage_id, (quantity, level), None) for _, storage_id, quantity, level in rows])
+    conn.commit()
+
+def _finish(conn, cursor, job_id, location, storage_ids):
+    # คืนค่า False ถ้ายังมีพัสดุหลงอยู่ (ย้ายเข้ามาหลังเคอร์เซอร์ผ่านไปแล้ว) ให้เดินใหม่ตั้งแต่ต้น
+    if storage_ids:
+        placeholders = _placeholders(storage_ids)
+        # ล็อคตู้ก่อน ระหว่างนี้ไม่มีใครเพิ่ม/ย้ายพัสดุเข้าตู้เหล่านี้ได้
+        cursor.execute(f"SELECT storage_id FROM storages WHERE storage_id IN ({placeholders}) FOR UPDATE", tuple(storage_ids))
+        cursor.fetchall()
+        cursor.execute(f"SELECT item_id FROM items WHERE storage_id IN ({placeholders}) LIMIT 1", tuple(storage_ids))
+        if cursor.fetchone():
+            cursor.execute("UPDATE room_deletion_jobs SET last_item_id = 0 WHERE id = %s", (job_id,))
+            conn.commit()
+            return False
+        cursor.execute(f"DELETE FROM storages WHERE storage_id IN ({placeholders})", tuple(storage_ids))
+    refresh_locations(cursor, [location])
+    bump_refdata_version(cursor)
+    cursor.execute("""
+        UPDATE room_deletion_jobs SET status = 'done', finished_at = NOW(), lease_until = NULL WHERE id = %s
+    """, (job_id,))
+    conn.commit()
+    return True
+
+def run_job(job_id, include_failed=False):
+    # คืนค่า True ถ้าทำงานนี้จนจบ (False = มี worker อื่นถืออยู่ หรือไม่มีงานให้ทำ)
+    conn = get_db_connection()
+    claimed = False
+    try:
+        cursor = conn.cursor()
+        claimed = _claim(conn, cursor, job_id, include_failed)
+        if not claimed:
+            return False
+        cursor.execute("SELECT location, storage_ids, last_item_id FROM room_deletion_jobs WHERE id = %s", (job_id,))
+        location, storage_ids, last_item_id = cursor.fetchone()
+        storage_ids = json.loads(storage_ids)
+        conn.commit()
+
+        while True:
+            item_ids = []
+            if storage_ids:
+                cursor.execute(f"""
+                    SELECT item_id FROM items
+                    WHERE storage_id IN ({_placeholders(storage_ids)}) AND item_id > %s
+                    ORDER BY item_id LIMIT %s
+                """, (*storage_ids, last_item_id, ROOM_DELETE_ITEM_CHUNK))
+                item_ids = [r[0] for r in cursor.fetchall()]
+                conn.commit()
+
+            if not item_ids:
+                if _finish(conn, cursor, job_id, location, storage_ids):
+                    break
+                last_item_id = 0
+                continue
+
+            _delete_history(conn, cursor, job_id, storage_ids, item_ids)
+            _delete_items(conn, cursor, job_id, storage_ids, item_ids)
+            last_item_id = max(item_ids)
+            # หน้าจอ (ETag / snapshot) เห็นยอดที่ลดลงระหว่างทาง
+            bump_data_version(conn)
+
+        bump_data_version(conn)
+        return True
+    except Exception as e:
+        conn.rollback()
+        if claimed:
+            # ความคืบหน้าที่ commit ไปแล้วยังอยู่ ครั้งหน้าทำต่อจาก last_item_id
+            try:
+                cursor = conn.cursor()
+                cursor.execute("UPDATE room_deletion_jobs SET status = 'failed', last_error = %s, lease_until = NULL WHERE id = %s",
+                               (str(e)[:255], job_id))
+                conn.commit()
+            except Exception:
+                pass
+        raise
+    finally:
+        conn.close()
+
+def run_pending_jobs(include_failed=False):
+    # ทำงานที่รออยู่ทั้งหมด (รวมงานที่ worker เดิมตายกลางทาง) ทีละงาน คืนรายการ id ที่ทำเสร็จ
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        statuses = "'pending', 'failed'" if include_failed else "'pending'"
+        cursor.execute(f"""
+            SELECT id FROM room_deletion_jobs
+            WHERE status IN ({statuses}) OR (status = 'running' AND lease_until < NOW())
+            ORDER BY id
+        """)
+        job_ids = [r[0] for r in cursor.fetchall()]
+        conn.commit()
+    finally:
+        conn.close()
+
+    finished = []
+    for job_id in job_ids:
+        try:
+            if run_job(job_id, include_failed=include_failed):
+                finished.append(job_id)
+        except Exception as e:
+            print(f"Room Deletion Error (job {job_id}): {e}")
+    return finished
+
+def _worker_loop():
+    global _worker, _pending
+    while True:
+        with _worker_lock:
+            if not _pending:
+                _worker = None
+                return
+            _pending = False
+        try:
+            run_pending_jobs()
+        except Exception as e:
+            print(f"Room Deletion Worker Error: {e}")
+
+def start_room_deletion_worker():
+    # thread เบื้องหลังใน process ของเว็บ ทำงานที่รออยู่จนหมดแล้วจบเอง
+    # ถ้ามีงานใหม่เข้ามาระหว่างที่ thread ทำงานอยู่ จะวนหางานอีกรอบก่อนจบ
+    global _worker, _pending
+    with _worker_lock:
+        _pending = True
+        if _worker is None:
+            _worker = threading.Thread(target=_worker_loop, name="room-deletion-worker", daemon=True)
+            _worker.start()
@@ -1,7 +1,18 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, make_response, Response
-from db import get_db_connection
-from datetime import datetime
+from flask import Blueprint, render_template, request, redirect, url_for, flash, Response, jsonify
+from db import get_db, get_db_connection
+from snapshot import get_dashboard_snapshot, invalidate_snapshot
+from refdata import get_reference_data
+from stock import take_stock, run_in_transaction, StockError
+from stock_summary import apply_item_changes, read_summary, is_low, LOW_STOCK_SQL
+from pagination import get_page_size, keyset_page
+from filters import apply_date_range
+from data_version import conditional_page
+from reports import REPORT_TYPES
+from loans import (parse_due_date, is_overdue, get_overdue_loans, LoanError,
+                   OPEN_LOAN_SQL, LOAN_COLUMNS, LOAN_JOINS)
+from datetime import date, datetime
 import csv
+import os
 from io import StringIO
 
 dashboard_bp = Blueprint('dashboard', __name__)
@@ -10,149 +21,182 @@ dashboard_bp = Blueprint('dashboard', __name__)
 # 1. หน้า Index (ภาพรวม + กราฟ)
 # ======================
 @dashboard_bp.route('/')
+@conditional_page
 def index():
-    conn, cursor = None, None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-
-        cursor.execute("SELECT SUM(quantity) as total FROM items")
-        total_items = cursor.fetchone()['total'] or 0
-
-        cursor.execute("SELECT COUNT(*) as low FROM items WHERE quantity < 10")
-        low_stock = cursor.fetchone()['low'] or 0
-
-        cursor.execute("SELECT COUNT(*) as borrowed FROM borrow_transactions WHERE status != 'returned'")
-        borrow_count = cursor.fetchone()['borrowed'] or 0
-
-        cursor.execute("""
-            SELECT s.location, COUNT(i.item_id) as item_count, COUNT(DISTINCT s.storage_id) as storage_count
-            FROM storages s
-            LEFT JOIN items i ON s.storage_id = i.storage_id
-            GROUP BY s.location
-        """)
-        room_stats = cursor.fetchall()
-
-        cursor.execute("""
-            SELECT s.location, 
-                   SUM(CASE WHEN i.item_id IS NOT NULL AND i.quantity < 10 THEN 1 ELSE 0 END) as low_count,
-                   SUM(CASE WHEN i.item_id IS NOT NULL AND i.quantity >= 10 THEN 1 ELSE 0 END) as normal_count
-            FROM storages s
-            LEFT JOIN items i ON s.storage_id = i.storage_id
-            GROUP BY s.location
-            ORDER BY s.location
-        """)
-        chart_raw = cursor.fetchall()
-
-        chart_labels = []
-        low_stock_data = []
-        normal_stock_data = []
-
-        for r in chart_raw:
-            if r['location']:
-                chart_labels.append(r['location'])
-                low_stock_data.append(int(r['low_count'] or 0))
-                normal_stock_data.append(int(r['normal_count'] or 0))
-        
-        cursor.execute("SELECT * FROM users")
-        users = cursor.fetchall()
-        cursor.execute("SELECT * FROM storages")
-        storages = cursor.fetchall()
-        locations = list(set([s['location'] for s in storages if s['location']]))
-
-        return render_template('index.html', 
-            current_location=None,
-            total_items=total_items, low_stock=low_stock, borrow_count=borrow_count,
-            room_stats=room_stats, 
-            chart_labels=chart_labels, 
-            low_stock_data=low_stock_data, 
-            normal_stock_data=normal_stock_data,
-            users=users, storages=storages, locations=locations
-        )
+        # ใช้ snapshot ที่แคชไว้ โหลดซ้ำไม่ต้องยิง DB จนกว่าจะมีการแก้ไขข้อมูล
+        snapshot = get_dashboard_snapshot()
+        ref = get_reference_data()
+        return render_template('index.html', **_index_context(snapshot, ref))
     except Exception as e:
-        return f"Database Error: กรุณาตรวจสอบการเชื่อมต่อฐานข้อมูล ({e})"
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
+        return f"Database Error: กรุณาตรวจสอบการเชื่อมต่อฐานข้อมูล ({e})", 500
+
+# ตัวแปรของ template ใช้ร่วมกับ view แบบ async (routes/dashboard_async.py)
+def _index_context(snapshot, ref):
+    return dict(
+        current_location=None,
+        total_items=snapshot['total_items'], low_stock=snapshot['low_stock'], borrow_count=snapshot['borrow_count'],
+        room_stats=snapshot['room_stats'], 
+        chart_labels=snapshot['chart_labels'], 
+        low_stock_data=snapshot['low_stock_data'], 
+        normal_stock_data=snapshot['normal_stock_data'],
+        users=ref['users'], storages=ref['storages'], locations=ref['locations'],
+        refdata_version=ref['version'], data_version=snapshot['data_version']
+    )
 
 # ======================
 # 2. หน้าย่อยรายห้อง (Room View)
 # ======================
+# หน้าห้องโหลดแค่หน้าแรกของรายการพัสดุ ที่เหลือ/การค้นหาดึงผ่าน /api/room_items
+ROOM_PAGE_SIZE = 50
+# ใช้ FULLTEXT (ngram parser รองรับภาษาไทย) ถ้า DB ไม่รองรับให้ตั้ง SEARCH_FULLTEXT=0 เพื่อใช้ LIKE แทน
+SEARCH_FULLTEXT = os.environ.get("SEARCH_FULLTEXT", "1") != "0"
+NGRAM_TOKEN_SIZE = 2
+
+ROOM_ITEM_KEYS = [('i.item_name', 'item_name'), ('i.item_id', 'item_id')]
+
+def _room_items_query(location, q=''):
+    query = """
+        SELECT i.*, s.storage_name, s.location 
+        FROM items i 
+        JOIN storages s ON i.storage_id = s.storage_id 
+        WHERE s.location = %s
+    """
+    params = [location]
+    q = q.strip()
+    if q and SEARCH_FULLTEXT and len(q) >= NGRAM_TOKEN_SIZE:
+        # ค้นแบบวลีใน BOOLEAN MODE = หา n-gram ต่อเนื่องกัน จึงได้ผลแบบ substring
+        phrase = '"' + q.replace('"', ' ') + '"'
+        query += " AND (MATCH(i.item_name) AGAINST (%s IN BOOLEAN MODE) OR MATCH(s.storage_name) AGAINST (%s IN BOOLEAN MODE))"
+        params.extend([phrase, phrase])
+    elif q:
+        # คำค้นสั้นกว่า n-gram ค้นแบบขึ้นต้นด้วย (ใช้ index ของ item_name ได้)
+        # ถ้าปิด FULLTEXT ไว้ ค้นแบบ substring ด้วย LIKE ธรรมดา
+        escaped = q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        pattern = (escaped if SEARCH_FULLTEXT else f"%{escaped}") + '%'
+        query += " AND (i.item_name LIKE %s OR s.storage_name LIKE %s)"
+        params.extend([pattern, pattern])
+    return query, params
+
+def _room_items_page(cursor, location, q='', after=None, page_size=ROOM_PAGE_SIZE):
+    query, params = _room_items_query(location, q)
+    return keyset_page(cursor, query, params, keys=ROOM_ITEM_KEYS, page_size=page_size, after=after, descending=False)
+
 @dashboard_bp.route('/room/<path:location_name>')
+@conditional_page
 def room_view(location_name):
-    conn, cursor = None, None
+    db = get_db()
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT i.*, s.storage_name, s.location 
-            FROM items i 
-            JOIN storages s ON i.storage_id = s.storage_id 
-            WHERE s.location = %s
-        """, (location_name,))
-        items = cursor.fetchall()
-        
-        total_items = sum([i['quantity'] for i in items]) if items else 0
-        low_stock = len([i for i in items if i['quantity'] < 10]) if items else 0
-        
-        cursor.execute("SELECT * FROM users")
-        users = cursor.fetchall()
-        cursor.execute("SELECT * FROM storages")
-        storages = cursor.fetchall()
-        locations = list(set([s['location'] for s in storages if s['location']]))
+        cursor = db.cursor(dictionary=True)
+
+        # ยอดรวมของห้องอ่านจากตารางสรุป (แถวเดียวตาม primary key)
+        summary = read_summary(cursor, location_name)
+        page = _room_items_page(cursor, location_name)
         
-        return render_template('index.html', 
-            current_location=location_name,
-            items=items, total_items=total_items, low_stock=low_stock,
-            users=users, storages=storages, locations=locations,
-            chart_labels=[], low_stock_data=[], normal_stock_data=[], room_stats=[], borrow_count=0 
-        )
+        # รายชื่อผู้ใช้/ตู้/ห้อง สำหรับ dropdown มาจากแคช ไม่ต้องอ่านตารางทุกครั้ง
+        ref = get_reference_data()
+        return render_template('index.html', **_room_context(location_name, summary, page, ref))
     except Exception as e:
-        return f"Error Room: {e}"
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
+        return f"Error Room: {e}", 500
+
+def _room_context(location_name, summary, page, ref):
+    return dict(
+        current_location=location_name,
+        items=page['rows'], next_cursor=page['next_cursor'],
+        total_items=int(summary[0]['total_qty']) if summary else 0,
+        low_stock=int(summary[0]['low_count']) if summary else 0,
+        users=ref['users'], storages=ref['storages'], locations=ref['locations'], refdata_version=ref['version'],
+        chart_labels=[], low_stock_data=[], normal_stock_data=[], room_stats=[], borrow_count=0 
+    )
+
+@dashboard_bp.route('/api/room_items')
+def search_room_items():
+    db = get_db()
+    location = request.args.get('location', '')
+    if not location:
+        return jsonify({'error': 'location is required'}), 400
+    try:
+        page = _room_items_page(db.cursor(dictionary=True), location,
+            q=request.args.get('q', ''), after=request.args.get('after'), page_size=get_page_size())
+        items = [{
+            'item_id': r['item_id'], 'item_name': r['item_name'], 'quantity': r['quantity'],
+            'unit': r['unit'], 'storage_id': r['storage_id'], 'storage_name': r['storage_name'],
+            'reorder_level': r['reorder_level'], 'low_stock': is_low(r['quantity'], r['reorder_level']),
+        } for r in page['rows']]
+        return jsonify({'items': items, 'next_cursor': page['next_cursor']})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# รายการของที่ต่ำกว่าจุดสั่งซื้อ เรียงจากขาดมากสุดก่อน (range scan บน index ของ stock_gap)
+@dashboard_bp.route('/api/low_stock')
+def low_stock_items():
+    db = get_db()
+    location = request.args.get('location', '')
+    try:
+        query = f"""
+            SELECT i.item_id, i.item_name, i.quantity, i.unit, i.reorder_level, i.stock_gap,
+                   s.storage_name, s.location
+            FROM items i
+            JOIN storages s ON i.storage_id = s.storage_id
+            WHERE {LOW_STOCK_SQL}
+        """
+        params = []
+        if location:
+            query += " AND s.location = %s"
+            params.append(location)
+        page = keyset_page(db.cursor(dictionary=True), query, params,
+            keys=[('i.stock_gap', 'stock_gap'), ('i.item_id', 'item_id')],
+            page_size=get_page_size(), after=request.args.get('after'), descending=False)
+        items = [{
+            'item_id': r['item_id'], 'item_name': r['item_name'], 'quantity': r['quantity'], 'unit': r['unit'],
+            'reorder_level': r['reorder_level'], 'shortfall': -r['stock_gap'],
+            'storage_name': r['storage_name'], 'location': r['location'],
+        } for r in page['rows']]
+        return jsonify({'items': items, 'next_cursor': page['next_cursor']})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 # ======================
 # 3. ยืมพัสดุ (Borrow)
 # ======================
 @dashboard_bp.route('/borrow_item', methods=['POST'])
 def borrow_item():
-    conn, cursor = None, None
+    db = get_db()
     current_room = request.form.get('current_room')
     try:
         item_id = request.form.get('item_id')
         amount = int(request.form.get('amount', 1))
         user_id = request.form.get('user_id')
         note = request.form.get('note', '')
+        try:
+            due_date = parse_due_date(request.form.get('due_date'))
+        except LoanError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('dashboard.room_view', location_name=current_room) if current_room else url_for('dashboard.index'))
 
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        conn.start_transaction()
+        cursor = db.cursor(dictionary=True, prepared=True)
 
-        cursor.execute("SELECT quantity, item_name, unit FROM items WHERE item_id = %s FOR UPDATE", (item_id,))
-        item = cursor.fetchone()
+        def work():
+            item = take_stock(cursor, item_id, amount)
+            cursor.execute("""
+                INSERT INTO borrow_transactions (item_id, user_id, amount, note, borrow_date, due_date, status)
+                VALUES (%s, %s, %s, %s, %s, %s, 'borrowed')
+            """, (item_id, user_id, amount, note, datetime.now(), due_date))
+            level = item['reorder_level']
+            apply_item_changes(cursor, [(item['storage_id'], (item['quantity'] + amount, level), (item['quantity'], level))])
+            return item
 
-        if not item or item['quantity'] < amount:
-            flash('สต็อกไม่พอให้ยืม', 'error')
-            conn.rollback()
+        try:
+            item = run_in_transaction(db, work)
+        except StockError as e:
+            flash('สต็อกไม่พอให้ยืม' if e.shortages else str(e), 'error')
             return redirect(url_for('dashboard.room_view', location_name=current_room) if current_room else url_for('dashboard.index'))
 
-        cursor.execute("UPDATE items SET quantity = quantity - %s WHERE item_id = %s", (amount, item_id))
-        cursor.execute("""
-            INSERT INTO borrow_transactions (item_id, user_id, amount, note, borrow_date, status)
-            VALUES (%s, %s, %s, %s, %s, 'borrowed')
-        """, (item_id, user_id, amount, note, datetime.now()))
-
-        conn.commit()
+        invalidate_snapshot()
         flash(f"ยืม {item['item_name']} สำเร็จ", 'success')
     except Exception as e:
-        if conn: conn.rollback()
+        db.rollback()
         flash(f'เกิดข้อผิดพลาด: {e}', 'error')
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
 
     return redirect(url_for('dashboard.room_view', location_name=current_room) if current_room else url_for('dashboard.index'))
 
@@ -161,7 +205,7 @@ def borrow_item():
 # ======================
 @dashboard_bp.route('/return_item_confirm', methods=['POST'])
 def return_item_confirm():
-    conn, cursor = None, None
+    db = get_db()
     try:
         # 1. รับ ID จากฟอร์ม (หน้า Tracking ส่งมาในชื่อ 'borrow_id')
         record_id = request.form.get('borrow_id')
@@ -180,9 +224,8 @@ def return_item_confirm():
         item_condition = request.form.get('item_condition', 'ปกติ')
         return_note = request.form.get('return_note', '')
 
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        conn.start_transaction()
+        cursor = db.cursor(dictionary=True, prepared=True)
+        db.start_transaction()
 
         # 🌟 จุดแก้สำคัญ: เปลี่ยน borrow_id เป็น id ให้ตรงกับ Table ในรูปของคุณ
         cursor.execute("SELECT item_id, amount FROM borrow_transactions WHERE id = %s FOR UPDATE", (record_id,))
@@ -190,17 +233,19 @@ def return_item_confirm():
 
         if not record:
             flash('ไม่พบข้อมูลการยืมนี้', 'error')
-            conn.rollback()
+            db.rollback()
             return redirect(url_for('dashboard.tracking'))
             
         if return_amount > record['amount']:
             flash(f"คืนเกินจำนวน! (ยืมไป {record['amount']} ชิ้น)", 'error')
-            conn.rollback()
+            db.rollback()
             return redirect(url_for('dashboard.tracking'))
 
         # 3. คืนสต็อกพัสดุ
         item_id = record['item_id']
         cursor.execute("UPDATE items SET quantity = quantity + %s WHERE item_id = %s", (return_amount, item_id))
+        cursor.execute("SELECT storage_id, quantity, reorder_level FROM items WHERE item_id = %s", (item_id,))
+        returned = cursor.fetchone()
 
         # 4. อัปเดตสถานะการยืม
         remaining = record['amount'] - return_amount
@@ -215,244 +260,227 @@ def return_item_confirm():
             # กรณีคืนบางส่วน
             cursor.execute("UPDATE borrow_transactions SET amount = %s WHERE id = %s", (remaining, record_id))
 
-        conn.commit()
+        if returned:
+            level = returned['reorder_level']
+            apply_item_changes(cursor, [(returned['storage_id'], (returned['quantity'] - return_amount, level),
+                                         (returned['quantity'], level))])
+
+        db.commit()
+        invalidate_snapshot()
         flash('รับคืนพัสดุเรียบร้อย', 'success')
         
     except Exception as e:
-        if conn: conn.rollback()
+        db.rollback()
         print(f"Error Return: {e}")
         flash(f'เกิดข้อผิดพลาด: {e}', 'error')
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
         
     return redirect(url_for('dashboard.tracking'))
 
 # ======================
 # 5. หน้า Tracking
 # ======================
+# อ่านเฉพาะรายการที่ยังไม่คืนผ่าน index (is_open, due_date) ดู loans.py
+# มีป้ายเกินกำหนดที่ขึ้นกับวันที่ ETag จึงเปลี่ยนทุกวันด้วย
+TRACKING_SQL = f"""
+    SELECT {LOAN_COLUMNS} {LOAN_JOINS}
+    WHERE {OPEN_LOAN_SQL}
+    ORDER BY b.borrow_date DESC
+"""
+
+def _tracking_context(borrowing_list):
+    today = date.today()
+    overdue_count = sum(1 for loan in borrowing_list if is_overdue(loan, today))
+    return dict(borrowing_list=borrowing_list, today=today, overdue_count=overdue_count)
+
 @dashboard_bp.route('/tracking')
+@conditional_page(per_day=True)
 def tracking():
-    conn, cursor = None, None
+    db = get_db()
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT b.*, i.item_name, i.unit, u.fullname, u.department, s.storage_name, s.location
-            FROM borrow_transactions b
-            JOIN items i ON b.item_id = i.item_id
-            JOIN users u ON b.user_id = u.user_id
-            JOIN storages s ON i.storage_id = s.storage_id
-            WHERE b.status != 'returned'
-            ORDER BY b.borrow_date DESC
-        """)
-        borrowing_list = cursor.fetchall()
-        return render_template('tracking.html', borrowing_list=borrowing_list)
+        cursor = db.cursor(dictionary=True)
+        cursor.execute(TRACKING_SQL)
+        return render_template('tracking.html', **_tracking_context(cursor.fetchall()))
     except Exception as e:
-        return f"Error: {e}"
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
+        return f"Error: {e}", 500
+
+# ======================
+# 5.1 รายการค้างคืนเกินกำหนด
+# ======================
+@dashboard_bp.route('/overdue')
+@conditional_page(per_day=True)
+def overdue():
+    db = get_db()
+    try:
+        location = request.args.get('location', '')
+        today = date.today()
+        loans = get_overdue_loans(db.cursor(dictionary=True), today, location)
+        return render_template('overdue.html', loans=loans, today=today, location=location)
+    except Exception as e:
+        return f"Error: {e}", 500
 
 # ======================
 # 6. ประวัติการเบิก (History)
 # ======================
+HISTORY_KEYS = [('t.transaction_date', 'transaction_date'), ('t.transaction_id', 'transaction_id'), ('td.item_id', 'item_id')]
+
+def _history_query(location, start_date, end_date):
+    query = """
+        SELECT t.transaction_id, td.item_id, t.transaction_date, u.fullname, u.department, 
+               i.item_name, td.amount, i.unit, s.storage_name, s.location, t.status
+        FROM transactions t
+        JOIN transaction_details td ON t.transaction_id = td.transaction_id
+        JOIN items i ON td.item_id = i.item_id
+        JOIN users u ON t.user_id = u.user_id
+        JOIN storages s ON i.storage_id = s.storage_id
+        WHERE 1=1
+    """
+    params = []
+    if location:
+        query += " AND s.location = %s"
+        params.append(location)
+    return apply_date_range(query, params, 't.transaction_date', start_date, end_date), params
+
+def _history_filters():
+    return request.args.get('location', ''), request.args.get('start_date', ''), request.args.get('end_date', '')
+
 @dashboard_bp.route('/history')
+@conditional_page
 def history():
-    conn, cursor = None, None
+    db = get_db()
     try:
-        location = request.args.get('location', '')
-        start_date = request.args.get('start_date', '')
-        end_date = request.args.get('end_date', '')
+        location, start_date, end_date = _history_filters()
+        query, params = _history_query(location, start_date, end_date)
 
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        query = """
-            SELECT t.transaction_date, u.fullname, u.department, 
-                   i.item_name, td.amount, i.unit, s.storage_name, s.location, t.status
-            FROM transactions t
-            JOIN transaction_details td ON t.transaction_id = td.transaction_id
-            JOIN items i ON td.item_id = i.item_id
-            JOIN users u ON t.user_id = u.user_id
-            JOIN storages s ON i.storage_id = s.storage_id
-            WHERE 1=1
-        """
-        params = []
-        if location:
-            query += " AND s.location = %s"
-            params.append(location)
-            
-        query += " ORDER BY t.transaction_date DESC"
-        cursor.execute(query, tuple(params))
-        history_data = cursor.fetchall()
+        # ดึงทีละหน้าด้วย keyset (วันที่ + รหัสรายการ) แทนการ fetchall ทั้งตาราง
+        page = keyset_page(db.cursor(dictionary=True), query, params, keys=HISTORY_KEYS,
+            page_size=get_page_size(), after=request.args.get('after'), before=request.args.get('before'))
         
-        return render_template('history.html', history_data=history_data, location=location, start_date=start_date, end_date=end_date)
+        return render_template('history.html', history_data=page['rows'], page=page, location=location, start_date=start_date, end_date=end_date)
     except Exception as e:
         flash(f'ไม่สามารถโหลดประวัติได้: {e}', 'error')
         return render_template('history.html', history_data=[])
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
 
 # ======================
 # 7. ประวัติการยืม-คืน (Borrow History)
 # ======================
+BORROW_HISTORY_KEYS = [('b.borrow_date', 'borrow_date'), ('b.id', 'id')]
+
+def _borrow_history_query(location, start_date, end_date):
+    query = """
+        SELECT b.*, i.item_name, i.unit, u.fullname, u.department, s.storage_name, s.location
+        FROM borrow_transactions b
+        JOIN items i ON b.item_id = i.item_id
+        JOIN users u ON b.user_id = u.user_id
+        JOIN storages s ON i.storage_id = s.storage_id
+        WHERE 1=1
+    """
+    params = []
+    if location:
+        query += " AND s.location = %s"
+        params.append(location)
+    return apply_date_range(query, params, 'b.borrow_date', start_date, end_date), params
+
 @dashboard_bp.route('/borrow_history')
+@conditional_page
 def borrow_history():
-    conn, cursor = None, None
+    db = get_db()
     try:
-        location = request.args.get('location', '')
-        start_date = request.args.get('start_date', '')
-        end_date = request.args.get('end_date', '')
+        location, start_date, end_date = _history_filters()
+        query, params = _borrow_history_query(location, start_date, end_date)
 
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        page = keyset_page(db.cursor(dictionary=True), query, params, keys=BORROW_HISTORY_KEYS,
+            page_size=get_page_size(), after=request.args.get('after'), before=request.args.get('before'))
         
-        query = """
-            SELECT b.*, i.item_name, i.unit, u.fullname, u.department, s.storage_name, s.location
-            FROM borrow_transactions b
-            JOIN items i ON b.item_id = i.item_id
-            JOIN users u ON b.user_id = u.user_id
-            JOIN storages s ON i.storage_id = s.storage_id
-            WHERE 1=1
-        """
-        params = []
-        if location:
-            query += " AND s.location = %s"
-            params.append(location)
-            
-        query += " ORDER BY b.borrow_date DESC"
-        cursor.execute(query, tuple(params))
-        history = cursor.fetchall()
-        
-        return render_template('borrow_history.html', history=history, location=location, start_date=start_date, end_date=end_date)
+        return render_template('borrow_history.html', history=page['rows'], page=page, location=location, start_date=start_date, end_date=end_date)
     except Exception as e:
         flash(f'ไม่สามารถโหลดประวัติได้: {e}', 'error')
         return render_template('borrow_history.html', history=[])
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
 
 # ======================
-# 8. ส่งออก Excel ของในห้อง (Export Items)
+# ส่งออก CSV แบบ Streaming
 # ======================
-@dashboard_bp.route('/export_items')
-def export_items():
-    # รับค่าแบบเดียวกับประวัติ (History) เป๊ะๆ
-    location = request.args.get('location', '') 
+# อ่านจาก cursor แบบไม่บัฟเฟอร์ทีละ EXPORT_BATCH_SIZE แถว แล้วส่งออกเป็นก้อนๆ
+# หน่วยความจำต่อการ export คงที่ไม่ว่าข้อมูลจะมีกี่แถว และผู้ใช้ได้ไบต์แรกทันที
+EXPORT_BATCH_SIZE = 500
+
+def _csv_value(value):
+    # วันที่ในรายงานเป็น datetime (ไฟล์ Excel เก็บเป็นวันที่จริง) CSV แสดงแบบเดิม
+    if isinstance(value, datetime):
+        return value.strftime('%d/%m/%Y %H:%M')
+    return value
+
+def _stream_csv(conn, cursor, header, to_row, filename):
+    def generate():
+        si = StringIO()
+        si.write('\ufeff') # ใส่ BOM เพื่อให้ Excel อ่านภาษาไทยได้
+        writer = csv.writer(si)
+        writer.writerow(header)
+        yield si.getvalue().encode('utf-8')
+
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            si.seek(0)
+            si.truncate(0)
+            for row in rows:
+                writer.writerow([_csv_value(v) for v in to_row(row)])
+            yield si.getvalue().encode('utf-8')
+
+    def cleanup():
+        # ผู้ใช้กดยกเลิกกลางทาง ต้องอ่านผลที่ค้างทิ้งก่อนคืน connection เข้า pool
+        # อ่านไม่สำเร็จ (สายหลุด) ก็ต้องคืน pool อยู่ดี pool จะทิ้ง connection ที่ใช้ต่อไม่ได้เอง
+        try:
+            if conn.unread_result: conn.consume_results()
+            cursor.close()
+        finally:
+            conn.close()
+
+    response = Response(generate(), content_type="text/csv; charset=utf-8", headers={
+        "Content-Disposition": f"attachment; filename={filename}",
+        "X-Accel-Buffering": "no",
+    })
+    # ปิด connection เมื่อ server ส่ง response เสร็จ (หรือ client ตัดการเชื่อมต่อ)
+    response.call_on_close(cleanup)
+    return response
+
+# ======================
+# 8. ส่งออก CSV ของในห้อง (Export Items)
+# ======================
+# หน้าเว็บใช้รายงาน Excel เบื้องหลัง (routes/reports.py) แล้ว ลิงก์นี้ยังใช้ได้สำหรับสคริปต์/ผู้ที่ต้องการ CSV
+def _export_csv(kind, params, error_message, error_endpoint):
     conn, cursor = None, None
     try:
+        report = REPORT_TYPES[kind](params)
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        
-        # ตรวจสอบเงื่อนไขการกรองห้อง
-        if location and location != 'None' and location != '':
-            query = """
-                SELECT i.item_name, i.quantity, i.unit, s.storage_name, s.location 
-                FROM items i 
-                JOIN storages s ON i.storage_id = s.storage_id
-                WHERE s.location = %s
-                ORDER BY i.item_name ASC
-            """
-            cursor.execute(query, (location,))
-            filename = f"inventory_{location}.csv"
-        else:
-            # ถ้าอยู่หน้าแรก (ไม่มีค่า location) ให้ดึงทั้งหมด
-            query = """
-                SELECT i.item_name, i.quantity, i.unit, s.storage_name, s.location 
-                FROM items i 
-                JOIN storages s ON i.storage_id = s.storage_id
-                ORDER BY s.location ASC, i.item_name ASC
-            """
-            cursor.execute(query)
-            filename = "inventory_all.csv"
-            
-        items = cursor.fetchall()
-        
-        # สร้างไฟล์ CSV
-        si = StringIO()
-        si.write('\ufeff') # ใส่ BOM เพื่อให้ Excel อ่านภาษาไทยได้
-        writer = csv.writer(si)
-        writer.writerow(['ชื่อพัสดุ', 'จำนวนคงเหลือ', 'หน่วยนับ', 'ตู้เก็บ', 'ห้อง'])
-        
-        for item in items:
-            writer.writerow([item['item_name'], item['quantity'], item['unit'], item['storage_name'], item['location']])
-            
-        # ส่งไฟล์ออกไป
-        response = make_response(si.getvalue())
-        response.headers["Content-Disposition"] = f"attachment; filename={filename}"
-        response.headers["Content-type"] = "text/csv; charset=utf-8"
+        cursor.execute(report['query'], report['args'])
+        response = _stream_csv(conn, cursor, [title for title, _, _ in report['columns']],
+                               report['to_row'], f"{report['filename']}.csv")
+        # ส่งต่อ connection ให้ตัว stream เป็นคนปิดเมื่อส่งข้อมูลครบ
+        conn, cursor = None, None
         return response
     except Exception as e:
-        print(f"Export Items Error: {e}")
-        flash(f"โหลดข้อมูลพัสดุไม่สำเร็จ: {e}", "error")
-        return redirect(url_for('dashboard.index'))
+        print(f"Export Error ({kind}): {e}")
+        flash(f"{error_message}: {e}", "error")
+        return redirect(url_for(error_endpoint))
     finally:
         # 🌟 ปิดสายฐานข้อมูลเสมอ เพื่อไม่ให้เครื่องค้าง
         if cursor: cursor.close()
         if conn: conn.close()
 
+@dashboard_bp.route('/export_items')
+def export_items():
+    return _export_csv('items', {'location': request.args.get('location', '')},
+                       "โหลดข้อมูลพัสดุไม่สำเร็จ", 'dashboard.index')
+
 # ======================
-# 9. ส่งออก Excel ประวัติ (Export History)
+# 9. ส่งออก CSV ประวัติ (Export History)
 # ======================
 @dashboard_bp.route('/export_history')
 def export_history():
-    conn, cursor = None, None
-    try:
-        location = request.args.get('location', '')
-        start_date = request.args.get('start_date', '')
-        end_date = request.args.get('end_date', '')
-        
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        query = """
-            SELECT t.transaction_date, u.fullname, u.department, 
-                   i.item_name, td.amount, i.unit, s.storage_name, s.location, t.status
-            FROM transactions t
-            JOIN transaction_details td ON t.transaction_id = td.transaction_id
-            JOIN items i ON td.item_id = i.item_id
-            JOIN users u ON t.user_id = u.user_id
-            JOIN storages s ON i.storage_id = s.storage_id
-            WHERE 1=1
-        """
-        params = []
-        if location:
-            query += " AND s.location = %s"
-            params.append(location)
-        if start_date:
-            query += " AND DATE(t.transaction_date) >= %s"
-            params.append(start_date)
-        if end_date:
-            query += " AND DATE(t.transaction_date) <= %s"
-            params.append(end_date)
-            
-        query += " ORDER BY t.transaction_date DESC"
-        cursor.execute(query, tuple(params))
-        history_data = cursor.fetchall()
-        
-        si = StringIO()
-        si.write('\ufeff')
-        writer = csv.writer(si)
-        writer.writerow(['วัน-เวลาที่เบิก', 'ผู้เบิก', 'แผนก', 'รายการ', 'จำนวน', 'หน่วย', 'สถานที่เก็บ', 'สถานะ'])
-        
-        for row in history_data:
-            date_str = row['transaction_date'].strftime('%d/%m/%Y %H:%M') if row['transaction_date'] else ''
-            writer.writerow([
-                date_str, row['fullname'], row['department'], 
-                row['item_name'], row['amount'], row['unit'], 
-                f"{row['location']} - {row['storage_name']}", row['status']
-            ])
-            
-        return Response(
-            si.getvalue(),
-            mimetype="text/csv",
-            headers={"Content-Disposition": "attachment;filename=withdraw_history.csv"}
-        )
-    except Exception as e:
-        flash(f"โหลดประวัติไม่สำเร็จ: {e}", "error")
-        return redirect(url_for('dashboard.history'))
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
\ No newline at end of file
+    return _export_csv('history', {
+        'location': request.args.get('location', ''),
+        'start_date': request.args.get('start_date', ''),
+        'end_date': request.args.get('end_date', ''),
+    }, "โหลดประวัติไม่สำเร็จ", 'dashboard.history')
@@ -0,0 +1,79 @@
+from flask import render_template, request, flash
+from db_async import get_async_db
+from snapshot import get_dashboard_snapshot_async
+from refdata import get_reference_data_async
+from stock_summary import read_summary_async
+from pagination import get_page_size, keyset_page_async
+from data_version import conditional_page
+from routes.dashboard import (_index_context, _room_context, _room_items_query, ROOM_ITEM_KEYS, ROOM_PAGE_SIZE,
+                              TRACKING_SQL, _tracking_context, _history_filters,
+                              _history_query, HISTORY_KEYS, _borrow_history_query, BORROW_HISTORY_KEYS)
+
+# ======================
+# หน้าอ่านอย่างเดียวแบบ async (โหมด ASGI ดู asgi.py)
+# ======================
+# view ชุดเดียวกับ routes/dashboard.py (endpoint / template / query / ETag เดิมทุกอย่าง)
+# ต่างกันแค่อ่าน DB ผ่าน aiomysql (db_async.py) ระหว่างรอ DB worker จึงไปตอบ request อื่นได้
+# asgi.py เลือกใช้ view ในนี้ตามชื่อ endpoint ของ Flask ที่ match ได้ (ASYNC_VIEWS) ที่เหลือส่งต่อให้แอป WSGI เดิม
+
+@conditional_page
+async def index():
+    try:
+        db = get_async_db()
+        snapshot = await get_dashboard_snapshot_async(db)
+        ref = await get_reference_data_async(db)
+        return render_template('index.html', **_index_context(snapshot, ref))
+    except Exception as e:
+        return f"Database Error: กรุณาตรวจสอบการเชื่อมต่อฐานข้อมูล ({e})", 500
+
+@conditional_page
+async def room_view(location_name):
+    try:
+        db = get_async_db()
+        summary = await read_summary_async(db, location_name)
+        query, params = _room_items_query(location_name)
+        page = await keyset_page_async(db, query, params, keys=ROOM_ITEM_KEYS, page_size=ROOM_PAGE_SIZE, descending=False)
+        ref = await get_reference_data_async(db)
+        return render_template('index.html', **_room_context(location_name, summary, page, ref))
+    except Exception as e:
+        return f"Error Room: {e}", 500
+
+@conditional_page(per_day=True)
+async def tracking():
+    try:
+        borrowing_list = await get_async_db().fetchall(TRACKING_SQL)
+        return render_template('tracking.html', **_tracking_context(borrowing_list))
+    except Exception as e:
+        return f"Error: {e}", 500
+
+@conditional_page
+async def history():
+    try:
+        location, start_date, end_date = _history_filters()
+        query, params = _history_query(location, start_date, end_date)
+        page = await keyset_page_async(get_async_db(), query, params, keys=HISTORY_KEYS,
+            page_size=get_page_size(), after=request.args.get('after'), before=request.args.get('before'))
+        return render_template('history.html', history_data=page['rows'], page=page, location=location, start_date=start_date, end_date=end_date)
+    except Exception as e:
+        flash(f'ไม่สามารถโหลดประวัติได้: {e}', 'error')
+        return render_template('history.html', history_data=[])
+
+@conditional_page
+async def borrow_history():
+    try:
+        location, start_date, end_date = _history_filters()
+        query, params = _borrow_history_query(location, start_date, end_date)
+        page = await keyset_page_async(get_async_db(), query, params, keys=BORROW_HISTORY_KEYS,
+            page_size=get_page_size(), after=request.args.get('after'), before=request.args.get('before'))
+        return render_template('borrow_history.html', history=page['rows'], page=page, location=location, start_date=start_date, end_date=end_date)
+    except Exception as e:
+        flash(f'ไม่สามารถโหลดประวัติได้: {e}', 'error')
+        return render_template('borrow_history.html', history=[])
+
+ASYNC_VIEWS = {
+    'dashboard.index': index,
+    'dashboard.room_view': room_view,
+    'dashboard.tracking': tracking,
+    'dashboard.history': history,
+    'dashboard.borrow_history': borrow_history,
+}
@@ -1,64 +1,41 @@
-from flask import Blueprint, request, redirect, url_for, flash
-from db import get_db_connection
-import requests
-import os
+from flask import Blueprint, request, redirect, url_for, flash, render_template, jsonify
+from db import get_db
+from snapshot import invalidate_snapshot
+from notifier import enqueue_line_notify, wake_notifier
+from refdata import get_reference_data
+from bulk_import import run_import, BulkImportError, MODE_IMPORT, MODE_ADJUST
+from stock_summary import apply_item_changes, is_low, DEFAULT_REORDER_LEVEL
+from stock import take_stock, run_in_transaction, normalize_cart, withdraw_cart, StockError
 
 inventory_bp = Blueprint('inventory', __name__)
 
-# ======================
-# ระบบแจ้งเตือน LINE
-# ======================
-def send_line_notify(message):
-    LINE_ACCESS_TOKEN = os.environ.get("LINE_ACCESS_TOKEN")
-    LINE_USER_ID = os.environ.get("LINE_USER_ID")
-    
-    # ถ้าไม่ได้ใส่ Token ไว้ใน .env ให้ข้ามไปเลย ระบบจะได้ไม่พัง
-    if not LINE_ACCESS_TOKEN or not LINE_USER_ID:
-        return
-
-    url = 'https://api.line.me/v2/bot/message/push'
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {LINE_ACCESS_TOKEN}'
-    }
-    data = {
-        'to': LINE_USER_ID,
-        'messages': [{'type': 'text', 'text': message}]
-    }
-
-    try:
-        requests.post(url, headers=headers, json=data, timeout=5)
-    except Exception as e:
-        print(f"LINE Notify Error: {e}")
-
 # ======================
 # 1. เพิ่มพัสดุ (Add)
 # ======================
 @inventory_bp.route('/add_item', methods=['POST'])
 def add_item():
-    conn, cursor = None, None
+    db = get_db()
     current_room = request.form.get('current_room')
     try:
         name = request.form['item_name']
         quantity = request.form['quantity']
         unit = request.form['unit']
         storage_id = request.form['storage_id']
+        reorder_level = int(request.form.get('reorder_level') or DEFAULT_REORDER_LEVEL)
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         cursor.execute("""
-            INSERT INTO items (item_name, quantity, unit, storage_id) 
-            VALUES (%s, %s, %s, %s)
-        """, (name, quantity, unit, storage_id))
+            INSERT INTO items (item_name, quantity, unit, storage_id, reorder_level) 
+            VALUES (%s, %s, %s, %s, %s)
+        """, (name, quantity, unit, storage_id, reorder_level))
+        apply_item_changes(cursor, [(storage_id, None, (int(quantity), reorder_level))])
         
-        conn.commit()
+        db.commit()
+        invalidate_snapshot()
         flash(f'เพิ่มพัสดุ "{name}" สำเร็จ!', 'success')
     except Exception as e:
-        if conn: conn.rollback()
+        db.rollback()
         flash(f'เกิดข้อผิดพลาดในการเพิ่ม: {str(e)}', 'error')
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
             
     return redirect(url_for('dashboard.room_view', location_name=current_room) if current_room else url_for('dashboard.index'))
 
@@ -67,7 +44,7 @@ def add_item():
 # ======================
 @inventory_bp.route('/withdraw_item', methods=['POST'])
 def withdraw_item():
-    conn, cursor = None, None
+    db = get_db()
     current_room = request.form.get('current_room')
     try:
         item_id = request.form.get('item_id')
@@ -78,49 +55,48 @@ def withdraw_item():
             flash("ข้อมูลไม่ถูกต้อง หรือจำนวนต้องมากกว่า 0", "error")
             return redirect(url_for('dashboard.index'))
 
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        conn.start_transaction()
-
-        # 🌟 ล็อคสต็อกด้วย FOR UPDATE ป้องกันคนเบิกพร้อมกัน
-        cursor.execute("SELECT item_name, quantity, unit FROM items WHERE item_id = %s FOR UPDATE", (item_id,))
-        item = cursor.fetchone()
-
-        if not item or item['quantity'] < amount:
-            flash(f"เบิกไม่ได้! ของเหลือไม่พอ (คงเหลือ: {item['quantity'] if item else 0})", "error")
-            conn.rollback()
+        cursor = db.cursor(dictionary=True, prepared=True)
+
+        def work():
+            # ตัดสต็อกก่อนเป็นคำสั่งแรก (ดู stock.take_stock) ถ้าไม่พอจะ raise StockError
+            item = take_stock(cursor, item_id, amount)
+
+            # บันทึกประวัติการเบิก
+            cursor.execute("INSERT INTO transactions (user_id, status) VALUES (%s, 'อนุมัติแล้ว')", (user_id,))
+            transaction_id = cursor.lastrowid
+
+            cursor.execute("""
+                INSERT INTO transaction_details (transaction_id, item_id, amount) 
+                VALUES (%s, %s, %s)
+            """, (transaction_id, item_id, amount))
+
+            # แจ้งเตือน LINE ถ้าของใกล้หมด (ต่ำกว่าจุดสั่งซื้อของพัสดุชิ้นนั้น)
+            # แค่เขียนลงคิว outbox ใน transaction นี้ ตัวส่งจริงทำงานเบื้องหลังหลัง commit
+            new_qty = item['quantity']
+            if is_low(new_qty, item['reorder_level']):
+                cursor.execute("SELECT fullname FROM users WHERE user_id = %s", (user_id,))
+                user = cursor.fetchone()
+                user_name = user['fullname'] if user else "ไม่ระบุ"
+                msg = f"⚠️ แจ้งเตือนของใกล้หมด!\n📦 พัสดุ: {item['item_name']}\n📉 คงเหลือเพียง: {new_qty} {item['unit']}\n👤 ผู้เบิกล่าสุด: {user_name}"
+                enqueue_line_notify(cursor, msg)
+
+            level = item['reorder_level']
+            apply_item_changes(cursor, [(item['storage_id'], (new_qty + amount, level), (new_qty, level))])
+            return item
+
+        try:
+            item = run_in_transaction(db, work)
+        except StockError as e:
+            available = e.shortages[0]['available'] if e.shortages else 0
+            flash(f"เบิกไม่ได้! ของเหลือไม่พอ (คงเหลือ: {available})", "error")
             return redirect(url_for('dashboard.room_view', location_name=current_room) if current_room else url_for('dashboard.index'))
 
-        new_qty = item['quantity'] - amount
-
-        # บันทึกประวัติการเบิก
-        cursor.execute("INSERT INTO transactions (user_id, status) VALUES (%s, 'อนุมัติแล้ว')", (user_id,))
-        transaction_id = cursor.lastrowid
-        
-        cursor.execute("""
-            INSERT INTO transaction_details (transaction_id, item_id, amount) 
-            VALUES (%s, %s, %s)
-        """, (transaction_id, item_id, amount))
-
-        # ตัดสต็อก
-        cursor.execute("UPDATE items SET quantity = %s WHERE item_id = %s", (new_qty, item_id))
-
-        # ส่ง LINE แจ้งเตือนถ้าของใกล้หมด (เหลือน้อยกว่าหรือเท่ากับ 5)
-        if new_qty <= 5:
-            cursor.execute("SELECT fullname FROM users WHERE user_id = %s", (user_id,))
-            user = cursor.fetchone()
-            user_name = user['fullname'] if user else "ไม่ระบุ"
-            msg = f"⚠️ แจ้งเตือนของใกล้หมด!\n📦 พัสดุ: {item['item_name']}\n📉 คงเหลือเพียง: {new_qty} {item['unit']}\n👤 ผู้เบิกล่าสุด: {user_name}"
-            send_line_notify(msg)
-
-        conn.commit()
+        invalidate_snapshot()
+        wake_notifier()
         flash(f"เบิก {item['item_name']} จำนวน {amount} {item['unit']} เรียบร้อย!", 'success')
     except Exception as e:
-        if conn: conn.rollback()
+        db.rollback()
         flash(f'เกิดข้อผิดพลาด: {str(e)}', 'error')
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
 
     return redirect(url_for('dashboard.room_view', location_name=current_room) if current_room else url_for('dashboard.index'))
 
@@ -129,7 +105,7 @@ def withdraw_item():
 # ======================
 @inventory_bp.route('/update_item', methods=['POST'])
 def update_item():
-    conn, cursor = None, None
+    db = get_db()
     current_room = request.form.get('current_room')
     try:
         item_id = request.form['item_id']
@@ -138,22 +114,28 @@ def update_item():
         quantity = request.form['quantity']
         unit = request.form['unit']
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
+        db.start_transaction()
+        cursor.execute("SELECT storage_id, quantity, reorder_level FROM items WHERE item_id = %s FOR UPDATE", (item_id,))
+        old = cursor.fetchone()
+        # ฟอร์มเก่าที่ไม่มีช่องจุดสั่งซื้อ ใช้ค่าเดิมของพัสดุ
+        reorder_level = int(request.form.get('reorder_level') or (old[2] if old else DEFAULT_REORDER_LEVEL))
         cursor.execute("""
             UPDATE items 
-            SET item_name=%s, storage_id=%s, quantity=%s, unit=%s 
+            SET item_name=%s, storage_id=%s, quantity=%s, unit=%s, reorder_level=%s 
             WHERE item_id=%s
-        """, (item_name, storage_id, quantity, unit, item_id))
+        """, (item_name, storage_id, quantity, unit, reorder_level, item_id))
+        if old:
+            # ย้ายตู้ได้ จึงบันทึกเป็น "หายจากตู้เดิม" + "เพิ่มในตู้ใหม่"
+            apply_item_changes(cursor, [(old[0], (old[1], old[2]), None),
+                                        (storage_id, None, (int(quantity), reorder_level))])
         
-        conn.commit()
+        db.commit()
+        invalidate_snapshot()
         flash(f'แก้ไขข้อมูล "{item_name}" เรียบร้อย', 'success')
     except Exception as e:
-        if conn: conn.rollback()
+        db.rollback()
         flash(f'แก้ไขไม่สำเร็จ: {str(e)}', 'error')
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
     
     return redirect(url_for('dashboard.room_view', location_name=current_room) if current_room else url_for('dashboard.index'))
 
@@ -162,20 +144,104 @@ def update_item():
 # ======================
 @inventory_bp.route('/delete_item/<int:item_id>')
 def delete_item(item_id):
-    conn, cursor = None, None
+    db = get_db()
     current_room = request.args.get('current_room')
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
+        db.start_transaction()
+        cursor.execute("SELECT storage_id, quantity, reorder_level FROM items WHERE item_id = %s FOR UPDATE", (item_id,))
+        old = cursor.fetchone()
         cursor.execute("DELETE FROM items WHERE item_id = %s", (item_id,))
-        conn.commit()
+        if old:
+            apply_item_changes(cursor, [(old[0], (old[1], old[2]), None)])
+        db.commit()
+        invalidate_snapshot()
         flash('ลบพัสดุเรียบร้อยแล้ว', 'success')
     except Exception as e:
-        if conn: conn.rollback()
+        db.rollback()
         # ถ้าลบไม่ได้ มักจะติดประวัติการยืม/เบิก (Foreign Key)
         flash('ไม่สามารถลบได้ (อาจมีประวัติการเบิกหรือยืมของชิ้นนี้อยู่)', 'error')
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
         
-    return redirect(url_for('dashboard.room_view', location_name=current_room) if current_room else url_for('dashboard.index'))
\ No newline at end of file
+    return redirect(url_for('dashboard.room_view', location_name=current_room) if current_room else url_for('dashboard.index'))
+
+# ======================
+# 5. นำเข้าพัสดุ / ปรับยอดจากไฟล์ (Bulk Import)
+# ======================
+# mode=import  : เพิ่มพัสดุใหม่ ถ้าชื่อซ้ำในตู้เดิมจะอัปเดตจำนวน+หน่วยแทน
+# mode=adjust  : ตรวจนับสต็อก ตั้งจำนวนคงเหลือของพัสดุเดิม (อ้างอิงชื่อพัสดุ + ตู้)
+@inventory_bp.route('/import_items', methods=['POST'])
+def import_items():
+    db = get_db()
+    current_room = request.form.get('current_room')
+    mode = request.form.get('mode', MODE_IMPORT)
+    upload = request.files.get('file')
+
+    if mode not in (MODE_IMPORT, MODE_ADJUST) or not upload or not upload.filename:
+        flash('กรุณาเลือกไฟล์ .csv หรือ .xlsx', 'error')
+        return redirect(url_for('dashboard.room_view', location_name=current_room) if current_room else url_for('dashboard.index'))
+
+    try:
+        storages = get_reference_data()['storages']
+        report = run_import(db, upload, mode, storages)
+    except BulkImportError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('dashboard.room_view', location_name=current_room) if current_room else url_for('dashboard.index'))
+    except Exception as e:
+        db.rollback()
+        # ก้อนก่อนหน้าที่ commit ไปแล้วยังอยู่ ต้องให้หน้าจอ/ETag เห็นการเปลี่ยนแปลง
+        invalidate_snapshot()
+        flash(f'นำเข้าไม่สำเร็จ: {str(e)}', 'error')
+        return redirect(url_for('dashboard.room_view', location_name=current_room) if current_room else url_for('dashboard.index'))
+
+    if report['written']:
+        invalidate_snapshot()
+    return render_template('import_result.html', report=report, mode=mode,
+                           filename=upload.filename, current_location=current_room)
+
+# ======================
+# 6. เบิกหลายรายการในครั้งเดียว (ตะกร้าเบิก)
+# ======================
+# รับ JSON: {"user_id": 1, "items": [{"item_id": 3, "amount": 2}, ...]}
+# ล็อค/ตรวจ/ตัดสต็อกทุกรายการใน transaction เดียว ถ้ามีรายการไหนไม่พอจะไม่ตัดเลยสักรายการ
+@inventory_bp.route('/api/withdraw_cart', methods=['POST'])
+def withdraw_cart_api():
+    db = get_db()
+    payload = request.get_json(silent=True) or {}
+    user_id = payload.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+
+    try:
+        cart = normalize_cart(payload.get('items') or [])
+    except StockError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        cursor = db.cursor(dictionary=True)
+
+        def work():
+            transaction_id, lines, changes = withdraw_cart(cursor, user_id, cart)
+
+            # รวมของใกล้หมดทั้งตะกร้าเป็นข้อความแจ้งเตือนเดียว
+            low = [line for line in lines if line['low_stock']]
+            if low:
+                cursor.execute("SELECT fullname FROM users WHERE user_id = %s", (user_id,))
+                user = cursor.fetchone()
+                user_name = user['fullname'] if user else "ไม่ระบุ"
+                details = "\n".join(f"📦 {line['item_name']}: เหลือ {line['remaining']} {line['unit']}" for line in low)
+                enqueue_line_notify(cursor, f"⚠️ แจ้งเตือนของใกล้หมด!\n{details}\n👤 ผู้เบิกล่าสุด: {user_name}")
+
+            # อัปเดตตารางสรุปเป็นคำสั่งสุดท้ายก่อน commit (ดู stock_summary.py)
+            apply_item_changes(cursor, changes)
+            return transaction_id, lines
+
+        transaction_id, lines = run_in_transaction(db, work)
+        invalidate_snapshot()
+        wake_notifier()
+        return jsonify({'transaction_id': transaction_id, 'items': lines})
+    except StockError as e:
+        db.rollback()
+        return jsonify({'error': str(e), 'shortages': e.shortages}), 409
+    except Exception as e:
+        db.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,71 @@
+import os
+from flask import Blueprint, request, redirect, url_for, flash, render_template, jsonify, send_file
+from db import get_db
+from reports import REPORT_TYPES, enqueue_report, get_report_job, get_report_path, start_report_worker
+
+reports_bp = Blueprint('reports', __name__)
+
+# ค่าเริ่มต้นงานรายงานทำโดย process แยก (flask --app app report-worker, บรรทัด worker ใน Procfile)
+# REPORT_WORKER=1 = ไม่รัน process แยก ให้เว็บสร้างรายงานเองใน thread เบื้องหลัง (เริ่มเมื่อมีคนสั่งรายงาน)
+# เหมาะกับเครื่องเล็ก/ติดตั้งง่ายเท่านั้น ระหว่างสร้างรายงานจะแย่ง CPU กับ worker ที่รับ request
+REPORT_WORKER_INPROCESS = os.environ.get("REPORT_WORKER", "0") == "1"
+
+# ======================
+# สั่งสร้างรายงาน Excel (ทำเบื้องหลัง แล้วพาไปหน้าดูสถานะ)
+# ======================
+@reports_bp.route('/reports/<kind>', methods=['POST'])
+def create_report(kind):
+    if kind not in REPORT_TYPES:
+        flash('ไม่รู้จักรายงานชนิดนี้', 'error')
+        return redirect(url_for('dashboard.index'))
+
+    db = get_db()
+    try:
+        cursor = db.cursor()
+        job_id = enqueue_report(cursor, kind, {
+            'location': request.form.get('location', ''),
+            'start_date': request.form.get('start_date', ''),
+            'end_date': request.form.get('end_date', ''),
+        })
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        flash(f'สร้างรายงานไม่สำเร็จ: {str(e)}', 'error')
+        return redirect(request.referrer or url_for('dashboard.index'))
+
+    if REPORT_WORKER_INPROCESS:
+        start_report_worker()
+    return redirect(url_for('reports.report_status', job_id=job_id))
+
+@reports_bp.route('/reports/job/<int:job_id>')
+def report_status(job_id):
+    job = get_report_job(get_db().cursor(dictionary=True), job_id)
+    if not job:
+        flash('ไม่พบรายงานนี้', 'error')
+        return redirect(url_for('dashboard.index'))
+    return render_template('report_status.html', job=job)
+
+@reports_bp.route('/api/reports/<int:job_id>')
+def report_progress(job_id):
+    job = get_report_job(get_db().cursor(dictionary=True), job_id)
+    if not job:
+        return jsonify({'error': 'not found'}), 404
+    return jsonify({
+        'id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'row_count': job['row_count'],
+        'last_error': job['last_error'],
+        'download_url': url_for('reports.download_report', job_id=job_id) if job['status'] == 'done' else None,
+    })
+
+@reports_bp.route('/reports/job/<int:job_id>/download')
+def download_report(job_id):
+    job = get_report_job(get_db().cursor(dictionary=True), job_id)
+    path = get_report_path(job) if job else None
+    if not path:
+        flash('ไฟล์รายงานยังไม่พร้อม หรือหมดอายุแล้ว กรุณาสั่งสร้างใหม่', 'error')
+        return redirect(url_for('reports.report_status', job_id=job_id) if job else url_for('dashboard.index'))
+    # ไฟล์เสร็จสมบูรณ์แล้วไม่เปลี่ยนอีก ส่งด้วย send_file (รองรับ Range / ไม่ต้องอ่านทั้งไฟล์เข้าหน่วยความจำ)
+    return send_file(path, as_attachment=True, download_name=job['download_name'],
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from db import get_db
+from stock_summary import read_summary, read_summary_async
+from data_version import bump_data_version, get_data_version, get_data_version_async
+from loans import OPEN_LOAN_SQL
+
+# ======================
+# Snapshot ภาพรวมหน้าแรก (แคชใน process)
+# ======================
+# เก็บผลรวม/สถิติรายห้อง/ข้อมูลกราฟไว้ในหน่วยความจำ (รายชื่อ users/storages อยู่ใน refdata.py)
+# ตัวเลขรายห้องมาจากตาราง location_stock_summary จึงไม่ต้อง JOIN items ทั้งตารางแม้แคชหมดอายุ
+# หน้าแรกที่โหลดซ้ำจะไม่ต้องยิง DB เลย จนกว่าจะมีการแก้ไขข้อมูล (invalidate_snapshot)
+# snapshot ผูกกับเลขเวอร์ชันข้อมูล (data_version.py) worker อื่นที่เห็นเลขเปลี่ยนจะคำนวณใหม่เอง
+# TTL มีไว้กันข้อมูลค้างกรณียังไม่ได้รัน migration ของเลขเวอร์ชัน
+SNAPSHOT_TTL = int(os.environ.get("SNAPSHOT_TTL", 60))
+
+_lock = threading.Lock()
+_snapshot = None
+_snapshot_version = None
+_loaded_at = 0.0
+_generation = 0
+
+def invalidate_snapshot():
+    # เรียกหลัง commit ของทุก route ที่แก้ข้อมูล
+    global _snapshot, _generation
+    with _lock:
+        _snapshot = None
+        _generation += 1
+    bump_data_version()
+
+# นับผ่าน index ของรายการที่ยังไม่คืน (loans.py) ไม่ไล่ประวัติการยืมทั้งหมด
+BORROW_COUNT_SQL = f"SELECT COUNT(*) as borrowed FROM borrow_transactions b WHERE {OPEN_LOAN_SQL}"
+
+def get_dashboard_snapshot():
+    version = get_data_version()
+    snapshot, generation = _cached_snapshot(version)
+    if snapshot is not None:
+        return snapshot
+
+    cursor = get_db().cursor(dictionary=True, prepared=True)
+    rows = read_summary(cursor)
+    cursor.execute(BORROW_COUNT_SQL)
+    return _store_snapshot(_build_snapshot(rows, cursor.fetchone()['borrowed']), version, generation)
+
+async def get_dashboard_snapshot_async(db):
+    # แคชชุดเดียวกับ get_dashboard_snapshot แต่อ่าน DB ผ่าน AsyncDbSession (โหมด ASGI)
+    version = await get_data_version_async()
+    snapshot, generation = _cached_snapshot(version)
+    if snapshot is not None:
+        return snapshot
+
+    rows = await read_summary_async(db)
+    borrowed = await db.fetchone(BORROW_COUNT_SQL)
+    return _store_snapshot(_build_snapshot(rows, borrowed['borrowed']), version, generation)
+
+def _cached_snapshot(version):
+    with _lock:
+        if _snapshot is not None and _snapshot_version == version and time.monotonic() - _loaded_at < SNAPSHOT_TTL:
+            return _snapshot, _generation
+        return None, _generation
+
+def _store_snapshot(snapshot, version, generation):
+    global _snapshot, _snapshot_version, _loaded_at
+    # เลขเวอร์ชันที่อ่านก่อนคำนวณ ใช้เป็น key ของ fragment cache (room cards)
+    snapshot['data_version'] = version
+
+    with _lock:
+        # ถ้ามีการแก้ไขข้อมูลระหว่างที่กำลังคำนวณ อย่าเก็บผลเก่าลงแคช
+        if generation == _generation:
+            _snapshot = snapshot
+            _snapshot_version = version
+            _loaded_at = time.monotonic()
+    return snapshot
+
+def _build_snapshot(rows, borrow_count):
+    # สถิติรายห้อง ข้อมูลกราฟ และยอดรวม อ่านจากตารางสรุปรายห้อง (stock_summary.py) แถวละห้อง
+    room_stats = []
+    chart_labels = []
+    low_stock_data = []
+    normal_stock_data = []
+    total_items = 0
+    low_stock = 0
+
+    for r in rows:
+        low_count = int(r['low_count'] or 0)
+        normal_count = int(r['normal_count'] or 0)
+        total_items += int(r['total_qty'] or 0)
+        low_stock += low_count
+
+        room_stats.append({
+            'location': r['location'],
+            'item_count': r['item_count'],
+            'storage_count': r['storage_count'],
+        })
+        if r['location']:
+            chart_labels.append(r['location'])
+            low_stock_data.append(low_count)
+            normal_stock_data.append(normal_count)
+
+    return {
+        'total_items': total_items,
+        'low_stock': low_stock,
+        'borrow_count': borrow_count or 0,
+        'room_stats': room_stats,
+        'chart_labels': chart_labels,
+        'low_stock_data': low_stock_data,
+        'normal_stock_data': normal_stock_data,
+    }
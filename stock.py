@@ -0,0 +1,140 @@
+import os
+import random
+import time
+from mysql.connector import errorcode
+from stock_summary import is_low
+
+# ======================
+# ตัดสต็อกรายการเดียว (เบิก / ยืม)
+# ======================
+# STOCK_DECREMENT=atomic (ค่าเริ่มต้น): UPDATE แบบมีเงื่อนไขคำสั่งเดียว
+#   UPDATE items SET quantity = quantity - n WHERE item_id = x AND quantity >= n
+#   แล้วดูจำนวนแถวที่ถูกแก้ (0 = ของไม่พอ) ไม่ต้อง SELECT ... FOR UPDATE ก่อน
+#   ของยอดฮิต (กระดาษ/หมึก) จึงไม่ต้องต่อคิวล็อคนานเท่าเดิม
+# STOCK_DECREMENT=locking: แบบเดิม ล็อคแถวด้วย FOR UPDATE แล้วค่อย UPDATE
+# ทั้งสองแบบ transaction ที่ชน deadlock / lock wait timeout จะถูกลองใหม่ได้ไม่เกิน STOCK_RETRIES ครั้ง
+STOCK_DECREMENT = os.environ.get("STOCK_DECREMENT", "atomic")
+STOCK_RETRIES = int(os.environ.get("STOCK_RETRIES", 3))
+RETRYABLE_ERRORS = (errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT)
+
+class StockError(Exception):
+    def __init__(self, message, shortages=None):
+        super().__init__(message)
+        self.shortages = shortages or []
+
+def take_stock(cursor, item_id, amount, strategy=None):
+    # ตัดสต็อกแล้วคืน item (item_name, unit, storage_id, reorder_level, quantity = ยอดหลังตัด) ถ้าไม่พอจะ raise StockError
+    # ผู้เรียกต้องอัปเดตตารางสรุปเอง (apply_item_changes) เป็นคำสั่งท้ายๆ ก่อน commit
+    # ต้องเรียกเป็นคำสั่งแรกของ transaction: ถ้า INSERT รายการที่อ้าง FK มาที่ items ก่อน
+    # จะได้ shared lock บนแถวเดียวกัน แล้วสอง transaction ที่รอ upgrade เป็น X lock จะ deadlock กัน
+    if amount <= 0:
+        raise StockError('จำนวนต้องมากกว่า 0')
+
+    if (strategy or STOCK_DECREMENT) == 'locking':
+        cursor.execute("SELECT item_name, quantity, unit, storage_id, reorder_level FROM items WHERE item_id = %s FOR UPDATE", (item_id,))
+        item = cursor.fetchone()
+        if not item or item['quantity'] < amount:
+            raise StockError('ของเหลือไม่พอ', [_shortage(item_id, item, amount)])
+        cursor.execute("UPDATE items SET quantity = quantity - %s WHERE item_id = %s", (amount, item_id))
+        return dict(item, quantity=item['quantity'] - amount)
+
+    cursor.execute("UPDATE items SET quantity = quantity - %s WHERE item_id = %s AND quantity >= %s",
+                   (amount, item_id, amount))
+    updated = cursor.rowcount
+    # แถวนี้ถูกล็อคโดย UPDATE ข้างบนแล้ว (หรือไม่พอ) อ่านแบบธรรมดาก็เห็นยอดล่าสุด
+    cursor.execute("SELECT item_name, quantity, unit, storage_id, reorder_level FROM items WHERE item_id = %s", (item_id,))
+    item = cursor.fetchone()
+    if updated != 1:
+        raise StockError('ของเหลือไม่พอ', [_shortage(item_id, item, amount)])
+    return item
+
+def _shortage(item_id, item, amount):
+    return {
+        'item_id': item_id,
+        'item_name': item['item_name'] if item else None,
+        'requested': amount,
+        'available': item['quantity'] if item else 0,
+    }
+
+def run_in_transaction(db, work, retries=None):
+    # เรียก work() ใน transaction แล้ว commit; ชน deadlock / lock wait timeout จะ rollback แล้วลองใหม่
+    retries = STOCK_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            db.start_transaction()
+            result = work()
+            db.commit()
+            return result
+        except Exception as e:
+            db.rollback()
+            if getattr(e, 'errno', None) not in RETRYABLE_ERRORS or attempt == retries:
+                raise
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+
+# ======================
+# ตัดสต็อกหลายรายการในครั้งเดียว (ตะกร้าเบิก)
+# ======================
+# ใช้ร่วมกันระหว่าง route (/api/withdraw_cart) และสคริปต์ bench
+# ผู้เรียกเป็นคนเปิด/commit/rollback transaction เอง ฟังก์ชันนี้แค่ยิง SQL ภายใน transaction
+# - ล็อคทุกแถวด้วย SELECT ... FOR UPDATE คำสั่งเดียว เรียงตาม item_id เสมอ
+#   ทุกตะกร้าจึงล็อคตามลำดับเดียวกัน ไม่เกิด deadlock ระหว่างตะกร้าที่มีของซ้ำกัน
+# - บันทึกหัวเอกสาร 1 แถว + รายการด้วย executemany แล้วตัดสต็อกด้วย executemany
+# - คืน changes ให้ผู้เรียกส่งต่อ apply_item_changes เป็นคำสั่งสุดท้ายก่อน commit
+#   (หลังงานอื่นใน transaction เช่นเขียนคิวแจ้งเตือน) แถวสรุปของห้องจะได้ถูกล็อคสั้นที่สุด
+def normalize_cart(lines):
+    # รวมรายการที่ item_id ซ้ำกัน แล้วเรียงตาม item_id (ลำดับการล็อค)
+    amounts = {}
+    for line in lines:
+        try:
+            item_id = int(line['item_id'])
+            amount = int(line['amount'])
+        except (KeyError, TypeError, ValueError):
+            raise StockError('รายการในตะกร้าไม่ถูกต้อง')
+        if amount <= 0:
+            raise StockError('จำนวนต้องมากกว่า 0')
+        amounts[item_id] = amounts.get(item_id, 0) + amount
+    if not amounts:
+        raise StockError('ตะกร้าว่าง')
+    return sorted(amounts.items())
+
+def withdraw_cart(cursor, user_id, cart):
+    # cursor ต้องเป็น dictionary cursor; cart มาจาก normalize_cart
+    item_ids = [item_id for item_id, _ in cart]
+    placeholders = ', '.join(['%s'] * len(item_ids))
+    cursor.execute(f"""
+        SELECT item_id, item_name, quantity, unit, storage_id, reorder_level FROM items
+        WHERE item_id IN ({placeholders})
+        ORDER BY item_id
+        FOR UPDATE
+    """, tuple(item_ids))
+    items = {row['item_id']: row for row in cursor.fetchall()}
+
+    shortages = [_shortage(item_id, items.get(item_id), amount) for item_id, amount in cart
+                 if item_id not in items or items[item_id]['quantity'] < amount]
+    if shortages:
+        raise StockError('ของเหลือไม่พอ', shortages)
+
+    cursor.execute("INSERT INTO transactions (user_id, status) VALUES (%s, 'อนุมัติแล้ว')", (user_id,))
+    transaction_id = cursor.lastrowid
+
+    cursor.executemany("""
+        INSERT INTO transaction_details (transaction_id, item_id, amount)
+        VALUES (%s, %s, %s)
+    """, [(transaction_id, item_id, amount) for item_id, amount in cart])
+    cursor.executemany("UPDATE items SET quantity = quantity - %s WHERE item_id = %s",
+                       [(amount, item_id) for item_id, amount in cart])
+
+    lines, changes = [], []
+    for item_id, amount in cart:
+        item = items[item_id]
+        lines.append({
+            'item_id': item_id,
+            'item_name': item['item_name'],
+            'amount': amount,
+            'unit': item['unit'],
+            'remaining': item['quantity'] - amount,
+            'low_stock': is_low(item['quantity'] - amount, item['reorder_level']),
+        })
+        changes.append((item['storage_id'], (item['quantity'], item['reorder_level']),
+                        (item['quantity'] - amount, item['reorder_level'])))
+    return transaction_id, lines, changes
@@ -0,0 +1,189 @@
+from collections import defaultdict
+from mysql.connector import errorcode
+from db import get_db_connection
+
+# ======================
+# นิยาม "ของใกล้หมด" (ใช้ที่เดียวทั้งระบบ: ตัวเลขหน้าแรก, กราฟ, สีในตาราง, แจ้งเตือน LINE, /api/low_stock)
+# ======================
+# พัสดุแต่ละชิ้นมีจุดสั่งซื้อ (items.reorder_level) ของตัวเอง ใกล้หมดเมื่อ quantity < reorder_level
+# ในฐานข้อมูลมีคอลัมน์ stock_gap = quantity - reorder_level (generated + index)
+# เงื่อนไข stock_gap < 0 จึงเป็นการ range scan บน index แทนการสแกนทั้งตาราง
+DEFAULT_REORDER_LEVEL = 10
+LOW_STOCK_SQL = "i.stock_gap < 0"
+
+def is_low(quantity, reorder_level):
+    return quantity < reorder_level
+
+# ======================
+# ตารางสรุปสต็อกรายห้อง (location_stock_summary)
+# ======================
+# หน้าแรก/หน้าห้องอ่านตัวเลขจากตารางนี้ (1 แถวต่อห้อง) แทนการ JOIN items ทั้งตาราง
+# - route ที่แก้ items เรียก apply_item_changes(cursor, [(storage_id, สถานะเดิม, สถานะใหม่)])
+#   ใน transaction เดียวกัน สถานะคือ (quantity, reorder_level) หรือ None = ไม่มีแถวนั้น (เพิ่มใหม่/ลบทิ้ง)
+#   ระบบคำนวณส่วนต่างแล้วบวกเข้าไป
+# - แถวสรุปของห้องจะถูกล็อคตั้งแต่ upsert จนกว่าจะ commit การเบิกของคนละชิ้นในห้องเดียวกันจึงต่อคิวกันที่แถวนี้
+#   ทุก path ต้องเรียกเป็นคำสั่งสุดท้ายก่อน commit (หลังเขียนประวัติ/คิวแจ้งเตือน) ให้ช่วงที่ถือล็อคเหลือแค่ round trip ของ COMMIT
+#   ต่างห้องกันไม่ชนกัน ส่วนในห้องเดียวกันยังต่อคิวกันอยู่ (ยอมรับได้ที่ปริมาณการเบิกระดับนี้)
+#   ทางเลือกคือเขียนส่วนต่างลงตารางแบบ append-only แล้วรวมเป็นระยะ: ไม่มีแถวร้อน แต่หน้าแรกต้องบวกส่วนต่างที่ค้างทุกครั้ง
+#   และต้องมีงานเบื้องหลังอีกตัว จึงยังไม่เลือกใช้
+# - การจัดการตู้/ห้อง (นานๆ ครั้ง) ใช้ refresh_locations คำนวณใหม่เฉพาะห้องที่เกี่ยวข้อง
+# - ตรวจ/ซ่อมข้อมูลที่เพี้ยน: flask --app app verify-summary [--fix], flask --app app rebuild-summary
+
+SUMMARY_COLUMNS = ('storage_count', 'item_count', 'total_qty', 'low_count', 'normal_count')
+
+SUMMARY_SQL = """
+    SELECT s.location,
+           COUNT(DISTINCT s.storage_id) as storage_count,
+           COUNT(i.item_id) as item_count,
+           COALESCE(SUM(i.quantity), 0) as total_qty,
+           COALESCE(SUM(CASE WHEN i.item_id IS NOT NULL AND {low} THEN 1 ELSE 0 END), 0) as low_count,
+           COALESCE(SUM(CASE WHEN i.item_id IS NOT NULL AND NOT {low} THEN 1 ELSE 0 END), 0) as normal_count
+    FROM storages s
+    LEFT JOIN items i ON s.storage_id = i.storage_id
+    WHERE s.location IS NOT NULL {where}
+    GROUP BY s.location
+"""
+
+_UPSERT_SQL = """
+    INSERT INTO location_stock_summary (location, storage_count, item_count, total_qty, low_count, normal_count)
+    {source}
+    ON DUPLICATE KEY UPDATE
+        storage_count = storage_count + VALUES(storage_count),
+        item_count = item_count + VALUES(item_count),
+        total_qty = total_qty + VALUES(total_qty),
+        low_count = low_count + VALUES(low_count),
+        normal_count = normal_count + VALUES(normal_count)
+"""
+
+def _summary_query(locations=None):
+    params = []
+    where = ''
+    if locations:
+        where = f"AND s.location IN ({', '.join(['%s'] * len(locations))})"
+        params.extend(locations)
+    return SUMMARY_SQL.format(where=where, low=LOW_STOCK_SQL), tuple(params)
+
+def _item_delta(before, after):
+    # ส่วนต่าง (item_count, total_qty, low_count, normal_count) ของพัสดุ 1 แถว
+    def counts(state):
+        if state is None:
+            return 0, 0, 0, 0
+        quantity, reorder_level = state
+        low = is_low(quantity, reorder_level)
+        return 1, quantity, int(low), int(not low)
+    old, new = counts(before), counts(after)
+    return tuple(n - o for n, o in zip(new, old))
+
+_ITEM_UPSERT_SQL = _UPSERT_SQL.format(source="""
+    SELECT location, 0, %s, %s, %s, %s FROM storages WHERE storage_id = %s AND location IS NOT NULL
+""")
+
+def apply_item_changes(cursor, changes):
+    # changes: [(storage_id, (quantity, reorder_level) หรือ None, (quantity, reorder_level) หรือ None), ...]
+    # รวมเป็นคำสั่งเดียวต่อตู้ (เรียงตาม storage_id ให้ล็อคแถวสรุปตามลำดับเดียวกันทุก transaction)
+    # ใช้ execute ทีละตู้ ไม่ใช่ executemany: cursor ธรรมดาของ mysql-connector จะพยายามรวม INSERT
+    # เป็นคำสั่งหลายแถว แล้วพังกับ INSERT ... SELECT ... VALUES(col) (Failed rewriting statement)
+    totals = defaultdict(lambda: [0, 0, 0, 0])
+    for storage_id, before, after in changes:
+        for i, d in enumerate(_item_delta(before, after)):
+            totals[int(storage_id)][i] += d
+    for storage_id, delta in sorted(totals.items()):
+        if any(delta):
+            cursor.execute(_ITEM_UPSERT_SQL, (*delta, storage_id))
+
+def apply_storage_added(cursor, location):
+    cursor.execute(_UPSERT_SQL.format(source="SELECT %s, 1, 0, 0, 0, 0"), (location,))
+
+def refresh_locations(cursor, locations):
+    # คำนวณแถวสรุปของห้องที่ระบุใหม่จากตารางจริง (ห้องที่ไม่มีตู้เหลือแล้วจะถูกลบแถวทิ้ง)
+    locations = sorted({loc for loc in locations if loc})
+    if not locations:
+        return
+    placeholders = ', '.join(['%s'] * len(locations))
+    cursor.execute(f"DELETE FROM location_stock_summary WHERE location IN ({placeholders})", tuple(locations))
+    query, params = _summary_query(locations)
+    cursor.execute(f"""
+        INSERT INTO location_stock_summary (location, {', '.join(SUMMARY_COLUMNS)})
+        {query}
+    """, params)
+
+def _read_summary_query(location):
+    where, params = ('WHERE location = %s', (location,)) if location is not None else ('', ())
+    return f"""
+        SELECT location, {', '.join(SUMMARY_COLUMNS)}
+        FROM location_stock_summary {where}
+        ORDER BY location
+    """, params
+
+def _live_summary_query(location):
+    query, params = _summary_query([location] if location is not None else None)
+    return query + " ORDER BY s.location", params
+
+def read_summary(cursor, location=None):
+    # cursor ต้องเป็น dictionary cursor; ถ้ายังไม่ได้รัน migration จะคำนวณสดจาก items แทน
+    try:
+        cursor.execute(*_read_summary_query(location))
+        return cursor.fetchall()
+    except Exception as e:
+        if getattr(e, 'errno', None) != errorcode.ER_NO_SUCH_TABLE:
+            raise
+    cursor.execute(*_live_summary_query(location))
+    return cursor.fetchall()
+
+async def read_summary_async(db, location=None):
+    # เหมือน read_summary แต่อ่านผ่าน AsyncDbSession (โหมด ASGI)
+    try:
+        return await db.fetchall(*_read_summary_query(location))
+    except Exception as e:
+        # PyMySQL เก็บรหัส error ไว้ใน args[0]
+        if (e.args[:1] or (None,))[0] != errorcode.ER_NO_SUCH_TABLE:
+            raise
+    return await db.fetchall(*_live_summary_query(location))
+
+# ======================
+# ตรวจสอบ / สร้างตารางสรุปใหม่ (ใช้จากคำสั่ง flask)
+# ======================
+def verify_summary(fix=False):
+    # คืนค่ารายการห้องที่ตัวเลขไม่ตรง [(location, ค่าที่ควรเป็น, ค่าในตาราง), ...]
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        query, params = _summary_query()
+        cursor.execute(query, params)
+        expected = {r['location']: tuple(int(r[c]) for c in SUMMARY_COLUMNS) for r in cursor.fetchall()}
+        cursor.execute(f"SELECT location, {', '.join(SUMMARY_COLUMNS)} FROM location_stock_summary")
+        actual = {r['location']: tuple(int(r[c]) for c in SUMMARY_COLUMNS) for r in cursor.fetchall()}
+
+        drift = [(loc, expected.get(loc), actual.get(loc))
+                 for loc in sorted(set(expected) | set(actual)) if expected.get(loc) != actual.get(loc)]
+        if fix and drift:
+            refresh_locations(cursor, [loc for loc, _, _ in drift])
+            conn.commit()
+        cursor.close()
+        return drift
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def rebuild_summary():
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        conn.start_transaction()
+        cursor.execute("DELETE FROM location_stock_summary")
+        query, params = _summary_query()
+        cursor.execute(f"""
+            INSERT INTO location_stock_summary (location, {', '.join(SUMMARY_COLUMNS)})
+            {query}
+        """, params)
+        rows = cursor.rowcount
+        conn.commit()
+        cursor.close()
+        return rows
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,9 @@
+// ใช้กับ Tailwind standalone CLI (v3) ผ่าน flask --app app build-assets
+// สแกน class จาก templates (รวมสคริปต์ที่สร้างแถวตารางใน template) เหลือเฉพาะ class ที่ใช้จริง
+module.exports = {
+  content: ['./templates/**/*.html'],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+}
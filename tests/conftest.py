@@ -0,0 +1,154 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from mysql.connector.connection import MySQLConnection
+from mysql.connector.conversion import MySQLConverter
+
+# โมดูลของแอปอยู่ที่รากของโปรเจกต์ (ไม่ได้เป็น package)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class RecordingConnection(MySQLConnection):
+    # connection ของ mysql-connector ตัวจริงที่ไม่ได้ต่อ server: เก็บ SQL ที่จะถูกส่งไว้ใน sent
+    # ใช้คู่กับ MySQLCursor ธรรมดา เพื่อให้ผ่านขั้นตอนแปลง/รวมคำสั่งฝั่ง client จริงๆ
+    def __init__(self):
+        super().__init__()
+        self.converter = MySQLConverter('utf8mb4', True)
+        self._sql_mode = ''
+        self.sent = []
+
+    def handle_unread_result(self, *args, **kwargs):
+        pass
+
+    def is_connected(self):
+        return True
+
+    def cmd_query(self, query, *args, **kwargs):
+        self.sent.append(query.decode('utf-8') if isinstance(query, bytes) else query)
+        return {'affected_rows': 1, 'insert_id': 0, 'warning_count': 0, 'server_status': 0}
+
+
+@pytest.fixture
+def recording_connection():
+    return RecordingConnection()
+
+
+class FakeCursor:
+    def __init__(self, conn, dictionary=False):
+        self.conn = conn
+        self.dictionary = dictionary
+        self.rows = []
+        self.rowcount = 0
+        self.lastrowid = 1
+
+    def execute(self, operation, params=None):
+        sql = ' '.join(operation.split())
+        self.conn.log.append((sql, params))
+        result = self.conn.handler(sql, params)
+        if isinstance(result, Exception):
+            raise result
+        if isinstance(result, int):
+            self.rows, self.rowcount = [], result
+        else:
+            self.rows = list(result or [])
+            self.rowcount = len(self.rows)
+
+    def executemany(self, operation, seq_params):
+        for params in seq_params:
+            self.execute(operation, params)
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchmany(self, size=1):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    # connection ปลอมแบบสคริปต์: handler(sql, params) คืนแถว (list), จำนวนแถวที่แก้ (int) หรือ exception ที่จะ raise
+    # ทุกคำสั่งรวมถึง COMMIT / ROLLBACK ถูกเก็บไว้ใน log ตามลำดับ
+    def __init__(self, handler):
+        self.handler = handler
+        self.log = []
+        self.unread_result = False
+        self.in_transaction = False
+
+    def cursor(self, dictionary=False, prepared=False, **kwargs):
+        return FakeCursor(self, dictionary)
+
+    def start_transaction(self, *args, **kwargs):
+        self.log.append(('START TRANSACTION', None))
+
+    def commit(self):
+        self.log.append(('COMMIT', None))
+
+    def rollback(self):
+        self.log.append(('ROLLBACK', None))
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self.log.append(('CLOSE', None))
+
+    def statements(self):
+        return [sql for sql, _ in self.log]
+
+
+class StubLineServer:
+    # LINE push API ปลอมบน localhost: ตอบตาม responses ที่ตั้งไว้ทีละอัน (หมดแล้วตอบ 200)
+    # requests เก็บ (headers, body ที่เป็น dict) ของทุกครั้งที่ถูกยิง
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                stub.requests.append((dict(self.headers), json.loads(body)))
+                status, headers = stub.responses.pop(0) if stub.responses else (200, {})
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v2/bot/message/push"
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+
+    def messages(self):
+        return [[m['text'] for m in body['messages']] for _, body in self.requests]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def line_stub(monkeypatch):
+    import notifier
+    stub = StubLineServer()
+    monkeypatch.setattr(notifier, 'LINE_API_URL', stub.url)
+    monkeypatch.setattr(notifier, '_rate_limiter', notifier.TokenBucket(1000, 1000))
+    monkeypatch.setenv('LINE_ACCESS_TOKEN', 'test-token')
+    yield stub
+    stub.close()
@@ -0,0 +1,33 @@
+import io
+
+from werkzeug.datastructures import FileStorage
+
+from bulk_import import run_import, MODE_IMPORT
+from tests.conftest import FakeConnection
+
+STORAGES = [{'storage_id': 7, 'storage_name': 'ตู้ A', 'location': 'ห้อง 101'}]
+
+
+def upload(text):
+    return FileStorage(stream=io.BytesIO(text.encode('utf-8')), filename='items.csv')
+
+
+def test_non_finite_numbers_are_row_errors():
+    conn = FakeConnection(lambda sql, params: [])
+    report = run_import(conn, upload(
+        "ชื่อพัสดุ,จำนวนคงเหลือ,หน่วยนับ,ตู้เก็บ,ห้อง,จุดสั่งซื้อ\n"
+        "ปากกา,nan,ด้าม,ตู้ A,ห้อง 101,\n"
+        "ดินสอ,inf,แท่ง,ตู้ A,ห้อง 101,\n"
+        "ยางลบ,1e400,ก้อน,ตู้ A,ห้อง 101,\n"
+        "ไม้บรรทัด,5,อัน,ตู้ A,ห้อง 101,-inf\n"
+        "กรรไกร,3000000000,อัน,ตู้ A,ห้อง 101,\n"
+        "เทปใส,4,ม้วน,ตู้ A,ห้อง 101,2\n"
+    ), MODE_IMPORT, STORAGES)
+
+    assert report['processed'] == 6
+    assert report['written'] == 1
+    assert [e['line'] for e in report['errors']] == [2, 3, 4, 5, 6]
+    assert '"nan"' in report['errors'][0]['message']
+    assert '"-inf"' in report['errors'][3]['message']
+    inserted = [params for sql, params in conn.log if sql.startswith('INSERT INTO items')]
+    assert inserted == [('เทปใส', 4, 'ม้วน', 7, 2)]
@@ -0,0 +1,58 @@
+import db
+from routes.dashboard import _stream_csv
+
+
+class DroppedRaw:
+    # connection จริงที่สายหลุดไประหว่าง request
+    unread_result = False
+    in_transaction = False
+
+    def __init__(self):
+        self.closed = False
+
+    def is_connected(self):
+        return False
+
+    def cursor(self, **kwargs):
+        return DroppedCursor()
+
+    def consume_results(self):
+        raise ConnectionError('lost connection')
+
+    def close(self):
+        self.closed = True
+
+
+class DroppedCursor:
+    def close(self):
+        pass
+
+
+def make_pool(monkeypatch, size=1):
+    pool = db.ConnectionPool(size, 0.1, 3600, 30)
+    monkeypatch.setattr(pool, '_create', DroppedRaw)
+    monkeypatch.setattr(db, 'get_db_connection', pool.get_connection)
+    return pool
+
+
+def test_session_close_returns_dropped_connection_slot(monkeypatch):
+    pool = make_pool(monkeypatch)
+    for _ in range(3):
+        session = db.DbSession()
+        session.cursor()
+        session.close()
+    stats = pool.get_stats()
+    assert stats['in_use'] == 0 and stats['checkouts'] == 3 and stats['recycled'] == 3
+
+
+def test_stream_cleanup_releases_slot_when_consume_fails(monkeypatch):
+    pool = make_pool(monkeypatch)
+    conn = pool.get_connection()
+    conn.unread_result = True
+    response = _stream_csv(conn, DroppedCursor(), ['a'], lambda row: row, 'x.csv')
+    try:
+        response.close()
+    except ConnectionError:
+        pass
+    assert pool.get_stats()['in_use'] == 0
+    pool.get_connection().close()
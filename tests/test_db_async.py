@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+import db_async
+
+
+class FakeAsyncCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, operation, params=None):
+        if self.conn.fail:
+            raise ConnectionError('lost connection')
+        self.rows = [{'conn': self.conn.name}]
+
+    async def fetchall(self):
+        return tuple(self.rows)
+
+    async def fetchone(self):
+        return self.rows[0]
+
+
+class FakeAsyncConnection:
+    def __init__(self, name, fail):
+        self.name = name
+        self.fail = fail
+        self.closed = False
+
+    def cursor(self, cursor_class=None):
+        return FakeAsyncCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool:
+    def __init__(self, connections):
+        self.connections = list(connections)
+        self.released = []
+
+    async def acquire(self):
+        return self.connections.pop(0)
+
+    def release(self, conn):
+        self.released.append(conn)
+
+
+def test_failed_query_releases_connection_and_next_query_reconnects(monkeypatch):
+    broken = FakeAsyncConnection('broken', fail=True)
+    healthy = FakeAsyncConnection('healthy', fail=False)
+    pool = FakePool([broken, healthy])
+
+    async def get_pool():
+        return pool
+    monkeypatch.setattr(db_async, 'get_async_pool', get_pool)
+
+    async def scenario():
+        session = db_async.AsyncDbSession()
+        with pytest.raises(ConnectionError):
+            await session.fetchall("SELECT 1")
+        # connection ที่พังถูกปิดและคืน pool ทันที ไม่ค้างอยู่ใน session
+        assert broken.closed and pool.released == [broken]
+        rows = await session.fetchall("SELECT 1")
+        await session.close()
+        return session, rows
+
+    session, rows = asyncio.run(scenario())
+    assert rows == [{'conn': 'healthy'}]
+    assert pool.released == [broken, healthy]
+    assert session.query_count == 2
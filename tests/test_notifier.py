@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import notifier
+from tests.test_notifier_outbox import FakeOutbox, install
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+
+def test_token_bucket_allows_burst_then_paces_at_rate():
+    clock = FakeClock()
+    bucket = notifier.TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == [0.5, 0.5]
+
+    # ว่างนานแค่ไหน token ก็สะสมได้ไม่เกิน capacity
+    clock.now += 60
+    clock.sleeps.clear()
+    for _ in range(4):
+        bucket.acquire()
+    assert clock.sleeps == [0.5]
+
+
+class ScriptedEvent:
+    def __init__(self, on_wait):
+        self.on_wait = on_wait
+        self.stopped = False
+        self.waits = []
+
+    def wait(self, timeout=None):
+        self.waits.append(timeout)
+        return self.on_wait(len(self.waits))
+
+    def is_set(self):
+        return self.stopped
+
+    def set(self):
+        pass
+
+    def clear(self):
+        pass
+
+
+def test_alerts_within_coalesce_window_go_out_as_one_push(monkeypatch, line_stub):
+    outbox = FakeOutbox([])
+    install(monkeypatch, outbox)
+
+    def arrive(*messages):
+        start = len(outbox.rows) + 1
+        outbox.rows.extend({'id': start + i, 'recipient': 'U1', 'message': m, 'status': 'pending', 'attempts': 0,
+                            'next_attempt_at': 0, 'last_error': None} for i, m in enumerate(messages))
+
+    def wake_wait(n):
+        if n == 1:
+            arrive('ปากกาใกล้หมด')        # เบิกรายการแรก commit แล้วปลุก worker
+            return True
+        stop.stopped = True
+        return False
+
+    def stop_wait(n):
+        arrive('ดินสอใกล้หมด', 'ยางลบใกล้หมด')   # รายการที่ตามมาระหว่างรอ
+        return False
+
+    wake, stop = ScriptedEvent(wake_wait), ScriptedEvent(stop_wait)
+    monkeypatch.setattr(notifier, '_wake', wake)
+    notifier.run_worker(stop)
+
+    assert wake.waits == [notifier.NOTIFY_POLL_INTERVAL] * 2
+    assert stop.waits == [notifier.NOTIFY_COALESCE_WINDOW]
+    assert line_stub.messages() == [['ปากกาใกล้หมด', 'ดินสอใกล้หมด', 'ยางลบใกล้หมด']]
+    assert all(r['status'] == 'sent' for r in outbox.rows)
+
+
+def test_429_defers_remaining_batch_by_retry_after(monkeypatch, line_stub):
+    outbox = FakeOutbox([f'ข้อความ {i}' for i in range(7)])
+    install(monkeypatch, outbox)
+    line_stub.responses = [(429, {'Retry-After': '7'})]
+
+    assert notifier.process_outbox_once() == 0
+    # ชุดที่สอง (2 ข้อความ) ไม่ถูกยิงต่อหลังโดน 429 และไม่นับเป็นความพยายามที่ล้มเหลว
+    assert len(line_stub.requests) == 1
+    assert [(r['status'], r['attempts'], r['next_attempt_at']) for r in outbox.rows] == [('pending', 0, 7)] * 7
+    assert '429' in outbox.rows[0]['last_error']
+
+    outbox.now = 7
+    assert notifier.process_outbox_once() == 7
+    assert [len(m) for m in line_stub.messages()] == [5, 5, 2]
+
+
+def test_429_without_retry_after_uses_first_backoff_step(monkeypatch, line_stub):
+    outbox = FakeOutbox(['ปากกาใกล้หมด'])
+    install(monkeypatch, outbox)
+    line_stub.responses = [(429, {})]
+
+    notifier.process_outbox_once()
+    assert outbox.rows[0]['next_attempt_at'] == notifier.NOTIFY_BACKOFF_BASE
+
+
+def test_parse_retry_after():
+    assert notifier.parse_retry_after('120') == 120
+    assert notifier.parse_retry_after(None) is None
+    assert notifier.parse_retry_after('soon') is None
+    later = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 29 <= notifier.parse_retry_after(format_datetime(later, usegmt=True)) <= 31
+    assert notifier.parse_retry_after(format_datetime(later - timedelta(hours=1), usegmt=True)) == 0
+
+
+def _sender_started_on_import(**env):
+    import os
+    import subprocess
+    import sys
+    code = "import app, notifier; print(notifier._worker is not None)"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, timeout=60,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            env={**os.environ, 'LINE_ACCESS_TOKEN': 'test-token', 'OVERDUE_SCAN_WORKER': '0',
+                                 'NOTIFY_POLL_INTERVAL': '3600', **env})
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip().splitlines()[-1] == 'True'
+
+
+def test_web_processes_do_not_send_unless_opted_in(monkeypatch):
+    monkeypatch.delenv('NOTIFY_WORKER', raising=False)
+    # ตัวส่งตัวเดียวคือ process notify-worker: import แอปใน worker ของเว็บไม่เริ่ม thread ส่ง
+    assert _sender_started_on_import() is False
+    assert _sender_started_on_import(NOTIFY_WORKER='1') is True
@@ -0,0 +1,98 @@
+import notifier
+from tests.conftest import FakeConnection
+
+
+class FakeOutbox:
+    # ตาราง notification_outbox ในหน่วยความจำ เวลาเป็นวินาทีของนาฬิกาปลอม (now)
+    def __init__(self, messages, recipient='U1'):
+        self.now = 0
+        self.rows = [{'id': i, 'recipient': recipient, 'message': m, 'status': 'pending', 'attempts': 0,
+                      'next_attempt_at': 0, 'last_error': None} for i, m in enumerate(messages, start=1)]
+
+    def connect(self):
+        return FakeConnection(self.handle)
+
+    def by_id(self, row_id):
+        return next(r for r in self.rows if r['id'] == row_id)
+
+    def handle(self, sql, params):
+        if sql.startswith('SELECT id, recipient, message, attempts FROM notification_outbox'):
+            due = [r for r in self.rows if r['status'] == 'pending' and r['next_attempt_at'] <= self.now]
+            return [{k: r[k] for k in ('id', 'recipient', 'message', 'attempts')} for r in due[:params[0]]]
+        if sql.startswith('UPDATE notification_outbox SET next_attempt_at = NOW() + INTERVAL'):
+            for row_id in params[1:]:
+                self.by_id(row_id)['next_attempt_at'] = self.now + params[0]
+            return len(params) - 1
+        if sql.startswith('UPDATE notification_outbox SET last_error = %s, next_attempt_at'):
+            error, delay, *ids = params
+            for row_id in ids:
+                self.by_id(row_id).update(last_error=error, next_attempt_at=self.now + delay)
+            return len(ids)
+        if sql.startswith("UPDATE notification_outbox SET status = 'sent'"):
+            for row_id in params:
+                row = self.by_id(row_id)
+                row.update(status='sent', attempts=row['attempts'] + 1)
+            return len(params)
+        if sql.startswith("UPDATE notification_outbox SET status = 'failed'"):
+            attempts, error, row_id = params
+            self.by_id(row_id).update(status='failed', attempts=attempts, last_error=error)
+            return 1
+        if sql.startswith('UPDATE notification_outbox SET attempts = %s'):
+            attempts, error, delay, row_id = params
+            self.by_id(row_id).update(attempts=attempts, last_error=error, next_attempt_at=self.now + delay)
+            return 1
+        raise AssertionError(f'unexpected SQL: {sql}')
+
+
+def install(monkeypatch, outbox):
+    monkeypatch.setattr(notifier, 'get_db_connection', outbox.connect)
+
+
+def test_outbox_drain_retries_with_backoff_then_marks_sent(monkeypatch, line_stub):
+    outbox = FakeOutbox(['ปากกาใกล้หมด 🖊️', 'กระดาษใกล้หมด'])
+    install(monkeypatch, outbox)
+    line_stub.responses = [(500, {}), (502, {})]
+
+    assert notifier.process_outbox_once() == 0
+    assert [r['next_attempt_at'] for r in outbox.rows] == [10, 10]   # NOTIFY_BACKOFF_BASE
+    assert all(r['attempts'] == 1 and '500' in r['last_error'] for r in outbox.rows)
+
+    # ยังไม่ถึงเวลาลองใหม่: ไม่ยิงซ้ำ
+    outbox.now = 9
+    assert notifier.process_outbox_once() == 0
+    assert len(line_stub.requests) == 1
+
+    outbox.now = 10
+    assert notifier.process_outbox_once() == 0
+    assert [r['next_attempt_at'] for r in outbox.rows] == [30, 30]   # backoff เท่าตัว
+
+    outbox.now = 30
+    assert notifier.process_outbox_once() == 2
+    assert [(r['status'], r['attempts']) for r in outbox.rows] == [('sent', 3), ('sent', 3)]
+    assert line_stub.messages()[-1] == ['ปากกาใกล้หมด 🖊️', 'กระดาษใกล้หมด']
+    headers, body = line_stub.requests[-1]
+    assert headers['Authorization'] == 'Bearer test-token' and body['to'] == 'U1'
+
+
+def test_outbox_gives_up_after_max_attempts(monkeypatch, line_stub):
+    monkeypatch.setattr(notifier, 'NOTIFY_MAX_ATTEMPTS', 2)
+    outbox = FakeOutbox(['ดินสอใกล้หมด'])
+    install(monkeypatch, outbox)
+    line_stub.responses = [(500, {}), (500, {})]
+
+    notifier.process_outbox_once()
+    outbox.now = outbox.rows[0]['next_attempt_at']
+    notifier.process_outbox_once()
+    outbox.now += 10000
+
+    assert notifier.process_outbox_once() == 0
+    assert outbox.rows[0]['status'] == 'failed' and outbox.rows[0]['attempts'] == 2
+    assert len(line_stub.requests) == 2
+
+
+def test_outbox_pushes_at_most_five_messages_per_request(monkeypatch, line_stub):
+    outbox = FakeOutbox([f'ข้อความ {i}' for i in range(7)])
+    install(monkeypatch, outbox)
+
+    assert notifier.process_outbox_once() == 7
+    assert [len(m) for m in line_stub.messages()] == [5, 2]
@@ -0,0 +1,46 @@
+import itertools
+import re
+from datetime import datetime
+
+from pagination import encode_cursor, _keyset_query, _seek_condition
+
+HISTORY_KEYS = [('t.transaction_date', 'transaction_date'), ('t.transaction_id', 'transaction_id'),
+                ('td.item_id', 'item_id')]
+
+
+def test_seek_is_expanded_instead_of_row_constructor():
+    when = datetime(2026, 5, 1, 9, 30)
+    query, params, _ = _keyset_query("SELECT * FROM t WHERE 1=1", [], HISTORY_KEYS, 50,
+                                     encode_cursor([when, 42, 7]), None, True)
+
+    assert ') < (' not in query
+    assert ("AND (t.transaction_date < %s OR (t.transaction_date = %s AND "
+            "(t.transaction_id < %s OR (t.transaction_id = %s AND (td.item_id < %s)))))") in query
+    assert query.endswith("ORDER BY t.transaction_date DESC, t.transaction_id DESC, td.item_id DESC LIMIT %s")
+    assert params == (when, when, 42, 42, 7, 51)
+
+
+def test_before_cursor_uses_backward_comparison():
+    query, params, _ = _keyset_query("SELECT * FROM b WHERE 1=1", [3], [('b.borrow_date', 'd'), ('b.id', 'id')],
+                                     20, None, encode_cursor([5, 9]), True)
+    assert "AND (b.borrow_date > %s OR (b.borrow_date = %s AND (b.id > %s)))" in query
+    assert "ORDER BY b.borrow_date ASC, b.id ASC" in query
+    assert params == (3, 5, 5, 9, 21)
+
+
+def test_cursor_with_wrong_arity_starts_from_first_page():
+    query, params, state = _keyset_query("SELECT 1 WHERE 1=1", [], HISTORY_KEYS, 10, encode_cursor([1, 2]), None, True)
+    assert '%s OR' not in query and state == (None, None) and params == (11,)
+
+
+def test_expanded_seek_matches_tuple_comparison():
+    columns = ['a', 'b', 'c']
+    for op in ('<', '>'):
+        for key in itertools.product(range(3), repeat=3):
+            condition, params = _seek_condition(columns, op, list(key))
+            for row in itertools.product(range(3), repeat=3):
+                values = iter(params)
+                expr = re.sub(r'%s', lambda _: repr(next(values)), condition)
+                expr = expr.replace(' = ', ' == ').replace('OR', 'or').replace('AND', 'and')
+                expected = row < key if op == '<' else row > key
+                assert eval(expr, dict(zip(columns, row))) == expected
@@ -0,0 +1,132 @@
+import os
+import time
+
+import pytest
+
+import reports
+from tests.conftest import FakeConnection
+
+
+@pytest.fixture
+def reports_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(reports, 'REPORTS_DIR', str(tmp_path))
+    return tmp_path
+
+
+def touch(path, age):
+    path.write_bytes(b'x')
+    old = time.time() - age
+    os.utime(path, (old, old))
+
+
+def test_recover_reclaims_expired_jobs_and_removes_stale_tmp_files(reports_dir, monkeypatch):
+    conn = FakeConnection(lambda sql, params: 2 if sql.startswith('UPDATE report_jobs') else [])
+    monkeypatch.setattr(reports, 'get_db_connection', lambda: conn)
+    touch(reports_dir / 'report_1.xlsx.4242.tmp', reports.REPORT_LEASE_SECONDS + 60)   # worker ที่ตายไปแล้ว
+    touch(reports_dir / 'report_2.xlsx.4343.tmp', 5)                                   # ยังเขียนอยู่
+    touch(reports_dir / 'report_3.xlsx', reports.REPORT_LEASE_SECONDS + 60)            # รายงานที่เสร็จแล้ว
+
+    assert reports.recover_reports() == (2, 1)
+    assert sorted(os.listdir(reports_dir)) == ['report_2.xlsx.4343.tmp', 'report_3.xlsx']
+    update = next(sql for sql in conn.statements() if sql.startswith('UPDATE report_jobs'))
+    assert "SET status = 'pending'" in update and "status = 'running' AND lease_until < NOW()" in update
+    assert conn.statements()[-2:] == ['COMMIT', 'CLOSE']
+
+
+def test_recover_without_reports_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(reports, 'REPORTS_DIR', str(tmp_path / 'missing'))
+    monkeypatch.setattr(reports, 'get_db_connection', lambda: FakeConnection(lambda sql, params: 0))
+    assert reports.recover_reports() == (0, 0)
+
+
+class StopAfter:
+    def __init__(self, rounds):
+        self.rounds = rounds
+
+    def is_set(self):
+        return self.rounds <= 0
+
+    def wait(self, timeout=None):
+        self.rounds -= 1
+
+
+def test_standalone_worker_recovers_before_first_round(monkeypatch):
+    calls = []
+    monkeypatch.setattr(reports, 'recover_reports', lambda: calls.append('recover') or (1, 1))
+    monkeypatch.setattr(reports, 'run_pending_reports', lambda: calls.append('run'))
+    monkeypatch.setattr(reports, 'cleanup_reports', lambda: calls.append('cleanup'))
+
+    reports.run_report_worker(StopAfter(2))
+    assert calls == ['recover', 'run', 'cleanup', 'run', 'cleanup']
+
+
+class FakeWake:
+    def __init__(self):
+        self.flag = False
+        self.waits = []
+
+    def set(self):
+        self.flag = True
+
+    def clear(self):
+        self.flag = False
+
+    def is_set(self):
+        return self.flag
+
+    def wait(self, timeout=None):
+        self.waits.append(timeout)
+        return self.flag
+
+
+def test_inprocess_worker_waits_for_stale_lease_then_exits(monkeypatch):
+    calls = []
+    expiries = iter([40, None])
+    wake = FakeWake()
+    monkeypatch.setattr(reports, '_wake', wake)
+    monkeypatch.setattr(reports, 'recover_reports', lambda: calls.append('recover') or (0, 0))
+    monkeypatch.setattr(reports, 'run_pending_reports', lambda: calls.append('run'))
+    monkeypatch.setattr(reports, 'cleanup_reports', lambda: None)
+    monkeypatch.setattr(reports, '_seconds_until_lease_expiry', lambda: next(expiries))
+    monkeypatch.setattr(reports, '_worker', object())
+
+    reports._worker_loop()
+    # งาน running ที่ lease ยังไม่หมด: รอจนหมดแล้ววนมาหยิบอีกรอบ ไม่ต้องรอให้มีคนสั่งรายงานใหม่
+    assert calls == ['recover', 'run', 'run']
+    assert wake.waits == [41]
+    assert reports._worker is None
+
+
+def test_inprocess_worker_keeps_going_when_woken_before_exit(monkeypatch):
+    calls = []
+    wake = FakeWake()
+
+    def run():
+        calls.append('run')
+        if len(calls) == 1:
+            wake.set()   # มีคนสั่งรายงานเข้ามาระหว่างรอบ
+
+    monkeypatch.setattr(reports, '_wake', wake)
+    monkeypatch.setattr(reports, 'recover_reports', lambda: (0, 0))
+    monkeypatch.setattr(reports, 'run_pending_reports', run)
+    monkeypatch.setattr(reports, 'cleanup_reports', lambda: None)
+    monkeypatch.setattr(reports, '_seconds_until_lease_expiry', lambda: None)
+    monkeypatch.setattr(reports, '_worker', object())
+
+    reports._worker_loop()
+    assert calls == ['run', 'run'] and reports._worker is None
+
+
+@pytest.mark.parametrize('env, expected', [(None, False), ('0', False), ('1', True)])
+def test_inprocess_report_worker_is_opt_in(monkeypatch, env, expected):
+    import importlib
+    import routes.reports
+    if env is None:
+        monkeypatch.delenv('REPORT_WORKER', raising=False)
+    else:
+        monkeypatch.setenv('REPORT_WORKER', env)
+    try:
+        assert importlib.reload(routes.reports).REPORT_WORKER_INPROCESS is expected
+    finally:
+        monkeypatch.undo()
+        importlib.reload(routes.reports)
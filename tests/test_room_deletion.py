@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+import room_deletion
+from tests.conftest import FakeConnection
+
+
+def make_handler(fail_summary=False, batches=None):
+    # batches: {ตาราง: [จำนวนแถวที่ DELETE ... LIMIT ลบได้ในแต่ละรอบ]}
+    batches = {table: list(counts) for table, counts in (batches or {}).items()}
+
+    def handler(sql, params):
+        if sql.startswith('UPDATE room_deletion_jobs SET status = \'running\''):
+            return 1
+        if sql.startswith('SELECT location, storage_ids, last_item_id'):
+            return [('ห้อง 101', json.dumps([7]), 0)]
+        if sql.startswith('SELECT item_id FROM items WHERE storage_id IN') and 'ORDER BY item_id LIMIT' in sql:
+            return [(1,), (2,)] if params[-2] == 0 else []
+        if sql.startswith('SELECT item_id, storage_id, quantity, reorder_level FROM items'):
+            return [(1, 7, 5, 10), (2, 7, 20, 10)]
+        if sql.startswith('DELETE FROM') and sql.endswith('LIMIT %s'):
+            table = sql.split()[2]
+            counts = batches.get(table)
+            return counts.pop(0) if counts else 0
+        if sql.startswith('DELETE FROM'):
+            return 1
+        if fail_summary and sql.startswith('INSERT INTO location_stock_summary'):
+            return RuntimeError('summary failed')
+        return []
+    return handler
+
+
+def run(monkeypatch, handler):
+    conn = FakeConnection(handler)
+    monkeypatch.setattr(room_deletion, 'get_db_connection', lambda: conn)
+    monkeypatch.setattr(room_deletion, 'bump_data_version', lambda conn: None)
+    return conn
+
+
+def final_transaction(statements):
+    lock = next(i for i, sql in enumerate(statements) if sql.endswith('FOR UPDATE') and 'FROM items' in sql)
+    return lock, statements[lock:]
+
+
+def test_history_is_deleted_in_bounded_batches(monkeypatch):
+    monkeypatch.setattr(room_deletion, 'ROOM_DELETE_BATCH_SIZE', 2)
+    conn = run(monkeypatch, make_handler(batches={'borrow_transactions': [2, 2, 1], 'transaction_details': [2, 0]}))
+
+    assert room_deletion.run_job(1) is True
+
+    statements = conn.statements()
+    lock, final = final_transaction(statements)
+    prepass = [i for i, sql in enumerate(statements[:lock]) if sql.startswith('DELETE FROM')]
+    assert [statements[i].split()[2] for i in prepass] == ['borrow_transactions'] * 3 + ['transaction_details'] * 2
+    for i in prepass:
+        sql, params = conn.log[i]
+        # ลบทีละไม่เกิน batch เฉพาะพัสดุที่ยังอยู่ในตู้ของงาน แล้วต่อ lease + commit ก่อนรอบถัดไป
+        assert sql.endswith('LIMIT %s') and params[-1] == 2
+        assert 'SELECT item_id FROM items WHERE item_id IN (%s, %s) AND storage_id IN (%s)' in sql
+        assert statements[i + 1].startswith('UPDATE room_deletion_jobs SET deleted_history')
+        assert 'lease_until = NOW() + INTERVAL' in statements[i + 1]
+        assert statements[i + 2] == 'COMMIT'
+
+    # ขั้นสุดท้ายสั้นๆ: ประวัติที่เพิ่มมาหลังรอบก่อน -> พัสดุ -> ความคืบหน้า -> ตารางสรุป ใน commit เดียว
+    end = final.index('COMMIT')
+    assert [sql.split(' WHERE')[0] for sql in final[:end] if sql.startswith('DELETE')] == [
+        'DELETE FROM borrow_transactions', 'DELETE FROM transaction_details', 'DELETE FROM items']
+    assert final[end - 2].startswith('UPDATE room_deletion_jobs SET deleted_items')
+    assert final[end - 1].startswith('INSERT INTO location_stock_summary')
+
+
+def test_failed_chunk_keeps_item_history_and_resumes(monkeypatch):
+    conn = run(monkeypatch, make_handler(fail_summary=True))
+
+    with pytest.raises(RuntimeError):
+        room_deletion.run_job(1)
+
+    statements = conn.statements()
+    lock, final = final_transaction(statements)
+    failed_at = next(i for i, sql in enumerate(final) if sql.startswith('INSERT INTO location_stock_summary'))
+    # ประวัติที่ลบในขั้นสุดท้ายกับการลบพัสดุ rollback ไปด้วยกัน และ last_item_id ไม่ขยับ (ทำก้อนเดิมซ้ำได้)
+    assert 'COMMIT' not in final[:failed_at + 1]
+    assert final[failed_at + 1] == 'ROLLBACK'
+    assert final[failed_at - 1].startswith('UPDATE room_deletion_jobs SET deleted_items')
+    assert any("status = 'failed'" in sql for sql in final[failed_at:])
+
+    conn = run(monkeypatch, make_handler())
+    assert room_deletion.run_job(1, include_failed=True) is True
+    deleted_items = [params for sql, params in conn.log if sql.startswith('DELETE FROM items')]
+    assert deleted_items == [(1, 2)]
@@ -0,0 +1,48 @@
+from flask import Flask
+
+import routes.inventory as inventory
+from stock import withdraw_cart
+from tests.conftest import FakeConnection
+
+ITEMS = [
+    {'item_id': 1, 'item_name': 'ปากกา', 'quantity': 12, 'unit': 'ด้าม', 'storage_id': 7, 'reorder_level': 10},
+    {'item_id': 2, 'item_name': 'กระดาษ', 'quantity': 50, 'unit': 'รีม', 'storage_id': 7, 'reorder_level': 10},
+]
+
+
+def handler(sql, params):
+    if sql.startswith('SELECT item_id, item_name, quantity'):
+        return [dict(item) for item in ITEMS]
+    if sql.startswith('SELECT fullname FROM users'):
+        return [{'fullname': 'สมชาย'}]
+    return 1
+
+
+def test_withdraw_cart_leaves_summary_to_the_caller():
+    conn = FakeConnection(handler)
+    transaction_id, lines, changes = withdraw_cart(conn.cursor(dictionary=True), 3, [(1, 5), (2, 1)])
+
+    assert not any('location_stock_summary' in sql for sql in conn.statements())
+    assert [line['low_stock'] for line in lines] == [True, False]
+    assert changes == [(7, (12, 10), (7, 10)), (7, (50, 10), (49, 10))]
+
+
+def test_withdraw_cart_api_upserts_summary_right_before_commit(monkeypatch):
+    conn = FakeConnection(handler)
+    monkeypatch.setattr(inventory, 'get_db', lambda: conn)
+    monkeypatch.setattr(inventory, 'invalidate_snapshot', lambda: None)
+    monkeypatch.setenv('LINE_ACCESS_TOKEN', 'test-token')
+    monkeypatch.setenv('LINE_USER_ID', 'U1')
+    app = Flask(__name__)
+    app.register_blueprint(inventory.inventory_bp)
+
+    response = app.test_client().post('/api/withdraw_cart', json={
+        'user_id': 3, 'items': [{'item_id': 1, 'amount': 5}, {'item_id': 2, 'amount': 1}]})
+
+    assert response.status_code == 200
+    statements = conn.statements()
+    commit = statements.index('COMMIT')
+    # แถวสรุปของห้องถูกล็อคหลังคิวแจ้งเตือน ถือไว้แค่ถึง COMMIT
+    assert statements[commit - 2].startswith('INSERT INTO notification_outbox')
+    assert statements[commit - 1].startswith('INSERT INTO location_stock_summary')
+    assert sum(sql.startswith('INSERT INTO location_stock_summary') for sql in statements) == 1
@@ -0,0 +1,29 @@
+from mysql.connector.cursor import MySQLCursor
+
+from stock_summary import apply_item_changes
+
+
+def test_apply_item_changes_on_plain_cursor(recording_connection):
+    cursor = MySQLCursor(recording_connection)
+    apply_item_changes(cursor, [
+        (2, None, (20, 10)),          # เพิ่มของปกติ
+        (1, (5, 10), (15, 10)),       # ใกล้หมด -> ปกติ
+        (1, None, (3, 10)),           # เพิ่มของใกล้หมด
+        (3, (7, 10), (7, 10)),        # ไม่เปลี่ยน: ไม่ต้องยิง SQL
+    ])
+
+    sent = recording_connection.sent
+    assert len(sent) == 2
+    # เรียงตาม storage_id
+    assert 'WHERE storage_id = 1 AND location IS NOT NULL' in sent[0]
+    assert 'WHERE storage_id = 2 AND location IS NOT NULL' in sent[1]
+    assert 'SELECT location, 0, 1, 13, 0, 1 FROM storages' in sent[0]
+    assert 'SELECT location, 0, 1, 20, 0, 1 FROM storages' in sent[1]
+    assert all('ON DUPLICATE KEY UPDATE' in stmt for stmt in sent)
+
+
+def test_apply_item_changes_without_delta_sends_nothing(recording_connection):
+    cursor = MySQLCursor(recording_connection)
+    apply_item_changes(cursor, [(1, (5, 10), (5, 10))])
+    apply_item_changes(cursor, [])
+    assert recording_connection.sent == []